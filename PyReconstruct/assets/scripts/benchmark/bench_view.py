@@ -0,0 +1,397 @@
+"""Benchmark the section view pipeline.
+
+Replays a script of section changes, pans and zooms against a series (either
+synthesized for the run or an existing jser) without a main window, and
+reports the time spent in each rendering stage as JSON.
+
+A script is a JSON list of steps:
+
+    {"action": "section", "section": 3}     load a section and draw it
+    {"action": "pan", "dx": 0.1, "dy": 0}    pan by a fraction of the window
+    {"action": "zoom", "factor": 0.5}        zoom about the window center (< 1 zooms in)
+    {"action": "traces"}                     redraw the traces only (as after an edit)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+
+from PySide6.QtWidgets import QApplication
+
+from PyReconstruct.modules.datatypes import Series
+from PyReconstruct.modules.backend.func import stdout_to_devnull
+from PyReconstruct.modules.backend.view import SectionLayer, ZarrLayer
+from PyReconstruct.modules.backend.view.image_layer import ImageLayer
+from PyReconstruct.modules.backend.view.trace_layer import TraceLayer
+
+from PyReconstruct.assets.scripts.benchmark.synthesize import (
+    synthesize_series,
+    synthesize_overlay
+)
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+STAGES = {
+    "load_section": (Series, "loadSection"),
+    "load_layer": (SectionLayer, "__init__"),
+    "generate_view": (SectionLayer, "generateView"),
+    "generate_image_layer": (ImageLayer, "generateImageLayer"),
+    "generate_trace_layer": (TraceLayer, "generateTraceLayer"),
+    "generate_zarr_layer": (ZarrLayer, "generateZarrLayer"),
+}
+
+
+def get_args():
+    """Get args for the benchmark."""
+
+    parser = argparse.ArgumentParser(
+        prog="bench-section-view",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="example call: bench-section-view --sections 5 --traces 20000 --source zarr -o result.json",
+    )
+
+    parser.add_argument("jser", type=str, nargs="?", help="Existing jser to benchmark (a series is synthesized if omitted).")
+
+    ## Synthetic series
+
+    parser.add_argument("--sections", type=int, default=5, help="number of sections (default %(default)s)")
+    parser.add_argument("--image_size", type=int, default=4096, help="image edge length in pixels (default %(default)s)")
+    parser.add_argument("--traces", type=int, default=2000, help="traces per section (default %(default)s)")
+    parser.add_argument("--points", type=int, default=32, help="points per trace (default %(default)s)")
+    parser.add_argument("--objects", type=int, default=200, help="number of distinct objects (default %(default)s)")
+    parser.add_argument("--source", choices=("image", "zarr"), default="image", help="image source (default %(default)s)")
+    parser.add_argument("--mag", type=float, default=0.002, help="magnification in microns per pixel (default %(default)s)")
+    parser.add_argument("--overlay", action="store_true", help="also draw a labels zarr overlay")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default %(default)s)")
+
+    ## Replay
+
+    parser.add_argument("--width", type=int, default=1600, help="view width in pixels (default %(default)s)")
+    parser.add_argument("--height", type=int, default=1000, help="view height in pixels (default %(default)s)")
+    parser.add_argument("--pans", type=int, default=10, help="pans per section in the default script (default %(default)s)")
+    parser.add_argument("--zooms", type=int, default=4, help="zooms per section in the default script (default %(default)s)")
+    parser.add_argument("--script", type=str, default=None, help="JSON script to replay instead of the default script")
+    parser.add_argument("--repeat", type=int, default=1, help="number of times to replay the script (default %(default)s)")
+    parser.add_argument("--trace_memory", action="store_true", help="record per-stage python memory peaks (slows the run)")
+
+    ## Output
+
+    parser.add_argument("--output", "-o", type=str, default=None, help="output json filepath (default stdout)")
+    parser.add_argument("--workdir", type=str, default=None, help="directory for the synthesized series (default a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the synthesized series")
+
+    return parser.parse_args()
+
+
+class StageRecorder():
+
+    def __init__(self, trace_memory=False):
+        """Record the time (and optionally memory) spent in each stage.
+
+            Params:
+                trace_memory (bool): True if python memory peaks should be recorded
+        """
+        self.trace_memory = trace_memory
+        self.times = {name: [] for name in STAGES}
+        self.memory = {name: [] for name in STAGES}
+        self.stack = []  # [start memory, peak memory] of the stages being run
+        self.originals = {}
+
+    def install(self):
+        """Wrap the stage methods."""
+        for name, (cls, attr) in STAGES.items():
+            original = getattr(cls, attr)
+            self.originals[name] = original
+            setattr(cls, attr, self._wrap(name, original))
+
+    def uninstall(self):
+        """Restore the stage methods."""
+        for name, (cls, attr) in STAGES.items():
+            setattr(cls, attr, self.originals[name])
+
+    def _wrap(self, name, fn):
+        recorder = self
+        def wrapper(*args, **kwargs):
+            recorder._enter()
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.times[name].append(time.perf_counter() - t)
+                recorder._exit(name)
+        return wrapper
+
+    def _enter(self):
+        if not self.trace_memory:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self.stack:
+            frame[1] = max(frame[1], peak)
+        tracemalloc.reset_peak()
+        self.stack.append([current, current])
+
+    def _exit(self, name):
+        if not self.trace_memory:
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        start, frame_peak = self.stack.pop()
+        frame_peak = max(frame_peak, peak)
+        for frame in self.stack:
+            frame[1] = max(frame[1], frame_peak)
+        self.memory[name].append(frame_peak - start)
+
+    def summary(self) -> dict:
+        """Return the timing statistics (in ms) for each stage."""
+        summary = {}
+        for name, times in self.times.items():
+            if not times:
+                continue
+            summary[name] = stats(times)
+            if self.memory[name]:
+                summary[name]["peak_python_mb"] = max(self.memory[name]) / 2**20
+        return summary
+
+
+class HeadlessView():
+
+    def __init__(self, series : Series, pixmap_dim : tuple, zarr_overlay=None):
+        """Emulate the section drawing done by the field widget.
+
+            Params:
+                series (Series): the series to view
+                pixmap_dim (tuple): the w and h of the view
+                zarr_overlay (tuple): the zarr filepath and group to overlay (None for no overlay)
+        """
+        self.series = series
+        self.pixmap_dim = pixmap_dim
+        if zarr_overlay:
+            self.series.zarr_overlay_fp, self.series.zarr_overlay_group = zarr_overlay
+        self.zarr_layer = ZarrLayer(series) if zarr_overlay else None
+        self.section = None
+        self.layer = None
+
+    def resetWindow(self):
+        """Fit the window to the current section image (or traces)."""
+        if self.layer.image_found:
+            w, h = self.layer.bw * self.section.mag, self.layer.bh * self.section.mag
+        else:
+            w = h = 1
+        pw, ph = self.pixmap_dim
+        if w / h > pw / ph:
+            h = w * ph / pw
+        else:
+            w = h * pw / ph
+        self.series.window = [0, 0, w, h]
+
+    def draw(self, generate_image=True):
+        """Draw the current section."""
+        self.layer.generateView(
+            self.pixmap_dim,
+            self.series.window,
+            generate_image=generate_image,
+        )
+        if self.zarr_layer:
+            self.zarr_layer.generateZarrLayer(
+                self.section,
+                self.pixmap_dim,
+                self.series.window
+            )
+
+    def step(self, step : dict):
+        """Run a single script step.
+
+            Params:
+                step (dict): the step to run
+        """
+        action = step["action"]
+        if action == "section":
+            self.section = self.series.loadSection(step["section"])
+            self.layer = SectionLayer(self.section, self.series)
+            if self.series.window is None or step.get("reset_window"):
+                self.resetWindow()
+            self.draw()
+        elif action == "pan":
+            x, y, w, h = self.series.window
+            self.series.window = [x + step.get("dx", 0) * w, y + step.get("dy", 0) * h, w, h]
+            self.draw()
+        elif action == "zoom":
+            x, y, w, h = self.series.window
+            f = step["factor"]
+            self.series.window = [x + w * (1 - f) / 2, y + h * (1 - f) / 2, w * f, h * f]
+            self.draw()
+        elif action == "traces":
+            self.draw(generate_image=False)
+        else:
+            raise ValueError(f"Unknown script action: {action}")
+
+
+def default_script(snums : list, pans : int, zooms : int) -> list:
+    """Create a script that visits every section, panning and zooming on each.
+
+        Params:
+            snums (list): the section numbers to visit
+            pans (int): the number of pans per section
+            zooms (int): the number of zooms per section
+    """
+    script = []
+    for i, snum in enumerate(snums):
+        script.append({"action": "section", "section": snum, "reset_window": i == 0})
+        # zoom in, pan around, then zoom back out
+        for _ in range(zooms // 2):
+            script.append({"action": "zoom", "factor": 0.5})
+        for j in range(pans):
+            angle = 2 * np.pi * j / max(pans, 1)
+            script.append({"action": "pan", "dx": 0.1 * np.cos(angle), "dy": 0.1 * np.sin(angle)})
+        for _ in range(zooms - zooms // 2):
+            script.append({"action": "zoom", "factor": 2})
+        script.append({"action": "traces"})
+    return script
+
+
+def stats(times : list) -> dict:
+    """Return summary statistics (in ms) for a list of durations (in s)."""
+    ms = np.array(times) * 1000
+    return {
+        "count": len(ms),
+        "total_ms": float(ms.sum()),
+        "mean_ms": float(ms.mean()),
+        "median_ms": float(np.median(ms)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def max_rss_mb() -> float:
+    """Return the peak resident memory of the process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def main():
+
+    args = get_args()
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    workdir = None
+    overlay = None
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "workdir", "keep")}
+
+    if args.jser:
+        jser_fp = args.jser
+    else:
+        workdir = args.workdir or tempfile.mkdtemp(prefix="pyrecon_bench_")
+        t = time.perf_counter()
+        jser_fp = stdout_to_devnull(synthesize_series)(
+            workdir,
+            sections=args.sections,
+            image_size=args.image_size,
+            traces=args.traces,
+            points=args.points,
+            objects=args.objects,
+            source=args.source,
+            mag=args.mag,
+            seed=args.seed
+        )
+        if args.overlay:
+            overlay = synthesize_overlay(
+                workdir,
+                args.sections,
+                args.image_size,
+                args.mag,
+                np.random.default_rng(args.seed)
+            )
+        config["synthesize_s"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    series = stdout_to_devnull(Series.openJser)(jser_fp)
+    open_s = time.perf_counter() - t
+
+    try:
+        if args.script:
+            with open(args.script, "r") as f:
+                script = json.load(f)
+        else:
+            script = default_script(
+                sorted(series.sections.keys()),
+                args.pans,
+                args.zooms
+            )
+
+        view = HeadlessView(series, (args.width, args.height), overlay)
+        series.window = None
+
+        recorder = StageRecorder(args.trace_memory)
+        if args.trace_memory:
+            tracemalloc.start()
+        recorder.install()
+
+        frames = []
+        try:
+            for r in range(args.repeat):
+                for step in script:
+                    t = time.perf_counter()
+                    view.step(step)
+                    app.processEvents()
+                    frames.append(dict(step, repeat=r, ms=(time.perf_counter() - t) * 1000))
+        finally:
+            recorder.uninstall()
+            if args.trace_memory:
+                tracemalloc.stop()
+
+        result = {
+            "config": config,
+            "system": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "open_series_s": open_s,
+            "frames": {
+                action: stats([f["ms"] / 1000 for f in frames if f["action"] == action])
+                for action in sorted(set(f["action"] for f in frames))
+            },
+            "stages": recorder.summary(),
+            "memory": {"max_rss_mb": max_rss_mb()},
+            "steps": frames,
+        }
+
+    finally:
+        series.close()
+        if workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        from PyReconstruct.modules.constants import repo_info
+        result["version"] = {"branch": repo_info.get("branch"), "commit": repo_info.get("commit")}
+    except Exception:
+        pass
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+
+    main()
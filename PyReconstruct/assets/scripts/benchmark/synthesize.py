@@ -0,0 +1,160 @@
+"""Synthesize series of arbitrary size for benchmarking."""
+
+import os
+import math
+
+import numpy as np
+import cv2
+import zarr
+
+from PyReconstruct.modules.datatypes import Series, Trace
+
+
+def synthesize_images(out_dir, sections, image_size, source, rng):
+    """Write the section images and return their locations.
+
+        Params:
+            out_dir (str): the directory to write the images to
+            sections (int): the number of sections
+            image_size (int): the edge length of each (square) image in pixels
+            source (str): "image" for tif files or "zarr" for a scaled zarr
+            rng (np.random.Generator): the random number generator
+        Returns:
+            (list): the image location for each section
+    """
+    # low-frequency texture so that image scaling does real work
+    small = rng.integers(0, 256, (max(image_size // 16, 2),) * 2, dtype=np.uint8)
+    base = cv2.resize(small, (image_size, image_size), interpolation=cv2.INTER_CUBIC)
+    names = [f"{n:04d}.tif" for n in range(sections)]
+
+    if source == "image":
+
+        img_dir = os.path.join(out_dir, "images")
+        os.makedirs(img_dir, exist_ok=True)
+        locations = []
+        for n, name in enumerate(names):
+            fp = os.path.join(img_dir, name)
+            cv2.imwrite(fp, np.roll(base, n * 7, axis=(0, 1)))
+            locations.append(fp)
+        return locations
+
+    elif source == "zarr":
+
+        zarr_dir = os.path.join(out_dir, "images.zarr")
+        zg = zarr.open(zarr_dir, mode="w")
+        scales = [1]
+        while image_size // (scales[-1] * 2) >= 256:
+            scales.append(scales[-1] * 2)
+        for n, name in enumerate(names):
+            img = np.roll(base, n * 7, axis=(0, 1))
+            for s in scales:
+                scaled = img if s == 1 else cv2.resize(
+                    img,
+                    (image_size // s, image_size // s),
+                    interpolation=cv2.INTER_AREA
+                )
+                zg.create_dataset(
+                    f"scale_{s}/{name}",
+                    data=scaled,
+                    chunks=(512, 512),
+                    overwrite=True
+                )
+        return [os.path.join(zarr_dir, "scale_1", name) for name in names]
+
+    else:
+
+        raise ValueError(f"Unknown image source: {source}")
+
+
+def synthesize_overlay(out_dir, sections, image_size, mag, rng):
+    """Write a labels zarr that can be displayed as a zarr overlay.
+
+        Params:
+            out_dir (str): the directory to write the zarr to
+            sections (int): the number of sections
+            image_size (int): the edge length of each (square) image in pixels
+            mag (float): the series magnification
+            rng (np.random.Generator): the random number generator
+        Returns:
+            (str): the zarr filepath
+            (str): the overlay group name
+    """
+    overlay_fp = os.path.join(out_dir, "overlay.zarr")
+    zg = zarr.open(overlay_fp, mode="w")
+
+    raw = zg.create_dataset("raw", shape=(sections, 1, 1), dtype=np.uint8)
+    raw.attrs["resolution"] = [50, 2, 2]
+    raw.attrs["window"] = [0, 0, image_size * mag, image_size * mag]
+    raw.attrs["sections"] = list(range(sections))
+    raw.attrs["true_mag"] = mag
+
+    # coarse blocks of labels at half the raw resolution
+    labels = rng.integers(
+        1, 64, (sections, max(image_size // 64, 1), max(image_size // 64, 1)),
+        dtype=np.uint32
+    )
+    labels = labels.repeat(32, axis=1).repeat(32, axis=2)
+    group = "labels_bench"
+    overlay = zg.create_dataset(group, data=labels, chunks=(1, 512, 512))
+    overlay.attrs["offset"] = [0, 0, 0]
+    overlay.attrs["resolution"] = [50, 4, 4]
+
+    return overlay_fp, group
+
+
+def synthesize_series(
+        out_dir : str,
+        sections : int = 10,
+        image_size : int = 4096,
+        traces : int = 1000,
+        points : int = 32,
+        objects : int = 100,
+        source : str = "image",
+        mag : float = 0.002,
+        seed : int = 0):
+    """Create a series with random traces and images.
+
+        Params:
+            out_dir (str): the directory to create the series in
+            sections (int): the number of sections
+            image_size (int): the edge length of each (square) image in pixels
+            traces (int): the number of traces on each section
+            points (int): the number of points in each trace
+            objects (int): the number of distinct object names
+            source (str): "image" for tif files or "zarr" for a scaled zarr
+            mag (float): the series magnification (microns per pixel)
+            seed (int): the random seed
+        Returns:
+            (str): the jser filepath
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    locations = synthesize_images(out_dir, sections, image_size, source, rng)
+    series = Series.new(locations, "bench", mag, 0.05)
+
+    field_size = image_size * mag
+    names = [f"obj_{n:05d}" for n in range(objects)]
+    colors = [tuple(int(c) for c in rng.integers(0, 256, 3)) for _ in names]
+    theta = np.linspace(0, 2 * math.pi, points, endpoint=False)
+
+    for snum in range(sections):
+        section = series.loadSection(snum)
+        centers = rng.uniform(0, field_size, (traces, 2))
+        radii = rng.uniform(0.002, 0.02, traces) * field_size
+        obj_ids = rng.integers(0, objects, traces)
+        for (cx, cy), r, i in zip(centers, radii, obj_ids):
+            # lumpy circles so that traces are not all convex
+            rr = r * (1 + 0.2 * np.sin(3 * theta + cx))
+            trace = Trace(names[i], colors[i])
+            trace.points = list(zip(
+                (cx + rr * np.cos(theta)).tolist(),
+                (cy + rr * np.sin(theta)).tolist()
+            ))
+            section.addTrace(trace, log_event=False)
+        section.save(update_series_data=False)
+
+    series.jser_fp = os.path.join(out_dir, "bench.jser")
+    series.saveJser(close=True)
+
+    return series.jser_fp
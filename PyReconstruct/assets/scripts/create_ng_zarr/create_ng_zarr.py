@@ -7,21 +7,15 @@ import os
 from pathlib import Path
 from datetime import datetime, timezone
 
-import zarr
-import cv2
-
-from PySide6.QtWidgets import QApplication
-
 from PyReconstruct.modules.backend.imports import modules_available
 
-from PyReconstruct.modules.backend.func import stdout_to_devnull
-
 from PyReconstruct.modules.datatypes import Series
 
 from PyReconstruct.modules.backend.autoseg import (
     seriesToZarr,
     seriesToLabels,
     groupsToVolume,
+    getTissueWindow,
     rechunk
 )
 
@@ -55,7 +49,7 @@ jser_fp, output_zarr, start, end, mag, padding, max_tissue = parse_args(args)
 
 print_flush("Opening series...")
 
-series = stdout_to_devnull(Series.openJser)(jser_fp)
+series = Series.openJser(jser_fp)
 
 print_flush("Series open...")
 
@@ -83,23 +77,6 @@ for n in sorted(list(series.sections.keys())):
 section = series.loadSection(sections[0])
 img_mag = section.mag
 
-## TODO: Validate Zarr container more appropriately
-if series.src_dir.endswith("zarr"):
-
-    img_scale_1 = os.path.join(series.src_dir, "scale_1", section.src)
-    h, w = zarr.open(img_scale_1).shape
-
-else:
-
-    img_fp = os.path.join(series.src_dir, section.src)
-    h, w, _ = cv2.imread(img_fp).shape
-
-
-img_corners = [(0, 0), (w, 0), (w, h), (0, h)]
-
-convert_microns = lambda x: x * img_mag
-img_corners = [list(map(convert_microns, elem)) for elem in img_corners]
-
 ## Determine if req all tissue or crop
 
 get_all = (bool(max_tissue) or not bool(groups))
@@ -108,27 +85,7 @@ get_all = (bool(max_tissue) or not bool(groups))
 
 if get_all:  # request all available tissue
 
-    x_mins, y_mins, x_maxs, y_maxs = ([], [], [], [])
-
-    for section in sections:
-
-        sec_tform = series.loadSection(section).tform
-        corners_transformed = sec_tform.map(img_corners)
-
-        x_vals, y_vals = list(zip(*corners_transformed))
-
-        x_mins.append(min(x_vals))
-        y_mins.append(min(y_vals))
-        
-        x_maxs.append(max(x_vals))
-        y_maxs.append(max(y_vals))
-
-    window = [
-        min(x_mins),                # x
-        min(y_mins),                # y 
-        max(x_maxs) - min(x_mins),  # w
-        max(y_maxs) - min(y_mins),  # h
-    ]
+    window = getTissueWindow(series, sections)
 
 else:  # request only around group(s)
 
@@ -144,13 +101,6 @@ additional_attrs = {
         
     }
 
-print_flush("Initializing pyqt...")
-
-if not QApplication.instance():
-
-    print_flush("Creating QApplication instance...")
-    app = QApplication(sys.argv)
-
 print_flush("Creating zarr...")
 
 zarr_fp = seriesToZarr(
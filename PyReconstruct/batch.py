@@ -0,0 +1,398 @@
+"""Run series operations without the GUI.
+
+Meant for scripts and scheduled jobs on machines without a display: nothing
+here creates a QApplication, progress is printed as plain text (one line per
+step when the output is not a terminal), and the work is spread across
+processes by the same process pools that the GUI uses.
+
+example call: PyReconstruct-batch export-csv my_series.jser --objects objects.csv
+"""
+
+import os
+import re
+import sys
+import argparse
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        prog="PyReconstruct-batch",
+        description="Run PyReconstruct series operations without the GUI",
+    )
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Maximum number of processes (default: from the cpu_max option)')
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ## export-csv
+    p = subparsers.add_parser("export-csv", help="Export object, trace, and/or ztrace data as CSV files")
+    p.add_argument("jser", type=str, help="The file path for the jser")
+    p.add_argument("--objects", type=str, default=None, help="Output file path for the object data")
+    p.add_argument("--traces", type=str, default=None, help="Output file path for the trace data")
+    p.add_argument("--ztraces", type=str, default=None, help="Output file path for the ztrace data")
+    p.set_defaults(func=export_csv)
+
+    ## export-meshes
+    p = subparsers.add_parser("export-meshes", help="Export 3D object meshes")
+    p.add_argument("jser", type=str, help="The file path for the jser")
+    p.add_argument("output", type=str, help="Output directory for the mesh files")
+    p.add_argument("--format", type=str, default="obj", choices=["obj", "off", "ply", "stl", "dae"], help="Mesh file format (default %(default)s)")
+    add_object_filters(p)
+    p.set_defaults(func=export_meshes)
+
+    ## export-zarr
+    p = subparsers.add_parser("export-zarr", help="Export the series images (and optionally groups as labels) to a neuroglancer-compatible zarr")
+    p.add_argument("jser", type=str, help="The file path for the jser")
+    p.add_argument("-o", "--output", type=str, default=None, help="Output zarr file path (default: next to the jser)")
+    p.add_argument("-s", "--start", type=int, default=None, help="The first section to include (default: second section in series to avoid calgrid)")
+    p.add_argument("-e", "--end", type=int, default=None, help="The last section to include (default: last section in series)")
+    p.add_argument("-g", "--groups", type=str, nargs="+", default=None, help="Object groups to export as labels (the zarr is cropped around them)")
+    p.add_argument("-p", "--padding", type=int, default=50, help="Padding (px) to include around group objects (default %(default)s px)")
+    p.add_argument("--max-tissue", action="store_true", help="Include all tissue even if groups are provided")
+    p.add_argument("--src-dir", type=str, default=None, help="Read the images from this directory instead of the image source directory of the series")
+    p.set_defaults(func=export_zarr)
+
+    ## delete-duplicates
+    p = subparsers.add_parser("delete-duplicates", help="Delete duplicate traces and save the series")
+    p.add_argument("jser", type=str, help="The file path for the jser")
+    p.add_argument("-t", "--threshold", type=float, default=0.95, help="Overlap threshold for duplicates (default %(default)s)")
+    p.add_argument("--include-locked", action="store_true", help="Also check the traces of locked objects")
+    p.add_argument("-o", "--output", type=str, default=None, help="Save to this jser instead of overwriting the input")
+    p.set_defaults(func=delete_duplicates)
+
+    ## import-traces
+    p = subparsers.add_parser("import-traces", help="Import the traces from another series and save the series")
+    p.add_argument("jser", type=str, help="The file path for the jser to import into")
+    p.add_argument("other", type=str, help="The file path for the jser to import from")
+    p.add_argument("-s", "--start", type=int, default=None, help="The first section to import (default: first section in series)")
+    p.add_argument("-e", "--end", type=int, default=None, help="The last section to import (default: last section in series)")
+    add_object_filters(p)
+    p.add_argument("-t", "--threshold", type=float, default=0.95, help="Overlap threshold for duplicates (default %(default)s)")
+    p.add_argument("--keep-above", type=str, default="self", choices=["self", "other", "none"], help="Series favored for duplicates (default %(default)s)")
+    p.add_argument("--keep-below", type=str, default="none", choices=["self", "other", "none"], help="Series favored for conflicts (default %(default)s)")
+    p.add_argument("--no-flags", action="store_true", help="Do not flag conflicts")
+    p.add_argument("--no-history", action="store_true", help="Do not check the history for conflicts")
+    p.add_argument("--no-attributes", action="store_true", help="Do not import object attributes")
+    p.add_argument("-o", "--output", type=str, default=None, help="Save to this jser instead of overwriting the input")
+    p.set_defaults(func=import_traces)
+
+    ## reindex
+    p = subparsers.add_parser("reindex", help="Rebuild the cached series data of a jser")
+    p.add_argument("jser", type=str, help="The file path for the jser")
+    p.set_defaults(func=reindex)
+
+    args = parser.parse_args(argv)
+
+    args.func(args)
+
+
+def add_object_filters(parser):
+    """Add the arguments that select objects."""
+
+    parser.add_argument("-r", "--regex", type=str, nargs="+", default=[], help="Only include objects with names matching these regular expressions")
+    parser.add_argument("-g", "--groups", type=str, nargs="+", default=[], help="Only include objects in these groups")
+
+
+def open_series(jser_fp, workers, modify=False):
+    """Open a jser file (exit if it cannot be opened).
+
+    A series with an existing hidden folder is open in another session (or
+    was not closed properly) and is not modified.
+    """
+    from PyReconstruct.modules.datatypes import Series
+
+    if not os.path.isfile(jser_fp):
+        sys.exit(f"File not found: {jser_fp}")
+
+    series = Series.openJser(jser_fp, workers)
+
+    if series is None:
+        sys.exit(f"Could not open: {jser_fp}")
+
+    if modify and series.leave_open:
+        sys.exit(f"{jser_fp} is open in another session (close it or remove its hidden folder first).")
+
+    return series
+
+
+def get_workers(series, workers):
+    """Get the number of processes to use for a series."""
+    from PyReconstruct.modules.backend.func import determine_cpus
+
+    return workers or determine_cpus(series.getOption("cpu_max"))
+
+
+def get_objects(series, regex_filters, group_filters):
+    """Get the objects that pass the regex and group filters."""
+
+    names = list(series.data["objects"].keys())
+
+    if regex_filters:
+        names = [n for n in names if any(re.fullmatch(r, n) for r in regex_filters)]
+
+    if group_filters:
+        group_objects = set()
+        for group in group_filters:
+            group_objects.update(series.object_groups.getGroupObjects(group))
+        names = [n for n in names if n in group_objects]
+
+    return names
+
+
+def export_csv(args):
+
+    series = open_series(args.jser, args.workers)
+
+    if not (args.objects or args.traces or args.ztraces):  # default to objects and traces next to the jser
+        base = os.path.splitext(args.jser)[0]
+        args.objects = base + "_objects.csv"
+        args.traces = base + "_traces.csv"
+
+    try:
+
+        if args.objects:
+            series.objects.exportCSV(args.objects)
+            print(f"Objects exported to: {args.objects}")
+
+        if args.traces:
+            series.data.exportTracesCSV(args.traces)
+            print(f"Traces exported to: {args.traces}")
+
+        if args.ztraces:
+            series.exportZtracesCSV(args.ztraces)
+            print(f"Ztraces exported to: {args.ztraces}")
+
+    finally:
+        series.close()
+
+
+def export_meshes(args):
+    from PyReconstruct.modules.backend.volume import export3DObjects
+
+    series = open_series(args.jser, args.workers)
+
+    try:
+
+        obj_names = get_objects(series, args.regex, args.groups)
+        os.makedirs(args.output, exist_ok=True)
+
+        export3DObjects(
+            series,
+            obj_names,
+            args.output,
+            args.format,
+            notify_user=False,
+            max_workers=get_workers(series, args.workers)
+        )
+        print(f"{len(obj_names)} object(s) exported to: {args.output}")
+
+    finally:
+        series.close()
+
+
+def export_zarr(args):
+    from PyReconstruct.modules.backend.autoseg import (
+        seriesToZarr,
+        seriesToLabels,
+        groupsToVolume,
+        getTissueWindow
+    )
+
+    series = open_series(args.jser, args.workers)
+
+    try:
+
+        workers = get_workers(series, args.workers)
+
+        all_sections = sorted(series.sections.keys())
+        start = args.start if args.start is not None else all_sections[min(1, len(all_sections) - 1)]  # steer clear of cal grid
+        end = args.end if args.end is not None else all_sections[-1]
+        sections = [n for n in all_sections if start <= n <= end]
+
+        if not sections:
+            sys.exit(f"No sections between {start} and {end}.")
+
+        # every group must have traced objects in the sections
+        if args.groups:
+            missing_groups = [g for g in args.groups if g not in series.object_groups.getGroupList()]
+            if missing_groups:
+                sys.exit("Group(s) not found in the series: " + ", ".join(missing_groups))
+            empty_groups = [
+                g for g in args.groups
+                if not any(
+                    start <= snum <= end
+                    for obj in series.object_groups.getGroupObjects(g)
+                    if obj in series.data["objects"]
+                    for snum in series.data["objects"][obj].traces
+                )
+            ]
+            if empty_groups:
+                sys.exit(f"No traces between sections {start} and {end} for group(s): " + ", ".join(empty_groups))
+
+        if args.src_dir:  # (not saved: the series is only read)
+            series.src_dir = os.path.abspath(args.src_dir)
+
+        # every image must be found (the source directory may be out of date)
+        if series.src_dir.endswith("zarr"):
+            img_dir = os.path.join(series.src_dir, "scale_1")
+        else:
+            img_dir = series.src_dir
+        missing = [
+            snum for snum in sections
+            if not os.path.exists(os.path.join(img_dir, series.data["sections"][snum]["src"]))
+        ]
+        if missing:
+            sys.exit(
+                f"Images not found in {img_dir} for section(s): " +
+                ", ".join(str(n) for n in missing) +
+                " (check the image source directory of the series or use --src-dir)."
+            )
+
+        img_mag = series.loadSection(sections[0]).mag
+        padding = args.padding * img_mag  # convert to μm
+
+        if args.groups and not args.max_tissue:  # only around the groups
+            window, _ = groupsToVolume(series, args.groups, padding)
+        else:
+            window = getTissueWindow(series, sections)
+
+        zarr_fp = seriesToZarr(
+            series,
+            sections,
+            img_mag,
+            window=window,
+            data_fp=args.output,
+            max_workers=workers
+        )
+
+        ## Add the groups as labels
+        if args.groups:
+
+            raw_section_bounds = [min(sections), max(sections)]
+
+            window_groups = groupsToVolume(
+                series,
+                args.groups,
+                padding,
+                restrict_to_sections=raw_section_bounds
+            )
+
+            section_diff = min(window_groups[1]) - raw_section_bounds[0]
+
+            for group in args.groups:
+
+                print(f"Converting group {group} to labels...", flush=True)
+
+                seriesToLabels(
+                    series,
+                    zarr_fp,
+                    group,
+                    window=window_groups,
+                    img_mag=img_mag,
+                    raw_window=window,
+                    section_diff=section_diff,
+                    max_workers=workers
+                )
+
+        print(f"Zarr exported to: {zarr_fp}")
+
+    finally:
+        series.close()
+
+
+def delete_duplicates(args):
+
+    series = open_series(args.jser, args.workers, modify=True)
+
+    try:
+
+        removed = series.deleteDuplicateTraces(
+            args.threshold,
+            args.include_locked,
+            max_workers=get_workers(series, args.workers)
+        )
+
+        for snum in removed:
+            print(f"Section {snum}: " + ", ".join(sorted(removed[snum])))
+
+        if removed:
+            series.saveJser(args.output)
+            print(f"Duplicate traces removed from {len(removed)} section(s).")
+        else:
+            print("No duplicate traces found.")
+
+    finally:
+        series.close()
+
+
+def import_traces(args):
+
+    series = open_series(args.jser, args.workers, modify=True)
+
+    try:
+
+        other = open_series(args.other, args.workers)
+
+        try:
+
+            all_sections = sorted(series.sections.keys())
+            start = args.start if args.start is not None else all_sections[0]
+            end = args.end if args.end is not None else all_sections[-1]
+
+            series.importTraces(
+                other,
+                (start, end + 1),
+                args.regex,
+                args.groups,
+                args.threshold,
+                flag_conflicts=not args.no_flags,
+                check_history=not args.no_history,
+                import_obj_attrs=not args.no_attributes,
+                keep_above="" if args.keep_above == "none" else args.keep_above,
+                keep_below="" if args.keep_below == "none" else args.keep_below,
+            )
+
+        finally:
+            other.close()
+
+        series.saveJser(args.output)
+        print(f"Traces imported from: {args.other}")
+
+    finally:
+        series.close()
+
+
+def reindex(args):
+    from PyReconstruct.modules.datatypes.data_cache import getCacheFp
+
+    sdir = os.path.dirname(args.jser)
+    sname = os.path.splitext(os.path.basename(args.jser))[0]
+    hidden_dir = os.path.join(sdir, f".{sname}")
+
+    # a series with a hidden folder is opened from that folder and not summarized again
+    if os.path.isdir(hidden_dir):
+        sys.exit(f"{args.jser} is open in another session (close it or remove its hidden folder first).")
+
+    ## Remove the cached section summaries so that every section is summarized again
+
+    cache_fp = getCacheFp(hidden_dir)
+
+    if os.path.isfile(cache_fp):
+        os.remove(cache_fp)
+
+    series = open_series(args.jser, args.workers)
+
+    try:
+
+        print(
+            f"{len(series.sections)} section(s), "
+            f"{len(series.data['objects'])} object(s), "
+            f"{len(series.data.trace_table)} trace(s) indexed."
+        )
+
+    finally:
+        series.close()
+
+
+if __name__ == '__main__':
+    main()
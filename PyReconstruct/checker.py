@@ -701,5 +701,31 @@ assert(len(field.section.contours["star"]) == 3)
 mainwindow.series.modified = False
 mainwindow.close()
 
+# TEST LABEL RASTERIZATION
+
+import numpy as np
+from PyReconstruct.modules.calc import rasterizeLabels
+
+square = np.array([[10, 10], [60, 10], [60, 60], [10, 60]], dtype=np.float64)
+shifted = square + 25
+window = [0, 0, 100, 100]  # one pixel per field unit
+
+# a single trace
+arr = rasterizeLabels([(1, False, square)], (100, 100), window)
+assert((arr == 1).sum() == 51 * 51)
+
+# duplicate traces with the same label do not cancel out
+arr = rasterizeLabels([(1, False, square), (1, False, square)], (100, 100), window)
+assert((arr == 1).sum() == 51 * 51)
+
+# overlapping traces with the same label leave no hole
+arr = rasterizeLabels([(1, False, square), (1, False, shifted)], (100, 100), window)
+assert((arr == 1).sum() == 2 * 51 * 51 - 26 * 26)
+
+# a negative trace clears its label
+hole = np.array([[20, 20], [30, 20], [30, 30], [20, 30]], dtype=np.float64)
+arr = rasterizeLabels([(1, False, square), (1, True, hole)], (100, 100), window)
+assert((arr == 1).sum() == 51 * 51 - 11 * 11)
+
 # delete the testing dir
 shutil.rmtree(testing_dir)
\ No newline at end of file
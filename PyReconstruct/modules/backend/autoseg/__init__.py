@@ -3,6 +3,7 @@ from .conversions import (
     seriesToLabels,
     labelsToObjects,
     groupsToVolume,
+    getTissueWindow,
     zarrToNewSeries,
     rechunk
 )
@@ -5,13 +5,14 @@ from pathlib import Path
 from datetime import datetime
 from typing import Union, List, Tuple
 
-import cv2
 import zarr
 
 from PyReconstruct.modules.datatypes import Series, Transform, Trace
-from PyReconstruct.modules.backend.view import SectionLayer
-from PyReconstruct.modules.backend.threading import ThreadPoolProgBar
-from PyReconstruct.modules.calc import colorize, reducePoints
+from PyReconstruct.modules.calc import colorize, getImgDims
+from PyReconstruct.modules.datatypes.progress import getProgbar
+
+from .zarr_export import exportImages, exportLabels, getSectionSource, resampleSection
+from .zarr_import import iterLabelContours
 
 
 dt = None
@@ -117,7 +118,7 @@ def groupsToVolume(series: Series, groups: list=None, padding: float=None, restr
         for group in groups:
             group_objects += series.object_groups.getGroupObjects(group)
 
-    for snum, section in series.enumerateSections():
+    for snum, section in series.enumerateObjectSections(group_objects):
 
         tform = section.tform
 
@@ -155,6 +156,38 @@ def groupsToVolume(series: Series, groups: list=None, padding: float=None, restr
     return window, sec_range
 
 
+def getTissueWindow(series : Series, sections : list) -> list:
+    """Get the window that contains all of the images on a set of sections.
+
+    Assumes that all of the images have the same dimensions and magnification
+    as the image on the first section.
+
+        Params:
+            series (Series): the series
+            sections (list): the section numbers
+        Returns:
+            [x position, y position, width, height]
+    """
+    section = series.loadSection(sections[0])
+
+    if series.src_dir.endswith("zarr"):
+        h, w = getImgDims(os.path.join(series.src_dir, "scale_1", section.src))[:2]
+    else:
+        h, w = getImgDims(os.path.join(series.src_dir, section.src))[:2]
+
+    img_corners = np.array([(0, 0), (w, 0), (w, h), (0, h)], dtype=np.float64) * section.mag
+
+    # map the corners with the transforms in the series data (the sections are not loaded)
+    corners = np.concatenate([
+        series.data["sections"][snum]["tforms"][series.alignment].mapArray(img_corners)
+        for snum in sections
+    ])
+    x, y = corners.min(axis=0).tolist()
+    x_max, y_max = corners.max(axis=0).tolist()
+
+    return [x, y, x_max - x, y_max - y]
+
+
 def createZarrName(window):
     """Return string representing a zarr file name"""
 
@@ -169,7 +202,8 @@ def seriesToZarr(series : Series,
                  data_fp: str = None,
                  output_dir: str = None,
                  other_attrs: dict = None,
-                 chunk_size: tuple = (1, 256, 256)):
+                 chunk_size: tuple = (1, 256, 256),
+                 max_workers: int = None):
     """Convert a series of images into a neuroglancer-compatible zarr.
     
         Params:
@@ -180,9 +214,10 @@ def seriesToZarr(series : Series,
             data_fp (str): filename of output zarr
             output_dir (str): directory to store zarr
             other_attrs (dict): other infoformation to store in .zattrs
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
 
         Returns:
-            the filepath for the zarr, the threadpool
+            the filepath for the zarr
     """
 
     ## Calculate field attributes
@@ -192,8 +227,6 @@ def seriesToZarr(series : Series,
         round(window[2]/mag)    # width
     )
 
-    pixmap_dim = shape[2], shape[1]  # the w and h of a 2D array
-
     ## Create zarr
     
     if not data_fp:  # if no data_fp provided, place with jser
@@ -245,21 +278,9 @@ def seriesToZarr(series : Series,
         for k, v in other_attrs.items():
             data_zg.attrs[k] = v
     
-    # create threadpool and interate through series
-    threadpool = ThreadPoolProgBar()
-    
-    for i, snum in enumerate(sections):
-        threadpool.createWorker(
-            exportSection,
-            data_zg,
-            snum,
-            series,
-            i,
-            window,
-            pixmap_dim
-        )
-        
-    threadpool.startAll("Converting series to zarr...")
+    # resample the images on a process pool (writing whole chunks)
+    progbar = getProgbar("Converting series to zarr...", cancel=False)
+    exportImages(series, sections, data_fp, "raw", window, max_workers, progbar=progbar)
 
     return data_fp
     
@@ -271,13 +292,15 @@ def seriesToLabels(series: Series,
                    img_mag: float = 0.00254,
                    chunk_size: tuple = (1, 256, 256),
                    raw_window=Union[List, None],
-                   section_diff: int=0):
+                   section_diff: int=0,
+                   max_workers: int = None):
     """Export contours as labels to an existing zarr.
     
         Params:
             series (Series): the series
             data_fp (str): the filepath for the zarr
             group (str): the group to export as labels (None if retraining)
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
     """
 
     # extract data from raw
@@ -313,7 +336,6 @@ def seriesToLabels(series: Series,
         round(window[3] / mag),
         round(window[2] / mag)
     )
-    pixmap_dim = shape[2], shape[1]  # the w and h of the 2D array
 
     if group:
         
@@ -343,25 +365,13 @@ def seriesToLabels(series: Series,
     data_zg[dataset_name].attrs["axis_names"] = ["z", "y", "x"]
     data_zg[dataset_name].attrs["units"] = ["nm", "nm", "nm"]
 
-    # create threadpool
-    threadpool = ThreadPoolProgBar()
-
-    for i, snum in enumerate(sections):
-        threadpool.createWorker(
-            exportTraces,
-            data_zg,
-            snum,
-            series,
-            group_or_tag,
-            is_group,
-            i,
-            window,
-            pixmap_dim,
-            del_group,
-            alignment[str(snum)]
-        )
+    # gather the traces in order and rasterize them on a process pool (writing whole chunks)
+    def gatherTraces(snum):
+        traces = getLabelTraces(series, snum, group_or_tag, is_group, del_group)
+        return traces, Transform(alignment[str(snum)])
 
-    threadpool.startAll("Converting contours to zarr...")
+    progbar = getProgbar("Converting contours to zarr...", cancel=False)
+    exportLabels(series, sections, data_fp, dataset_name, window, gatherTraces, max_workers, progbar=progbar)
 
     if del_group:
         series.object_groups.removeGroup(del_group)
@@ -375,49 +385,19 @@ def labelsToObjects(series : Series, data_fp : str, group : str, labels : list =
             data_zg (str): the filepath for the zarr group
             group (str): the name of the group with labels of interest
             labels (list): the labels to import (will import all if None)
-        Returns:
-            the threadpool
     """
     data_zg = zarr.open(data_fp)
     if group not in data_zg:
         return
     
-    sections = data_zg["raw"].attrs["sections"]
+    n = min(data_zg[group].shape[0], len(data_zg["raw"].attrs["sections"]))
 
-    # create threadpool and iterate through sections
+    # extract the contours on a process pool and add them as they are finished
     setDT()
-    threadpool = ThreadPoolProgBar()
-    for snum in sections:
-        threadpool.createWorker(
-            importSection,
-            data_zg,
-            group,
-            snum,
-            series,
-            labels
-        )
-    threadpool.startAll("Converting labels to contours...")
-
-
-def getExteriors(mask : np.ndarray) -> list[np.ndarray]:
-    """Get the exteriors from a mask.
-    
-        Params:
-            mask (np.ndarray): the mask to extract exteriors from
-        Returns:
-            (list[np.ndarray]): the list of exteriors
-    """
-    cv_detected, hierarchy = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-    exteriors = []
-    for e in cv_detected:
-        e = e[:,0,:]
-        # invert the y axis
-        e[:,1] *= -1
-        e[:,1] += mask.shape[0]
-        # reduce the points
-        e = reducePoints(e, array=True)
-        exteriors.append(e)
-    return exteriors
+    progbar = getProgbar("Converting labels to contours...", cancel=False)
+    for i, (snum, contours) in enumerate(iterLabelContours(series, data_fp, group, labels)):
+        importSection(series, snum, contours)
+        progbar.setValue((i + 1) / n * 100)
 
 
 def exportSection(data_zg,
@@ -436,48 +416,33 @@ def exportSection(data_zg,
             window (list): the frame for the raw export
             pixmap_dim (tuple): the w and h in pixels for the arr output
     """
-    # print(f"Section {snum} exporting started")
-    section = series.loadSection(snum)
-    slayer = SectionLayer(section, series)
-
-    arr = slayer.generateImageArray(
-        pixmap_dim, 
-        window
+    data_zg["raw"][z] = resampleSection(
+        getSectionSource(series, snum),
+        window,
+        (pixmap_dim[1], pixmap_dim[0])
     )
-    data_zg["raw"][z] = arr
-    # print(f"Section {snum} exporting finished")
 
 
-def exportTraces(data_zg,
-                 snum : int,
-                 series : Series,
-                 group_or_tag : str,
-                 is_group : bool,
-                 z : int,
-                 window : list,
-                 pixmap_dim : tuple,
-                 del_group : str = None,
-                 tform_list=None):
-    """Export the traces as labels for a single section.
+def getLabelTraces(series : Series,
+                   snum : int,
+                   group_or_tag : str,
+                   is_group : bool,
+                   del_group : str = None) -> list:
+    """Gather the traces to export as labels for a single section.
+
+    If retraining (is_group is False), the contours of del_group are also
+    removed from the section and the tagged traces are added back as hidden.
     
         Params:
-            data_zg: the zarr group
-            snum (int): the section number
             series (Series): the series
+            snum (int): the section number
             group_or_tag (str): the group or tag to include as labels
             is_group (bool): True if the previous entry is a group, False if tag
-            z (int): the z position of the section in the zarr
-            window (list): the frame for the raw export
-            pixmap_dim (tuple): the w and h in pixels for the arr output
             del_group (str): the group to delete
-            tform_list (list): the transform to apply to the traces
+        Returns:
+            (list[Trace]): the traces to draw (in drawing order)
     """
     section = series.loadSection(snum)
-    slayer = SectionLayer(section, series, load_image_layer=False)
-    if tform_list:
-        tform = Transform(tform_list)
-    else:
-        tform = None
 
     # gather the traces
     traces = []
@@ -493,13 +458,6 @@ def exportTraces(data_zg,
                 for trace in section.contours[cname]:
                     if tag in trace.tags:
                         traces.append(trace)
-    
-    data_zg[f"labels_{group_or_tag}"][z] = slayer.generateLabelsArray(
-            pixmap_dim,
-            window,
-            traces,
-            tform=tform
-    )
 
     # delete group if requested
     if not is_group:
@@ -507,125 +465,38 @@ def exportTraces(data_zg,
             for cname in series.object_groups.getGroupObjects(del_group):
                 if cname in section.contours:
                     del(section.contours[cname])
+                    section.modified_contours.add(cname)
+            section.invalidateTraceIndex()
             # add the traces of interest back in
             for trace in traces:
                 trace.setHidden(True)
                 section.addTrace(trace)
             section.save()
 
+    return traces
+
 
-def importSection(data_zg, group, snum, series, ids=None):
-    """Import label data for a single section.
+def importSection(series : Series, snum : int, contours : dict):
+    """Add the label contours for a single section as traces.
     
         Params:
-            data_zg: the zarr group
-            group: the name of the zarr group with data to import
-            snum (int): the section number
             series (Series): the series
-            ids (list): the ids to include in importing
+            snum (int): the section number
+            contours (dict): label : list of field points (from iterLabelContours)
     """
-    # get relevant information from zarr
-    labels = data_zg[group]
-    resolution = labels.attrs["resolution"]
-    try:
-        offset = labels.attrs["offset"]
-    except KeyError:
-        offset = [0, 0, 0]
-
-
-    raw = data_zg["raw"]
-    raw_resolution = raw.attrs["resolution"]
-    try:
-        raw_offset = raw.attrs["offset"]
-    except KeyError:
-        raw_offset = [0, 0, 0]
-
-    window = raw.attrs["window"]
-    sections = raw.attrs["sections"]
-    mag = raw.attrs["true_mag"] / raw_resolution[-1] * resolution[-1]
-    alignment = raw.attrs["alignment"]
-    tform = Transform(alignment[str(snum)])
-
-    # check if section was segmented
-    z = sections.index(snum)
-    if not 0 <= z < labels.shape[0]:
-        print(f"Section {snum} importing finished")
-        return
-    # load the section and data
     section = series.loadSection(snum)
-    arr = labels[z]
-    
-    pixmap_dim = (arr.shape[1], arr.shape[0])
-
-    # modify the window to adjust for offset and resolution
-    zarr_window = window.copy()
-
-    field_offset_x = (offset[2] / resolution[2] - raw_offset[2] / raw_resolution[2]) * mag
-    field_offset_y = (offset[1] / resolution[1] - raw_offset[2] / raw_resolution[2]) * mag
-    field_width = pixmap_dim[0] * mag
-    field_height = pixmap_dim[1] * mag
 
-    zarr_window[0] += field_offset_x
-    zarr_window[1] += field_offset_y
-    zarr_window[2] = field_width
-    zarr_window[3] = field_height
-
-    # # exclude areas that already have good traces (TEMPORARILY REMOVED)
-
-    # # get groups/tags that are good
-    # gts = []
-    # for zg in data_zg:
-    #     if zg.startswith("labels_"):
-    #         gts.append(zg[len("labels_"):])
-        
-    # # gather traces with these groups or tags
-    # traces = []
-    # for trace in section.tracesAsList():
-    #     for tag in trace.tags:
-    #         if tag in gts:
-    #             traces.append(trace)
-    #             continue
-    #     for g in gts:
-    #         if trace.name in series.object_groups.getGroupObjects(g):
-    #             traces.append(trace)
-
-    # slayer = SectionLayer(section, series, load_image_layer=False)
-    # exclude_arr = slayer.generateLabelsArray(
-    #     pixmap_dim,
-    #     zarr_window,
-    #     traces,
-    #     tform
-    # )
-    # arr[exclude_arr != 0] = 0
-
-    # iterate through label ids
-    if ids is None:
-        ids = np.unique(arr)
-    for id in ids:
-        if id == 0:
-            continue
-        # get exteriors for the label
-        exteriors = getExteriors(arr == id)
-        for ext in exteriors:
-            # convert to float
-            ext = ext.astype(np.float64)
-            # add offset to coordinates
-            ext[:,0] += offset[2] / resolution[2]
-            ext[:,1] += offset[1] / resolution[1]
-            # scale to actual coordinates
-            ext *= mag
-            # add origin
-            ext[:,0] += window[0]
-            ext[:,1] += window[1]
-            # apply reverse transform
-            trace_points = tform.map(ext.tolist(), inverted=True)          
+    for id, exteriors in contours.items():
+        name = f"autoseg_{id}"
+        color = tuple(map(int, colorize(id)))
+        for points in exteriors:
             # create the trace and add to section
-            trace = Trace(name=f"autoseg_{id}", color=tuple(map(int, colorize(id))))
-            trace.points = trace_points
+            trace = Trace(name=name, color=color)
+            trace.points = list(map(tuple, points.tolist()))
             trace.fill_mode = ("transparent", "unselected")
             section.addTrace(trace)
         # add trace to group
-        series.object_groups.add(f"seg_{dt}", f"autoseg_{id}")
+        series.object_groups.add(f"seg_{dt}", name)
 
     section.save()
 
@@ -0,0 +1,383 @@
+"""Export section images to a zarr without Qt.
+
+Each section image is resampled through the section transform with a single
+cv2.warpAffine call per block of output rows, reading only the region of the
+source it needs (from the best zarr scale level when the images are in a
+zarr). Work is split into tasks of whole output chunks (a z-chunk of sections
+by a band of chunk rows) so that tasks on a process pool never write to the
+same chunk. Labels are rasterized the same way: the traces for a z-chunk of
+sections are gathered in the main process and filled one polygon at a time
+with a scanline fill in a worker (see fillPolygons in calc/labels.py).
+"""
+
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import cv2
+import zarr
+
+from PyReconstruct.modules.datatypes import Series, Transform
+from PyReconstruct.modules.datatypes.parallel_open import InlineExecutor
+from PyReconstruct.modules.calc import labelTraces, rasterizeLabels
+from PyReconstruct.modules.backend.func import determine_cpus
+
+BAND_PIXELS = 2**24  # target number of output pixels read and written by a task
+
+
+def getSectionSource(series : Series, snum : int) -> dict:
+    """Get the picklable information needed to resample a section image.
+
+        Params:
+            series (Series): the series containing the section
+            snum (int): the section number
+        Returns:
+            (dict): the image source, magnification, transform, brightness and contrast
+    """
+    section = series.loadSection(snum)
+    is_zarr = series.src_dir.endswith("zarr")
+    return {
+        "is_zarr": is_zarr,
+        "src_dir": series.src_dir,
+        "src": section.src,
+        "scales": sorted(section.zarr_scales) if is_zarr else [1],
+        "mag": section.mag,
+        "tform": section.tform.getList(),
+        "brightness": section.brightness,
+        "contrast": section.contrast
+    }
+
+
+def bcTable(brightness : float, contrast : float) -> np.ndarray:
+    """Get the lookup table that applies brightness and contrast (as drawn in the field).
+
+        Params:
+            brightness (float): the brightness (-100 to 100)
+            contrast (float): the contrast (-100 to 100)
+        Returns:
+            (np.ndarray): the uint8 lookup table
+    """
+    v = np.arange(256, dtype=np.float64) / 255
+    overlay = lambda d : np.where(d < 0.5, 2 * d * d, 1 - 2 * (1 - d) ** 2)
+
+    # brightness: white or black drawn over the image
+    b = brightness / 100
+    v = v * (1 - abs(b)) + (abs(b) if b >= 0 else 0)
+
+    # contrast: image overlaid on itself, or gray drawn over the image
+    if contrast >= 0:
+        overlays = contrast / 20
+        for _ in range(int(overlays)):
+            v = overlay(v)
+        opacity = overlays % 1
+        if opacity > 0:
+            v = v * (1 - opacity) + overlay(v) * opacity
+    else:
+        opacity = abs(contrast) / 100
+        v = v * (1 - opacity) + 128 / 255 * opacity
+
+    return np.clip(np.rint(v * 255), 0, 255).astype(np.uint8)
+
+
+def toGray(img : np.ndarray) -> np.ndarray:
+    """Convert an image read by OpenCV to an 8-bit single channel (red for color images)."""
+    if img.ndim == 3:
+        img = img[:,:,2] if img.shape[2] >= 3 else img[:,:,0]
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+    elif img.dtype != np.uint8:
+        img = np.clip(img, 0, 255).astype(np.uint8)
+    return img
+
+
+def readSource(source : dict, level : int):
+    """Open a section image at a scale level.
+
+        Params:
+            source (dict): from getSectionSource
+            level (int): the requested scale level
+        Returns:
+            (array-like): the image (zarr array or numpy array, None if not found)
+            (int): the scale level of the returned image
+            (int): the full resolution height of the image
+    """
+    if source["is_zarr"]:
+        if not source["scales"]:
+            return None, 1, 0
+        zg = zarr.open(source["src_dir"], "r")
+        full_h = zg[f"scale_{source['scales'][0]}"][source["src"]].shape[0] * source["scales"][0]
+        level = max([s for s in source["scales"] if s <= level] or source["scales"][:1])
+        return zg[f"scale_{level}"][source["src"]], level, full_h
+
+    img = cv2.imread(os.path.join(source["src_dir"], source["src"]), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return None, 1, 0
+    img = toGray(img)
+    full_h = img.shape[0]
+    if level > 1:
+        img = cv2.resize(
+            img,
+            (math.ceil(img.shape[1] / level), math.ceil(img.shape[0] / level)),
+            interpolation=cv2.INTER_AREA
+        )
+    return img, level, full_h
+
+
+def resampleSection(source : dict, window : list, shape : tuple, rows : tuple = None) -> np.ndarray:
+    """Resample a section image onto an output grid.
+
+        Params:
+            source (dict): from getSectionSource
+            window (list): the x, y, w, and h of the output in field coordinates
+            shape (tuple): the h and w of the full output in pixels
+            rows (tuple): the first and last (exclusive) output rows to generate (default: all)
+        Returns:
+            (np.ndarray): the uint8 image for the output rows
+    """
+    h, w = shape
+    r0, r1 = rows if rows else (0, h)
+    out = np.zeros((r1 - r0, w), dtype=np.uint8)
+
+    wx, wy, ww, wh = window
+    k = w / ww  # output pixels per field unit
+    mag = source["mag"]
+
+    # output pixels per full resolution image pixel
+    s = k * mag * math.sqrt(abs(np.linalg.det(Transform(source["tform"]).matrix[:2,:2])))
+    level = 1
+    while level * 2 <= 1 / s:
+        level *= 2
+    img, level, full_h = readSource(source, level)
+    if img is None:
+        return out
+
+    # output pixel (corner convention) -> field -> untransformed field -> image pixel at level
+    screen_to_field = np.array([
+        [1 / k, 0, wx],
+        [0, -1 / k, wy + h / k],
+        [0, 0, 1]
+    ])
+    field_to_image = np.array([
+        [1 / (mag * level), 0, 0],
+        [0, -1 / (mag * level), full_h / level],
+        [0, 0, 1]
+    ])
+    M = field_to_image @ Transform(source["tform"]).inverse_matrix @ screen_to_field
+    # pixel centers: shift the output rows and convert to center convention
+    M = M @ np.array([[1, 0, 0.5], [0, 1, r0 + 0.5], [0, 0, 1]])
+    M[:2,2] -= 0.5
+
+    # only read the part of the source that is needed
+    corners = M[:2] @ np.array([
+        [0, w, w, 0],
+        [0, 0, r1 - r0, r1 - r0],
+        [1, 1, 1, 1]
+    ])
+    ih, iw = img.shape[:2]
+    x0 = max(math.floor(corners[0].min()) - 1, 0)
+    y0 = max(math.floor(corners[1].min()) - 1, 0)
+    x1 = min(math.ceil(corners[0].max()) + 2, iw)
+    y1 = min(math.ceil(corners[1].max()) + 2, ih)
+    if x0 >= x1 or y0 >= y1:
+        return out
+    crop = toGray(np.asarray(img[y0:y1, x0:x1]))
+    M[0,2] -= x0
+    M[1,2] -= y0
+
+    cv2.warpAffine(
+        crop,
+        M[:2],
+        (w, r1 - r0),
+        dst=out,
+        flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=0
+    )
+
+    # brightness and contrast (only drawn over the image)
+    table = bcTable(source["brightness"], source["contrast"])
+    if table[0] == 0:
+        out = table[out]
+    else:
+        footprint = cv2.warpAffine(
+            np.full(crop.shape, 255, dtype=np.uint8),
+            M[:2],
+            (w, r1 - r0),
+            flags=cv2.INTER_NEAREST | cv2.WARP_INVERSE_MAP,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=0
+        ).astype(bool)
+        out[footprint] = table[out[footprint]]
+
+    return out
+
+
+def exportBlock(data_fp : str, dataset : str, sources : list, z0 : int, rows : tuple, window : list, shape : tuple) -> int:
+    """Resample a block of sections and rows and write it to the zarr.
+
+    Only uses picklable arguments so that it can be run in a worker process.
+
+        Params:
+            data_fp (str): the filepath for the zarr
+            dataset (str): the name of the dataset to write to
+            sources (list): the section sources (from getSectionSource) for the block
+            z0 (int): the z index of the first section in the block
+            rows (tuple): the first and last (exclusive) rows of the block
+            window (list): the x, y, w, and h of the output in field coordinates
+            shape (tuple): the h and w of the full output in pixels
+        Returns:
+            (int): the number of sections written
+    """
+    block = np.stack([
+        resampleSection(source, window, shape, rows)
+        for source in sources
+    ])
+    zarr.open(data_fp, "r+")[dataset][z0:z0 + len(sources), rows[0]:rows[1]] = block
+    return len(sources)
+
+
+def exportImages(series : Series, sections : list, data_fp : str, dataset : str, window : list, max_workers : int = None, progbar=None):
+    """Export the section images into an existing zarr dataset.
+
+        Params:
+            series (Series): the series
+            sections (list): the sections to export (in zarr order)
+            data_fp (str): the filepath for the zarr
+            dataset (str): the name of the dataset (z, y, x) to write to
+            window (list): the x, y, w, and h of the output in field coordinates
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
+            progbar: the progress bar to update (optional)
+    """
+    arr = zarr.open(data_fp, "r")[dataset]
+    _, h, w = arr.shape
+    cz, cy, _ = arr.chunks
+
+    sources = [getSectionSource(series, snum) for snum in sections]
+
+    # rows in a task: whole chunk rows, all rows if the full image is read anyway
+    if sources and not sources[0]["is_zarr"]:
+        band = h
+    else:
+        band = max(BAND_PIXELS // max(w * cz, 1) // cy, 1) * cy
+
+    tasks = []
+    for z0 in range(0, len(sections), cz):
+        for r0 in range(0, h, band):
+            tasks.append((
+                data_fp,
+                dataset,
+                sources[z0:z0 + cz],
+                z0,
+                (r0, min(r0 + band, h)),
+                window,
+                (h, w)
+            ))
+
+    executor = getExecutor(series, len(tasks), max_workers)
+    try:
+        futures = [executor.submit(exportBlock, *task) for task in tasks]
+        for i, future in enumerate(as_completed(futures)):
+            future.result()
+            if progbar:
+                progbar.setValue((i + 1) / len(futures) * 100)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def getExecutor(series : Series, n_tasks : int, max_workers : int = None):
+    """Return the executor used to run export tasks.
+
+        Params:
+            series (Series): the series (for the cpu_max option)
+            n_tasks (int): the number of tasks
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
+    """
+    if max_workers is None:
+        max_workers = determine_cpus(series.getOption("cpu_max"))
+    if max_workers <= 1 or n_tasks <= 1:
+        return InlineExecutor()
+    # spawn rather than fork: the GUI process may be running other threads
+    return ProcessPoolExecutor(
+        max_workers=min(max_workers, n_tasks),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def exportLabelBlock(data_fp : str, dataset : str, section_labels : list, tforms : list, z0 : int, window : list, shape : tuple) -> int:
+    """Rasterize the labels for a block of sections and write it to the zarr.
+
+    Only uses picklable arguments so that it can be run in a worker process.
+
+        Params:
+            data_fp (str): the filepath for the zarr
+            dataset (str): the name of the dataset to write to
+            section_labels (list): the label traces (from labelTraces) for each section in the block
+            tforms (list): the transform (as a list) for each section in the block
+            z0 (int): the z index of the first section in the block
+            window (list): the x, y, w, and h of the output in field coordinates
+            shape (tuple): the h and w of the output in pixels
+        Returns:
+            (int): the number of sections written
+    """
+    arr = zarr.open(data_fp, "r+")[dataset]
+    block = np.zeros((len(section_labels),) + tuple(shape), dtype=arr.dtype)
+    for labels, tform_list, out in zip(section_labels, tforms, block):
+        rasterizeLabels(
+            labels,
+            shape,
+            window,
+            tform=Transform(tform_list) if tform_list else None,
+            out=out
+        )
+    arr[z0:z0 + len(section_labels)] = block
+    return len(section_labels)
+
+
+def exportLabels(series : Series, sections : list, data_fp : str, dataset : str, window : list, gatherTraces, max_workers : int = None, progbar=None):
+    """Export traces as labels into an existing zarr dataset.
+
+    The traces for each z-chunk are gathered in this process and rasterized on
+    the executor while the next z-chunk is being gathered.
+
+        Params:
+            series (Series): the series
+            sections (list): the sections to export (in zarr order)
+            data_fp (str): the filepath for the zarr
+            dataset (str): the name of the dataset (z, y, x) to write to
+            window (list): the x, y, w, and h of the output in field coordinates
+            gatherTraces (function): returns the traces (in drawing order) and the Transform for a section number
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
+            progbar: the progress bar to update (optional)
+    """
+    arr = zarr.open(data_fp, "r")[dataset]
+    _, h, w = arr.shape
+    cz = arr.chunks[0]
+
+    n_tasks = math.ceil(len(sections) / cz)
+    executor = getExecutor(series, n_tasks, max_workers)
+    try:
+        futures = []
+        for z0 in range(0, len(sections), cz):
+            section_labels, tforms = [], []
+            for snum in sections[z0:z0 + cz]:
+                traces, tform = gatherTraces(snum)
+                section_labels.append(labelTraces(traces))
+                tforms.append(tform.getList() if tform else None)
+            futures.append(executor.submit(
+                exportLabelBlock,
+                data_fp,
+                dataset,
+                section_labels,
+                tforms,
+                z0,
+                window,
+                (h, w)
+            ))
+        for i, future in enumerate(as_completed(futures)):
+            future.result()
+            if progbar:
+                progbar.setValue((i + 1) / len(futures) * 100)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,157 @@
+"""Extract label contours from a zarr without Qt.
+
+Each task reads one z-chunk of a labels dataset, relabels it densely and finds
+the bounding box of every label in one pass (scipy.ndimage.find_objects), so
+contours are only traced inside the crop of each label instead of over the
+full section once per label. Contour points are converted to field
+coordinates and untransformed as whole arrays. Tasks only take picklable
+arguments so that they can run on a process pool.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import cv2
+import zarr
+from scipy import ndimage
+
+from PyReconstruct.modules.datatypes import Series, Transform
+from PyReconstruct.modules.datatypes.parallel_open import InlineExecutor
+from PyReconstruct.modules.calc import reducePoints
+from PyReconstruct.modules.backend.func import determine_cpus
+
+
+def getLabelExteriors(arr : np.ndarray, ids : list = None) -> dict:
+    """Get the exteriors of each label in a 2D label array.
+
+        Params:
+            arr (np.ndarray): the label array
+            ids (list): the labels to include (all if None)
+        Returns:
+            (dict): label : list of (N, 2) integer exteriors (y axis inverted)
+    """
+    h = arr.shape[0]
+    uniq, dense = np.unique(arr, return_inverse=True)
+    dense = dense.reshape(arr.shape).astype(np.int32)
+    if ids is not None:
+        keep = np.isin(uniq, np.asarray(ids, dtype=uniq.dtype))
+    else:
+        keep = np.ones(len(uniq), dtype=bool)
+    keep &= uniq != 0
+
+    exteriors = {}
+    for i, slc in enumerate(ndimage.find_objects(dense), start=1):
+        if slc is None or not keep[i]:
+            continue
+        y0, x0 = slc[0].start, slc[1].start
+        # pad so that contours touching the crop edge are traced the same way
+        mask = np.pad((dense[slc] == i).view(np.uint8), 1)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        label_exteriors = []
+        for e in contours:
+            e = e[:,0,:]
+            e[:,0] += x0 - 1
+            e[:,1] += y0 - 1
+            # invert the y axis
+            e[:,1] *= -1
+            e[:,1] += h
+            # reduce the points
+            label_exteriors.append(reducePoints(e, array=True))
+        exteriors[uniq[i].item()] = label_exteriors
+
+    return exteriors
+
+
+def importBlock(data_fp : str, group : str, z0 : int, z1 : int, ids : list = None) -> list:
+    """Get the field contours for each label in a block of sections.
+
+    Only uses picklable arguments so that it can be run in a worker process.
+
+        Params:
+            data_fp (str): the filepath for the zarr
+            group (str): the name of the labels dataset
+            z0 (int): the first z index of the block
+            z1 (int): the last z index (exclusive) of the block
+            ids (list): the labels to include (all if None)
+        Returns:
+            (list): (section number, {label : list of (N, 2) field points}) for each section
+    """
+    data_zg = zarr.open(data_fp, "r")
+    labels = data_zg[group]
+    resolution = labels.attrs["resolution"]
+    offset = labels.attrs.get("offset", [0, 0, 0])
+
+    raw = data_zg["raw"]
+    raw_resolution = raw.attrs["resolution"]
+    window = raw.attrs["window"]
+    sections = raw.attrs["sections"]
+    mag = raw.attrs["true_mag"] / raw_resolution[-1] * resolution[-1]
+    alignment = raw.attrs["alignment"]
+
+    # pixel -> field (before the inverse transform)
+    shift = np.array([
+        offset[2] / resolution[2] * mag + window[0],
+        offset[1] / resolution[1] * mag + window[1]
+    ])
+
+    block = labels[z0:z1]
+    results = []
+    for z, arr in enumerate(block, start=z0):
+        snum = sections[z]
+        tform = Transform(alignment[str(snum)])
+        contours = {}
+        for label, exteriors in getLabelExteriors(arr, ids).items():
+            contours[label] = [
+                tform.mapArray(ext * mag + shift, inverted=True)
+                for ext in exteriors
+            ]
+        results.append((snum, contours))
+
+    return results
+
+
+def iterLabelContours(series : Series, data_fp : str, group : str, ids : list = None, max_workers : int = None):
+    """Extract the contours of the labels in a zarr, yielding each section as it is finished.
+
+    Sections are not yielded in order.
+
+        Params:
+            series (Series): the series (for the cpu_max option)
+            data_fp (str): the filepath for the zarr
+            group (str): the name of the labels dataset
+            ids (list): the labels to include (all if None)
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
+        Yields:
+            (int): the section number
+            (dict): label : list of (N, 2) field points
+    """
+    data_zg = zarr.open(data_fp, "r")
+    labels = data_zg[group]
+    n = min(labels.shape[0], len(data_zg["raw"].attrs["sections"]))
+    cz = labels.chunks[0]
+
+    tasks = [(data_fp, group, z0, min(z0 + cz, n), ids) for z0 in range(0, n, cz)]
+
+    if max_workers is None:
+        max_workers = determine_cpus(series.getOption("cpu_max"))
+    if max_workers <= 1 or len(tasks) <= 1:
+        executor = InlineExecutor()
+    else:
+        # spawn rather than fork: the GUI process may be running other threads
+        executor = ProcessPoolExecutor(
+            max_workers=min(max_workers, len(tasks)),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    try:
+        # inline tasks are run as they are submitted
+        if isinstance(executor, InlineExecutor):
+            futures = (executor.submit(importBlock, *task) for task in tasks)
+        else:
+            futures = as_completed([executor.submit(importBlock, *task) for task in tasks])
+        for future in futures:
+            yield from future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
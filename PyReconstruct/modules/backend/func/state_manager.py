@@ -1,7 +1,12 @@
 import os
 import json
 import time
+import zlib
+import pickle
 from copy import deepcopy
+from collections import OrderedDict
+
+import numpy as np
 
 from PyReconstruct.modules.datatypes import (
     Series,
@@ -11,6 +16,282 @@ from PyReconstruct.modules.datatypes import (
     Trace
 )
 
+EVICT_FRACTION = 0.1  # fraction of the state limit evicted at once (so the base state is not rebuilt on every action)
+MAX_PACKS = 4  # pack files on disk before they are compacted into one
+
+class StateStore():
+
+    def __init__(self, series : Series = None):
+        """Create the store for compressed undo state data.
+
+        Data is reference counted (unchanged traces are shared between
+        states) and kept in memory until the undo_memory_mb budget is
+        reached, after which the oldest data is written to pack files in the
+        hidden series directory. A pack is deleted once none of its data is
+        used, and the packs are compacted into one when there are too many
+        of them or most of their data is no longer used.
+        
+            Params:
+                series (Series): the series (no budget if None)
+        """
+        self.series = series
+        self.blobs = OrderedDict()  # key : compressed bytes in memory (oldest first)
+        self.refs = {}  # key : number of users of the data
+        self.packed = {}  # key : (pack number, offset, length) for data written to disk
+        self.pack_counts = {}  # pack number : number of keys still used in the pack
+        self.pack_bytes = {}  # pack number : [bytes still used, bytes written]
+        self.memory_bytes = 0
+        self.next_key = 0
+        self.next_pack = 0
+    
+    def getPackFp(self, pack : int) -> str:
+        """Return the filepath for a pack of data written to disk.
+        
+            Params:
+                pack (int): the pack number
+        """
+        return os.path.join(self.series.hidden_dir, f"undo_{pack}.state")
+    
+    def put(self, data : bytes) -> int:
+        """Compress and store data (with one reference).
+        
+            Params:
+                data (bytes): the data to store
+            Returns:
+                (int): the key for the data
+        """
+        key = self.next_key
+        self.next_key += 1
+        blob = zlib.compress(data, 1)
+        self.blobs[key] = blob
+        self.refs[key] = 1
+        self.memory_bytes += len(blob)
+        self.spill()
+        return key
+    
+    def putObject(self, obj) -> int:
+        """Pickle, compress and store an object (with one reference).
+        
+            Params:
+                obj: the picklable object to store
+            Returns:
+                (int): the key for the data
+        """
+        return self.put(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    
+    def get(self, key : int) -> bytes:
+        """Return the data for a key.
+        
+            Params:
+                key (int): the key from put
+        """
+        if key in self.blobs:
+            blob = self.blobs[key]
+        else:
+            pack, offset, length = self.packed[key]
+            with open(self.getPackFp(pack), "rb") as f:
+                f.seek(offset)
+                blob = f.read(length)
+        return zlib.decompress(blob)
+    
+    def getObject(self, key : int):
+        """Return the object for a key (a new copy each time).
+        
+            Params:
+                key (int): the key from putObject
+        """
+        return pickle.loads(self.get(key))
+    
+    def incref(self, key : int):
+        """Add a reference to the data for a key.
+        
+            Params:
+                key (int): the key from put
+        """
+        self.refs[key] += 1
+    
+    def discard(self, key : int):
+        """Remove a reference to the data for a key (removes the data if it is no longer used).
+        
+            Params:
+                key (int): the key from put
+        """
+        self.refs[key] -= 1
+        if self.refs[key] > 0:
+            return
+        del(self.refs[key])
+        if key in self.blobs:
+            self.memory_bytes -= len(self.blobs.pop(key))
+        else:
+            pack, _, length = self.packed.pop(key)
+            self.pack_counts[pack] -= 1
+            self.pack_bytes[pack][0] -= length
+            if self.pack_counts[pack] == 0:
+                self.removePack(pack)
+    
+    def removePack(self, pack : int):
+        """Delete a pack file.
+        
+            Params:
+                pack (int): the pack number
+        """
+        del(self.pack_counts[pack])
+        del(self.pack_bytes[pack])
+        fp = self.getPackFp(pack)
+        if os.path.isfile(fp):
+            os.remove(fp)
+    
+    def spill(self):
+        """Write the oldest data to disk if the memory is over budget (down to half of the budget)."""
+        if self.series is None:
+            return
+        budget = self.series.getOption("undo_memory_mb") * 2**20
+        if self.memory_bytes <= budget:
+            return
+
+        # rewrite the data still used in the existing packs if they are too many or mostly unused
+        used = sum(b[0] for b in self.pack_bytes.values())
+        written = sum(b[1] for b in self.pack_bytes.values())
+        compact = len(self.pack_counts) >= MAX_PACKS or written > 2 * used
+        old_packs = list(self.pack_counts) if compact else []
+
+        pack = self.next_pack
+        self.next_pack += 1
+        self.pack_counts[pack] = 0
+        self.pack_bytes[pack] = [0, 0]
+        offset = 0
+        with open(self.getPackFp(pack), "wb") as f:
+            def write(key, blob):
+                nonlocal offset
+                f.write(blob)
+                self.packed[key] = (pack, offset, len(blob))
+                self.pack_counts[pack] += 1
+                self.pack_bytes[pack][0] += len(blob)
+                self.pack_bytes[pack][1] += len(blob)
+                offset += len(blob)
+            
+            for old_pack in old_packs:
+                old_keys = sorted(
+                    (k for k, (p, _, _) in self.packed.items() if p == old_pack),
+                    key=lambda k: self.packed[k][1]
+                )
+                with open(self.getPackFp(old_pack), "rb") as old_f:
+                    for key in old_keys:
+                        _, old_offset, length = self.packed[key]
+                        old_f.seek(old_offset)
+                        write(key, old_f.read(length))
+                self.removePack(old_pack)
+            
+            while self.blobs and self.memory_bytes > budget / 2:
+                key, blob = self.blobs.popitem(last=False)
+                write(key, blob)
+                self.memory_bytes -= len(blob)
+    
+    def clear(self):
+        """Remove all stored data."""
+        for pack in self.pack_counts:
+            fp = self.getPackFp(pack)
+            if os.path.isfile(fp):
+                os.remove(fp)
+        self.blobs = OrderedDict()
+        self.refs = {}
+        self.packed = {}
+        self.pack_counts = {}
+        self.pack_bytes = {}
+        self.memory_bytes = 0
+
+def encodeContours(contours : dict, names, store : StateStore, trace_cache : dict = None) -> dict:
+    """Encode contours as trace attributes and keys to the trace points in the store.
+
+    Traces that are unchanged since they were last encoded (according to the
+    cache) reuse their stored points.
+    
+        Params:
+            contours (dict): name : Contour
+            names (iterable): the names of the contours to encode (empty if not in contours)
+            store (StateStore): the store for the points
+            trace_cache (dict): contour name : {trace id : (trace, points, check, key)} (updated in place)
+        Returns:
+            (dict): name : list of (trace attributes, points key)
+    """
+    encoded = {}
+    for cname in names:
+        old_cache = trace_cache.get(cname, {}) if trace_cache is not None else {}
+        new_cache = {}
+        encoded_traces = []
+        for trace in (contours[cname] if cname in contours else []):
+            d = trace.__dict__.copy()
+            points = d.pop("points")
+            # the points list may be edited in place (e.g. when scaled), so also check its ends
+            check = (len(points), points[0], points[-1]) if points else (0,)
+            entry = old_cache.get(id(trace))
+            if entry and entry[0] is trace and entry[1] is points and entry[2] == check:
+                key = entry[3]
+                store.incref(key)
+            else:
+                key = store.put(np.array(points, dtype=np.float64).reshape(-1, 2).tobytes())
+            new_cache[id(trace)] = (trace, points, check, key)
+            encoded_traces.append((d, key))
+        encoded[cname] = encoded_traces
+        # the cache keeps its own reference to the points
+        if trace_cache is not None:
+            for entry in new_cache.values():
+                store.incref(entry[3])
+            for entry in old_cache.values():
+                store.discard(entry[3])
+            trace_cache[cname] = new_cache
+    return encoded
+
+def decodeContours(encoded : dict, store : StateStore, names=None, trace_cache : dict = None) -> dict:
+    """Decode contours from encodeContours.
+
+    If a cache is provided, the points of unchanged traces are copied from it
+    and the decoded traces replace the cached traces for their contours.
+    
+        Params:
+            encoded (dict): the encoded contours
+            store (StateStore): the store with the points
+            names (iterable): the names of the contours to decode (all if None)
+            trace_cache (dict): contour name : {trace id : (trace, points, check, key)} (updated in place)
+        Returns:
+            (dict): name : Contour
+    """
+    contours = {}
+    for cname, encoded_traces in encoded.items():
+        if names is not None and cname not in names:
+            continue
+        old_cache = trace_cache.get(cname, {}) if trace_cache is not None else {}
+        known = {}
+        for _, points, check, key in old_cache.values():
+            if check == ((len(points), points[0], points[-1]) if points else (0,)):
+                known[key] = points
+        new_cache = {}
+        traces = []
+        for d, key in encoded_traces:
+            if key in known:
+                points = known[key].copy()
+            else:
+                points = np.frombuffer(store.get(key), dtype=np.float64).reshape(-1, 2)
+                points = list(zip(points[:,0].tolist(), points[:,1].tolist()))
+            trace = Trace("", [0,0,0])
+            trace.__dict__ = d
+            trace.points = points
+            traces.append(trace)
+            check = (len(points), points[0], points[-1]) if points else (0,)
+            new_cache[id(trace)] = (trace, points, check, key)
+        contours[cname] = Contour(cname, traces)
+        if trace_cache is not None:
+            for entry in new_cache.values():
+                store.incref(entry[3])
+            for entry in old_cache.values():
+                store.discard(entry[3])
+            trace_cache[cname] = new_cache
+    return contours
+
+def pointKeys(encoded : dict) -> list:
+    """Return the keys to the trace points for encoded contours."""
+    return [key for encoded_traces in encoded.values() for _, key in encoded_traces]
+
 class FieldState():
 
     def __init__(
@@ -21,9 +302,15 @@ class FieldState():
             flags : list,
             contours_fp : str = None,
             updated_contours=None, 
-            updated_ztraces=None
+            updated_ztraces=None,
+            store : StateStore = None,
+            trace_cache : dict = None
         ):
         """Create a field state with traces and the transform.
+
+        Only the modified contours and ztraces are stored (compressed, in the
+        state store), except for the first state of a section, which stores
+        all contours in a file.
         
             Params:
                 contours (dict): all the contours on a section
@@ -32,8 +319,10 @@ class FieldState():
                 contours_fp (str): the filepath to store the contours
                 updated_contours: the names of the modified contours
                 updated_ztraces: the names of the modified ztraces
+                store (StateStore): the store for the state data
+                trace_cache (dict): the cache of encoded traces for the section
         """
-        self.contours = {}
+        self.store = store if store else StateStore()
         self.contours_fp = contours_fp
         if updated_contours is None:
             if contours is None:
@@ -42,47 +331,81 @@ class FieldState():
                 updated_contours = contours.keys()
 
         # store contours in memory if no fp provided
-        if not self.contours_fp:  
-            for contour_name in updated_contours:
-                if contour_name in contours:
-                    self.contours[contour_name] = contours[contour_name].copy()
-                else:  # empty Contour
-                    self.contours[contour_name] = Contour(contour_name)
+        encoded_contours = {}
+        if not self.contours_fp:
+            encoded_contours = encodeContours(contours, updated_contours, self.store, trace_cache)
         # store contours in json
-        elif contours is None:  # assume stored in JSON already
-            self.contours = None
-        else:  # store contours if provided with both fp and contours
+        elif contours is not None:  # store contours if provided with both fp and contours
+            json_contours = {}
             for contour_name in updated_contours:
-                self.contours[contour_name] = [trace.getList() for trace in contours[contour_name]]
+                json_contours[contour_name] = [trace.getList() for trace in contours[contour_name]]
             with open(self.contours_fp, "w") as f:
-                json.dump(self.contours, f)
-            self.contours = None
+                json.dump(json_contours, f)
+        # otherwise, assume stored in JSON already
         
-        self.ztraces = {}
-        # first state made for a section (or copy)
+        # first state made for a section
         if updated_ztraces is None:
-            for ztrace_name in ztraces:
-                self.ztraces[ztrace_name] = ztraces[ztrace_name].copy()
-        # added another state
-        else:
-            for ztrace_name in updated_ztraces:
-                self.ztraces[ztrace_name] = ztraces[ztrace_name].copy()
+            updated_ztraces = ztraces.keys()
+        state_ztraces = {}
+        for ztrace_name in updated_ztraces:
+            state_ztraces[ztrace_name] = ztraces[ztrace_name]
+
+        self.setData(encoded_contours, state_ztraces, tforms, flags)
+    
+    def setData(self, encoded_contours : dict, ztraces : dict, tforms : dict, flags : list):
+        """Store the state data.
+        
+            Params:
+                encoded_contours (dict): the contours (from encodeContours, references are taken over)
+                ztraces (dict): the modified ztraces
+                tforms (dict): the tforms
+                flags (list): the flags
+        """
+        # store the contours, ztraces and flags together (pickled, so they are copies)
+        self.key = self.store.putObject((encoded_contours, ztraces, flags))
+        self.point_keys = pointKeys(encoded_contours)
+        self.contour_names = None if self.contours_fp else set(encoded_contours.keys())
+        self.ztrace_names = set(ztraces.keys())
         
         # save tforms
         self.tforms = {}
         for alignment_name in tforms:
             self.tforms[alignment_name] = tforms[alignment_name].copy()
+    
+    # STATIC METHOD
+    def fromEncoded(encoded_contours : dict, ztraces : dict, tforms : dict, flags : list, store : StateStore):
+        """Create a field state from already encoded contours.
         
-        # save flags
-        self.flags = []
-        for flag in flags:
-            self.flags.append(flag.copy())
+            Params:
+                encoded_contours (dict): the contours (from encodeContours, references are added)
+                ztraces (dict): the ztraces
+                tforms (dict): the tforms
+                flags (list): the flags
+                store (StateStore): the store for the state data
+            Returns:
+                (FieldState): the field state
+        """
+        for key in pointKeys(encoded_contours):
+            store.incref(key)
+        state = FieldState.__new__(FieldState)
+        state.store = store
+        state.contours_fp = None
+        state.setData(encoded_contours, ztraces, tforms, flags)
+        return state
     
     def copy(self):
-        return FieldState(self.contours, self.ztraces, self.tforms, self.flags, self.contours_fp)
+        """Return a copy of the state (the stored data is shared; use when the original is discarded)."""
+        state = FieldState.__new__(FieldState)
+        state.__dict__ = self.__dict__.copy()
+        return state
+    
+    def discard(self):
+        """Remove the stored data for the state (the contours file is kept)."""
+        for key in self.point_keys:
+            self.store.discard(key)
+        self.store.discard(self.key)
     
-    def getContours(self):
-        contours = {}
+    def getContours(self, names=None, trace_cache : dict = None):
         if self.contours_fp:
             with open(self.contours_fp, "r") as f:
                 contours = json.load(f)
@@ -90,15 +413,18 @@ class FieldState():
                     contours[cname] = Contour(cname, [Trace.fromList(trace) for trace in contour])
             return contours
         else:
-            for cname in self.contours:
-                contours[cname] = self.contours[cname].copy()
-            return contours
+            return decodeContours(self.store.getObject(self.key)[0], self.store, names, trace_cache)
+    
+    def getEncodedContours(self):
+        """Return the encoded contours (new references if read from the contours file)."""
+        if self.contours_fp:
+            contours = self.getContours()
+            return encodeContours(contours, contours.keys(), self.store)
+        else:
+            return self.store.getObject(self.key)[0]
     
     def getZtraces(self):
-        ztraces = {}
-        for zname in self.ztraces:
-            ztraces[zname] = self.ztraces[zname].copy()
-        return ztraces
+        return self.store.getObject(self.key)[1]
     
     def getModifiedContours(self):
         if self.contours_fp:
@@ -106,33 +432,37 @@ class FieldState():
                 contours = json.load(f)
             return set(contours.keys())
         else:
-            return set(self.contours.keys())
+            return self.contour_names.copy()
     
     def getModifiedZtraces(self):
-        return set(self.ztraces.keys())
+        return self.ztrace_names.copy()
     
     def getTforms(self):
         return self.tforms.copy()
 
     def getFlags(self):
-        return self.flags.copy()
+        return self.store.getObject(self.key)[2]
     
     def updateTime(self):
         self.time = round(time.time()*10)  # keep track of time when added to state list
 
 class SectionStates():
 
-    def __init__(self, section : Section = None, series : Series = None):
+    def __init__(self, section : Section = None, series : Series = None, store : StateStore = None):
         """Create the section state manager.
         
             Params:
                 section (Section): the section object to store states for
                 series (Series): the series that contains the sections
+                store (StateStore): the store for the state data (shared by the series)
         """
         self.initialized = False
         self.current_state = None
         self.undo_states = []
         self.redo_states = []
+        self.store = store
+        self.trace_cache = {}  # the last encoded traces of each contour (see encodeContours)
+        self.evicted = 0  # the number of undo states folded into the first state
         if section and series:
             self.initialize(section, series)
     
@@ -143,16 +473,23 @@ class SectionStates():
                 section (Section): the section object to store states for
                 series (Series): the series that contains the sections
         """
+        if self.store is None:
+            self.store = StateStore(series)
         contours_fp = os.path.join(series.hidden_dir, f"{series.sections[section.n]}.s0")
         self.current_state = FieldState(
             section.contours, 
             series.ztraces, 
             section.tforms, 
             section.flags,
-            contours_fp
+            contours_fp,
+            store=self.store
         )
         self.initialized = True
     
+    def undoCount(self) -> int:
+        """Return the number of undo states, including those that have been evicted."""
+        return self.evicted + len(self.undo_states)
+    
     def addState(self, section : Section, series : Series):
         """Add a new undo state (called when an action is performed).
         
@@ -160,6 +497,8 @@ class SectionStates():
                 section (Section): the section object
         """
         # clear redo states
+        for state in self.redo_states:
+            state.discard()
         self.redo_states = []
         # push current state to undo states
         self.current_state.updateTime()  # keep track of when added to undos
@@ -176,8 +515,62 @@ class SectionStates():
             section.flags,
             None,
             updated_contours,
-            updated_ztraces
+            updated_ztraces,
+            self.store,
+            self.trace_cache
+        )
+        # drop the oldest states if over the limits
+        self.evictStates(series)
+    
+    def evictStates(self, series : Series):
+        """Fold the oldest undo states into the first state if there are too many or they are too old.
+        
+            Params:
+                series (Series): the series (for the undo options)
+        """
+        max_states = series.getOption("undo_max_states")
+        max_age = series.getOption("undo_max_age")
+
+        n = 0
+        if max_states and len(self.undo_states) > max_states:
+            n = len(self.undo_states) - max_states + int(max_states * EVICT_FRACTION)
+        if max_age:
+            now = round(time.time() * 10)
+            cutoff = now - max_age * 600
+            while n < len(self.undo_states) - 1 and getattr(self.undo_states[n], "time", now) < cutoff:
+                n += 1
+        n = min(n, len(self.undo_states) - 1)
+        if n <= 0:
+            return
+        
+        # the first state stores every contour and ztrace: apply the evicted changes to it
+        # (kept encoded in the store, which is faster and not rounded like the contours file)
+        base = self.undo_states[0]
+        base_contours = base.getEncodedContours()
+        contours = base_contours.copy()
+        ztraces = base.getZtraces()
+        for state in self.undo_states[1:n+1]:
+            contours.update(state.getEncodedContours())
+            ztraces.update(state.getZtraces())
+        new_base_state = self.undo_states[n]
+        new_base = FieldState.fromEncoded(
+            contours,
+            ztraces,
+            new_base_state.getTforms(),
+            new_base_state.getFlags(),
+            self.store
         )
+        if hasattr(new_base_state, "time"):
+            new_base.time = new_base_state.time
+        # the contours read from the file are now only referenced by the new first state
+        if base.contours_fp:
+            for key in pointKeys(base_contours):
+                self.store.discard(key)
+
+        for state in self.undo_states[:n+1]:
+            state.discard()
+        self.undo_states = [new_base] + self.undo_states[n+1:]
+        self.evicted += n
         
     def undoState(self, section : Section, series : Series) -> set:
         """Restore an undo state on the section.
@@ -197,13 +590,14 @@ class SectionStates():
             state = self.undo_states[0]
             # restore contours
             modified_contours = self.current_state.getModifiedContours()
-            section.contours = state.getContours()
+            section.contours = state.getContours(trace_cache=self.trace_cache)
             # restore ztraces
             modified_ztraces = self.current_state.getModifiedZtraces()
+            state_ztraces = state.getZtraces()
             for zname in modified_ztraces:
                 series.ztraces[zname] = restoreZtraceOnSection(
                     series.ztraces[zname],
-                    state.ztraces[zname],
+                    state_ztraces[zname],
                     section.n
                 )
 
@@ -215,7 +609,7 @@ class SectionStates():
             modified_contours = last_changed_contours.copy()
             modified_ztraces = last_changed_ztraces.copy()
             for state in reversed(self.undo_states):
-                state_contours = state.getContours()
+                state_contours = state.getContours(last_changed_contours, self.trace_cache)
                 state_ztraces = state.getZtraces()
                 for contour in last_changed_contours.copy():
                     if contour in state_contours:
@@ -235,6 +629,7 @@ class SectionStates():
             if last_changed_contours:
                 for contour in last_changed_contours:
                     section.contours[contour] = Contour(contour)
+        section.invalidateTraceIndex()
             
         # update the series log
         for cname in modified_contours:
@@ -278,10 +673,11 @@ class SectionStates():
             return
         redo_state = self.redo_states[-1]
         # restore the contours on the section
-        state_contours = redo_state.getContours()
+        state_contours = redo_state.getContours(trace_cache=self.trace_cache)
         modified_contours = redo_state.getModifiedContours()
         for contour_name in state_contours:
             section.contours[contour_name] = state_contours[contour_name]
+        section.invalidateTraceIndex()
         # restore the ztraces
         state_ztraces = redo_state.getZtraces()
         modified_ztraces = redo_state.getModifiedZtraces()
@@ -451,9 +847,10 @@ class SeriesStates():
                 section_numbers (list): the list of section numbers in the series
         """
         self.series = series
+        self.store = StateStore(series)
         self.section_states_dict : dict[int, SectionStates] = {}
         for snum in self.series.sections:
-            self.section_states_dict[snum] = SectionStates()
+            self.section_states_dict[snum] = SectionStates(store=self.store)
         self.undos : list[SeriesState] = []
         self.redos : list[SeriesState] = []
     
@@ -491,12 +888,13 @@ class SeriesStates():
             Params:
                 snum (int): the section number
         """
-        self.undos[-1].undo_lens[snum] = len(self[snum].undo_states)
+        self.undos[-1].undo_lens[snum] = self[snum].undoCount()
 
     def clear(self):
         """Clear all state tracking."""
+        self.store.clear()
         for snum in self.section_states_dict:
-            self.section_states_dict[snum] = SectionStates()
+            self.section_states_dict[snum] = SectionStates(store=self.store)
         self.undos = []
         self.redos = []
     
@@ -532,13 +930,17 @@ class SeriesStates():
             all_sections_match = True
             for snum, undo_len in undo_lens.items():
                 states = self[snum]
-                if not states.initialized or len(states.undo_states) != undo_len - (1 if redo else 0):
+                if not states.initialized or states.undoCount() != undo_len - (1 if redo else 0):
+                    all_sections_match = False
+                    break
+                # the undo state has been evicted
+                if not redo and undo_len <= states.evicted:
                     all_sections_match = False
                     break
             # check if state numbers match on the current section
             current_section_match = bool(
                 current_section in undo_lens and 
-                len(cs_undos) == undo_lens[current_section] - (1 if redo else 0)
+                self[current_section].undoCount() == undo_lens[current_section] - (1 if redo else 0)
             )
             # check if 2D undo is part of any unbreakable set
             is_in_unbreakable = False
@@ -546,7 +948,7 @@ class SeriesStates():
                 if (
                     not state.breakable and
                     current_section in state.undo_lens and 
-                    len(cs_undos) == state.undo_lens[current_section] - (1 if redo else 0)
+                    self[current_section].undoCount() == state.undo_lens[current_section] - (1 if redo else 0)
                 ):
                     is_in_unbreakable = True
                     break
@@ -598,10 +1000,9 @@ class SeriesStates():
         sections = state.undo_lens.keys()
         if sections:
             for snum, section in self.series.enumerateSections(
-                message=("Re" if redo else "Un") + "doing action..."
+                message=("Re" if redo else "Un") + "doing action...",
+                section_numbers=sorted(sections)
             ):
-                if snum not in sections:
-                    continue
                 states = self[snum]
                 if redo:
                     states.redoState(section, self.series)
@@ -637,7 +1038,7 @@ class SeriesStates():
         for state in states.copy():
             if (
                 section.n in state.undo_lens and (
-                    len(self[snum].undo_states) == state.undo_lens[snum] - (1 if redo else 0)
+                    self[snum].undoCount() == state.undo_lens[snum] - (1 if redo else 0)
                 )
             ):
                 if state.breakable:
@@ -660,7 +1061,7 @@ class SeriesStates():
         """
         # check if a series undo has been overwritten
         if self.undos and snum in self.undos[-1].undo_lens:
-            if self.undos[-1].undo_lens[snum] == len(self[snum].undo_states):
+            if self.undos[-1].undo_lens[snum] == self[snum].undoCount():
                 self.undos.pop()
         # clear series redos
         for redo in self.redos.copy():
@@ -5,7 +5,7 @@ import sys
 from PyReconstruct.modules.calc import reducePoints
 
 from PyReconstruct.modules.constants import blank_section, blank_series_no_contours
-from PyReconstruct.modules.gui.utils import getProgbar, notify
+from PyReconstruct.modules.datatypes.progress import getProgbar
 from PyReconstruct.modules.constants import createHiddenDir
 from PyReconstruct.modules.datatypes import (
     Series,
@@ -1,6 +1,8 @@
 from .field_view import FieldView
 from .section_layer import SectionLayer
 from .zarr_layer import ZarrLayer
+from .prefetch import SectionPrefetcher
+from .image_tiles import tile_cache
 from .optimize_bc import adjustPixelsToStats, optimizeSectionBC, optimizeSeriesBC
 from .snap_trace import snapTrace
 from .trace_layer import drawArrow
\ No newline at end of file
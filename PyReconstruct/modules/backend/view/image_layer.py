@@ -16,7 +16,8 @@ from PySide6.QtGui import (
     QPen, 
     QColor, 
     QPainter, 
-    QPolygon
+    QPolygon,
+    QTransform
 )
 os.environ['QT_IMAGEIO_MAXALLOC'] = "0"  # disable max image size
 
@@ -28,21 +29,28 @@ from PyReconstruct.modules.datatypes import (
 from PyReconstruct.modules.calc import fieldPointToPixmap
 from PyReconstruct.modules.constants import assets_dir
 
+from .image_tiles import TiledImage
+
 class ImageLayer():
 
-    def __init__(self, section : Section, series : Series):
+    def __init__(self, section : Section, series : Series, image : QImage = None):
         """Create the image field.
 
             Params:
                 section (Section): the section object for the field
                 series (Series): the series object
+                image (QImage): the already decoded section image (plain images only)
         """
         self.section = section
         self.series = series
-        self.loadImage()
+        self.loadImage(image)
     
-    def loadImage(self):
-        """Load the image."""
+    def loadImage(self, image : QImage = None):
+        """Load the image.
+        
+            Params:
+                image (QImage): the already decoded section image (plain images only)
+        """
         # get the image path
         self.is_zarr_file = self.series.src_dir.endswith("zarr")
         
@@ -73,17 +81,33 @@ class ImageLayer():
                 self.bh, self.bw = (n * self.selected_scale for n in self.image.shape)
                 self.base_corners = [(0, 0), (0, self.bh), (self.bw, self.bh), (self.bw, 0)]
                 self.image_found = True
+                # (zarr writes chunks by renaming, which updates the array folder mtime)
+                self.tiled_image = TiledImage(
+                    (self.series.src_dir, self.section.src, os.path.getmtime(self.section.src_fp)),
+                    self.bw,
+                    self.bh,
+                    self.scales,
+                    zarr_group=self.zg,
+                    src=self.section.src
+                )
         
         # if saved as normal images
         else:
             src_path = self.section.src_fp
-            self.image = QImage(src_path)
+            self.image = QImage(src_path) if image is None else image
             if self.image.isNull():
                 self.image_found = False
             else:
                 self.bw, self.bh = self.image.width(), self.image.height()
                 self.base_corners = [(0, 0), (0, self.bh), (self.bw, self.bh), (self.bw, 0)]
                 self.image_found = True
+                self.tiled_image = TiledImage(
+                    (src_path, os.path.getmtime(src_path)),
+                    self.bw,
+                    self.bh,
+                    None,
+                    qimage=self.image
+                )
     
     def _calcTformCorners(self, base_pixmap : QPixmap, tform : Transform) -> tuple:
         """Calculate the vector for each corner of a transformed image.
@@ -192,22 +216,81 @@ class ImageLayer():
         mag = self.section.mag
         wx, wy, ww, wh = tuple(self.series.window)
         pmw, pmh = tuple(self.pixmap_dim)
-        iw, ih = self.bw, self.bh
         s = self.scaling = pmw / (ww / mag)
 
         # step 0: get the applicable zarr scale if using zarr file for images
-        if self.is_zarr_file:
-            scale_level = self.scales[-1]
-            for scale in self.scales[:-1]:
-                if (1/self.scaling) > scale:
-                    scale_level = scale
-                    break
-            if self.selected_scale != scale_level:
-                self.image = self.zg[f"scale_{scale_level}"][self.section.src]
-                self.selected_scale = scale_level
-        else:
-            scale_level = 1
+        scale_level = self._getScaleLevel(s)
+        if self.is_zarr_file and self.selected_scale != scale_level:
+            self.image = self.zg[f"scale_{scale_level}"][self.section.src]
+            self.selected_scale = scale_level
+
+        # steps 1-5: get the bounds of the window on the image
+        bounds = self._getWindowBounds(window, tform, mag)
+        # check if completely out of bounds
+        if bounds is None:
+            blank_pixmap = QPixmap(pmw, pmh)
+            blank_pixmap.fill(Qt.black)
+            return blank_pixmap
+        
+        if get_crop_only:  # only for use with brightness/contrast functions
+            return QPixmap.fromImage(self._getCrop(bounds, scale_level))
+        
+        # step 6: draw the visible tiles directly through the section transform
+        image_layer = QPixmap(pmw, pmh)
+        image_layer.fill(Qt.black)
+        painter = QPainter(image_layer)
+        screen_tform = self._getScreenTransform(tform, mag, wx, wy, pmh, pmw / ww)
+        tiles = self.tiled_image
+        level = scale_level if self.is_zarr_file else tiles.selectLevel(s)
+        for ti, tj, x0, y0 in tiles.visibleTiles(level, bounds):
+            tile = tiles.getTile(level, ti, tj)
+            # tile pixels -> full-resolution image pixels
+            tile_tform = QTransform(level, 0, 0, level, x0 * level, y0 * level)
+            painter.setTransform(tile_tform * screen_tform)
+            painter.drawImage(0, 0, tile)
+        painter.end()
+        
+        # step 7: draw brightness and contrast
+        # create the brightness/contrast polygon (draws as a polygon over the image)
+        self.bc_poly = QPolygon()
+        for x, y in self.base_corners:
+            x, y = (x * mag, y * mag)
+            x, y = tform.map(x, y)
+            x, y = fieldPointToPixmap(x, y, self.series.window, self.pixmap_dim, self.section.mag)
+            self.bc_poly.append(QPoint(x, y))
+        self._drawBrightness(image_layer)
+        self._drawContrast(image_layer)
+
+        return image_layer
+    
+    def _getScaleLevel(self, scaling : float) -> int:
+        """Get the zarr scale level to use for a given screen scaling.
         
+            Params:
+                scaling (float): screen pixels per image pixel
+            Returns:
+                (int): the scale level (1 for normal images)
+        """
+        if not self.is_zarr_file:
+            return 1
+        scale_level = self.scales[-1]
+        for scale in self.scales[:-1]:
+            if (1/scaling) > scale:
+                scale_level = scale
+                break
+        return scale_level
+    
+    def _getWindowBounds(self, window : list, tform : Transform, mag : float):
+        """Get the bounds of a field window on the untransformed image.
+        
+            Params:
+                window (list): the x, y, w, and h of the field window
+                tform (Transform): the section transform
+                mag (float): the section magnification
+            Returns:
+                (tuple): xmin, ymin, xmax, ymax in image pixels (None if out of bounds)
+        """
+        wx, wy, ww, wh = tuple(window)
 
         # step 1: get the polygon for the window
         poly_window = [
@@ -226,18 +309,43 @@ class ImageLayer():
         # step 4: get bounds to crop image
         bounds = getBounds(utf_pixel_poly_window)
 
-        # step 5: adjust bounds to image dimensions and get necessary filling
-        bounds, filling = adjustBounds(bounds, iw, ih)
-        # check if completely out of bounds
+        # step 5: adjust bounds to image dimensions
+        bounds, _ = adjustBounds(bounds, self.bw, self.bh)
+
+        return bounds
+    
+    def prefetchTiles(self, pixmap_dim : tuple, window : list):
+        """Decode the image tiles needed to display a window (without drawing).
+
+        Safe to call from a worker thread: series attributes are not modified.
+        
+            Params:
+                pixmap_dim (tuple): the w and h of the main window
+                window (list): the x, y, w, and h of the field window
+        """
+        if not self.image_found:
+            return
+        mag = self.section.mag
+        s = pixmap_dim[0] / (window[2] / mag)
+        bounds = self._getWindowBounds(window, self.section.tform, mag)
         if bounds is None:
-            blank_pixmap = QPixmap(pmw, pmh)
-            blank_pixmap.fill(Qt.black)
-            return blank_pixmap
-        # unpack values otherwise
-        xmin, ymin, xmax, ymax = bounds
-        xminp, yminp, xmaxp, ymaxp = filling
+            return
+        tiles = self.tiled_image
+        level = self._getScaleLevel(s) if self.is_zarr_file else tiles.selectLevel(s)
+        for ti, tj, _, _ in tiles.visibleTiles(level, bounds):
+            tiles.getTile(level, ti, tj)
+    
+    def _getCrop(self, bounds : tuple, scale_level : int) -> QImage:
+        """Get a direct crop of the image (untransformed and unscaled).
         
-        # step 6: get crop from image
+            Params:
+                bounds (tuple): xmin, ymin, xmax, ymax of the crop in image pixels
+                scale_level (int): the zarr scale level to crop from
+            Returns:
+                (QImage): the cropped image
+        """
+        xmin, ymin, xmax, ymax = bounds
+        ih = self.bh
         if self.is_zarr_file:
             # scale the cropping values accordingly
             xmins, ymins, xmaxs, ymaxs = (round(n / scale_level) for n in bounds)
@@ -252,7 +360,7 @@ class ImageLayer():
                 ymaxs-ymins,
                 zarr_saved.strides[0],
                 QImage.Format.Format_Grayscale8
-            )
+            ).copy()
         else:
             crop_rect = QRect(
                 xmin,
@@ -262,64 +370,26 @@ class ImageLayer():
             )
             im_crop = self.image.copy(crop_rect)
         
-        if get_crop_only:  # only for use with brightness/contrast functions
-            return QPixmap.fromImage(im_crop)
-        
-        # setp 7: scale the cropped image
-        im_scaled = im_crop.scaled(
-            im_crop.width() * s * scale_level,
-            im_crop.height() * s * scale_level
-        )
-        
-        # step 8: fill the image (continue to account for scaling)
-        im_filled = QPixmap(
-            (xminp + (xmax - xmin) + xmaxp) * s,
-            (ymaxp + (ymax - ymin) + yminp) * s
-        )
-        im_filled.fill(Qt.black)
-        painter = QPainter(im_filled)
-        painter.drawImage(
-            xminp * s,
-            ymaxp * s,
-            im_scaled
-        )
-        painter.end()
-
-        # step 9: transform the filled image
-        im_tformed = im_filled.transformed(
-            tform.imageTransform().getQTransform()
-        )
-
-        # step 10: rip the pixmap from the transformed image
-        im_ripped = im_tformed.copy(
-            (im_tformed.width() - pmw) / 2,
-            (im_tformed.height() - pmh) / 2,
-            pmw,
-            pmh
-        )
-        
-        # step 11: add blank space to account for rounding errors
-        if (im_ripped.width(), im_ripped.height()) != pixmap_dim:
-            image_layer = QPixmap(*pixmap_dim)
-            image_layer.fill(Qt.black)
-            painter = QPainter(image_layer)
-            painter.drawPixmap(0, 0, im_ripped)
-            painter.end()
-        else:
-            image_layer = im_ripped
+        return im_crop
+    
+    def _getScreenTransform(self, tform : Transform, mag : float, wx : float, wy : float, pmh : int, k : float) -> QTransform:
+        """Get the transform that maps full-resolution image pixels onto the screen.
         
-        # step 12: draw brightness and contrast
-        # create the brightness/contrast polygon (draws as a polygon over the image)
-        self.bc_poly = QPolygon()
-        for x, y in self.base_corners:
-            x, y = (x * mag, y * mag)
-            x, y = tform.map(x, y)
-            x, y = fieldPointToPixmap(x, y, self.series.window, self.pixmap_dim, self.section.mag)
-            self.bc_poly.append(QPoint(x, y))
-        self._drawBrightness(image_layer)
-        self._drawContrast(image_layer)
-
-        return image_layer
+            Params:
+                tform (Transform): the section transform
+                mag (float): the section magnification
+                wx (float): the x-coord of the field window
+                wy (float): the y-coord of the field window
+                pmh (int): the height of the pixmap
+                k (float): screen pixels per field unit
+            Returns:
+                (QTransform): the composed transform
+        """
+        # image pixels (rows from top) -> untransformed field coordinates
+        pix_to_field = QTransform(mag, 0, 0, -mag, 0, self.bh * mag)
+        # field coordinates -> screen pixels (y flipped)
+        field_to_screen = QTransform(k, 0, 0, -k, -wx * k, pmh + wy * k)
+        return pix_to_field * tform.getQTransform() * field_to_screen
     
     def generateImageArray(self, pixmap_dim : tuple, window : list, get_crop_only=False):
         """Generate the image layer.
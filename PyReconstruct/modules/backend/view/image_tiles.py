@@ -0,0 +1,219 @@
+"""Tiled, cached access to section images.
+
+Images are cut into fixed-size tiles at each scale level. For zarr sources,
+each scale level already exists on disk; for plain images, downsampled levels
+are generated lazily from the full-resolution image. Decoded tiles are kept in
+a shared LRU cache with a byte budget so that small pans and zooms only touch
+the tiles that have not been seen before.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from PySide6.QtCore import Qt, QRect
+from PySide6.QtGui import QImage
+
+TILE_SIZE = 512  # tile edge length in (scaled) image pixels
+
+
+class TileCache():
+
+    def __init__(self, max_bytes : int):
+        """Create an LRU cache of decoded image tiles.
+
+            Params:
+                max_bytes (int): the memory budget for the cache
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.tiles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return a cached tile (or None) and mark it as recently used.
+
+            Params:
+                key (tuple): the tile key
+        """
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile : QImage):
+        """Add a tile to the cache, evicting the least recently used tiles if needed.
+
+            Params:
+                key (tuple): the tile key
+                tile (QImage): the decoded tile
+        """
+        size = tile.sizeInBytes()
+        with self.lock:
+            if key in self.tiles:
+                self.nbytes -= self.tiles.pop(key).sizeInBytes()
+            self.tiles[key] = tile
+            self.nbytes += size
+            while self.nbytes > self.max_bytes and len(self.tiles) > 1:
+                _, old_tile = self.tiles.popitem(last=False)
+                self.nbytes -= old_tile.sizeInBytes()
+
+    def setBudget(self, max_bytes : int):
+        """Change the memory budget of the cache.
+
+            Params:
+                max_bytes (int): the new memory budget
+        """
+        with self.lock:
+            self.max_bytes = max_bytes
+            while self.nbytes > self.max_bytes and self.tiles:
+                _, old_tile = self.tiles.popitem(last=False)
+                self.nbytes -= old_tile.sizeInBytes()
+
+    def clearSource(self, source):
+        """Remove all tiles belonging to an image source.
+
+            Params:
+                source (tuple): the source identifier (first element of each key)
+        """
+        with self.lock:
+            for key in [k for k in self.tiles if k[0] == source]:
+                self.nbytes -= self.tiles.pop(key).sizeInBytes()
+
+    def clear(self):
+        """Remove all tiles from the cache."""
+        with self.lock:
+            self.tiles.clear()
+            self.nbytes = 0
+
+
+# shared by every image layer (tiles are keyed by source)
+tile_cache = TileCache(512 * 2**20)
+
+
+class TiledImage():
+
+    def __init__(self, source, base_w : int, base_h : int, levels : list, zarr_group=None, src : str = None, qimage : QImage = None):
+        """Create a tiled view of a section image.
+
+            Params:
+                source (tuple): a unique identifier for the image source
+                base_w (int): the full-resolution image width
+                base_h (int): the full-resolution image height
+                levels (list): the available scale levels (zarr) or None (plain images)
+                zarr_group: the zarr group containing scale_<n> arrays
+                src (str): the name of the image array in each zarr scale group
+                qimage (QImage): the full-resolution image (plain images)
+        """
+        self.source = source
+        self.bw = base_w
+        self.bh = base_h
+        self.zg = zarr_group
+        self.src = src
+        self.qimage = qimage
+        self.is_zarr = zarr_group is not None
+        self.shapes = {}
+        if self.is_zarr:
+            self.levels = sorted(levels)
+        else:
+            # powers of two that keep the smallest level above one tile
+            self.levels = [1]
+            while max(self.bw, self.bh) / (self.levels[-1] * 2) >= TILE_SIZE:
+                self.levels.append(self.levels[-1] * 2)
+
+    def selectLevel(self, scaling : float) -> int:
+        """Return the coarsest level that still has at least one image pixel per screen pixel.
+
+            Params:
+                scaling (float): screen pixels per full-resolution image pixel
+        """
+        level = self.levels[0]
+        for l in self.levels:
+            if l <= 1 / scaling:
+                level = l
+        return level
+
+    def levelShape(self, level : int) -> tuple:
+        """Return the (w, h) of the image at a given level."""
+        if level not in self.shapes:
+            if self.is_zarr:
+                h, w = self.zg[f"scale_{level}"][self.src].shape[:2]
+                self.shapes[level] = (w, h)
+            else:
+                self.shapes[level] = (math.ceil(self.bw / level), math.ceil(self.bh / level))
+        return self.shapes[level]
+
+    def getTile(self, level : int, ti : int, tj : int) -> QImage:
+        """Return a single tile, decoding it if it is not already cached.
+
+            Params:
+                level (int): the scale level
+                ti (int): the tile column
+                tj (int): the tile row (from the top of the image)
+            Returns:
+                (QImage): the tile image
+        """
+        key = (self.source, level, ti, tj)
+        tile = tile_cache.get(key)
+        if tile is not None:
+            return tile
+
+        lw, lh = self.levelShape(level)
+        x0, y0 = ti * TILE_SIZE, tj * TILE_SIZE
+        x1, y1 = min(x0 + TILE_SIZE, lw), min(y0 + TILE_SIZE, lh)
+
+        if self.is_zarr:
+            arr = np.ascontiguousarray(
+                self.zg[f"scale_{level}"][self.src][y0:y1, x0:x1],
+                dtype=np.uint8
+            )
+            tile = QImage(
+                arr.data,
+                x1 - x0,
+                y1 - y0,
+                arr.strides[0],
+                QImage.Format.Format_Grayscale8
+            ).copy()  # detach from numpy buffer
+        else:
+            crop = self.qimage.copy(QRect(
+                x0 * level,
+                y0 * level,
+                (x1 - x0) * level,
+                (y1 - y0) * level
+            ))
+            if level != 1:
+                crop = crop.scaled(
+                    x1 - x0,
+                    y1 - y0,
+                    Qt.IgnoreAspectRatio,
+                    Qt.SmoothTransformation
+                )
+            tile = crop
+
+        tile_cache.put(key, tile)
+        return tile
+
+    def visibleTiles(self, level : int, bounds : tuple):
+        """Iterate through the tiles that intersect a region of the full-resolution image.
+
+            Params:
+                level (int): the scale level
+                bounds (tuple): xmin, ymin, xmax, ymax in full-resolution pixels (y from bottom)
+            Returns:
+                (generator): yields (ti, tj, x0, y0) with x0, y0 the tile origin at the level
+        """
+        lw, lh = self.levelShape(level)
+        xmin, ymin, xmax, ymax = bounds
+        # convert to level pixels with rows counted from the top
+        c0 = max(0, math.floor(xmin / level))
+        c1 = min(lw, math.ceil(xmax / level))
+        r0 = max(0, math.floor((self.bh - ymax) / level))
+        r1 = min(lh, math.ceil((self.bh - ymin) / level))
+        if c0 >= c1 or r0 >= r1:
+            return
+        for tj in range(r0 // TILE_SIZE, (r1 - 1) // TILE_SIZE + 1):
+            for ti in range(c0 // TILE_SIZE, (c1 - 1) // TILE_SIZE + 1):
+                yield ti, tj, ti * TILE_SIZE, tj * TILE_SIZE
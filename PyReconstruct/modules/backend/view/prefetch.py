@@ -0,0 +1,204 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtGui import QImageReader
+
+from .image_layer import ImageLayer
+from .section_layer import SectionLayer
+
+from PyReconstruct.modules.datatypes import Series
+from PyReconstruct.modules.datatypes.section_cache import getFileKey
+
+
+class SectionPrefetcher():
+
+    def __init__(self, series : Series, max_workers : int = 2):
+        """Load neighbouring sections (and their image tiles) in the background.
+
+        Only data is prepared on the worker threads: the section, the decoded
+        image and its tiles (in the shared tile cache). The section layer is
+        created on the GUI thread when the section is taken.
+
+            Params:
+                series (Series): the series object
+                max_workers (int): the number of worker threads
+        """
+        self.series = series
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}  # section number : Future
+        self.wanted = []  # the sections around the current section (closest first)
+        self.skipped = set()  # sections left out to stay within the memory cap
+        self.estimates = {}  # section number : estimated size in bytes
+
+    def getSeriesState(self) -> tuple:
+        """Return the series state that a prefetched section depends on."""
+        return (
+            self.series.src_dir,
+            self.series.alignment,
+            self.series.bc_profile
+        )
+
+    def schedule(self, snum : int, pixmap_dim : tuple, window : list):
+        """Prefetch the sections surrounding a section.
+
+            Params:
+                snum (int): the current section number
+                pixmap_dim (tuple): the w and h of the field view
+                window (list): the x, y, w, and h of the field window
+        """
+        k = self.series.getOption("prefetch_sections")
+        if not k or snum not in self.series.sections:
+            self.clear()
+            return
+
+        # order neighbours by distance from the current section
+        snums = sorted(self.series.sections.keys())
+        i = snums.index(snum)
+        wanted = []
+        for d in range(1, k + 1):
+            for j in (i + d, i - d):
+                if 0 <= j < len(snums):
+                    wanted.append(snums[j])
+
+        # sections skipped for memory are only tried again once the window moves
+        if wanted != self.wanted:
+            self.wanted = wanted
+            self.skipped = set()
+            self.estimates = {n : e for n, e in self.estimates.items() if n in wanted}
+
+        # drop sections that are no longer close by
+        for n in list(self.futures.keys()):
+            if n not in wanted:
+                self.futures.pop(n).cancel()
+
+        # load the closest sections first and stay within the memory cap
+        # (loads that have not finished count with their estimated size)
+        max_bytes = self.series.getOption("prefetch_mb") * 2**20
+        total = 0
+        window = list(window)  # the series window is modified in place by the GUI
+        state = self.getSeriesState()
+        for n in wanted:
+            if n in self.skipped:
+                continue
+            f = self.futures.get(n)
+            if f is not None and f.done() and not f.cancelled() and not f.exception():
+                nbytes = f.result()["nbytes"]
+            else:
+                nbytes = self.estimateSize(n)
+            if total + nbytes > max_bytes:
+                self.skipped.add(n)
+                if f is not None:
+                    del(self.futures[n])
+                    f.cancel()
+                continue
+            total += nbytes
+            if f is None:
+                self.futures[n] = self.executor.submit(
+                    self._load, n, pixmap_dim, window, state
+                )
+
+    def estimateSize(self, snum : int) -> int:
+        """Estimate the memory used by a prefetched section before it is loaded.
+
+            Params:
+                snum (int): the section number
+            Returns:
+                (int): the estimated size in bytes (as counted by _load)
+        """
+        if snum in self.estimates:
+            return self.estimates[snum]
+        try:
+            nbytes = os.path.getsize(
+                os.path.join(self.series.getwdir(), self.series.sections[snum])
+            ) * 4
+        except OSError:
+            nbytes = 0
+        if not self.series.src_dir.endswith("zarr"):
+            src = self.series.data["sections"][snum]["src"]
+            size = QImageReader(os.path.join(self.series.src_dir, src)).size()
+            if size.isValid():
+                nbytes += size.width() * size.height() * 4
+        self.estimates[snum] = nbytes
+        return nbytes
+
+    def _load(self, snum : int, pixmap_dim : tuple, window : list, state : tuple) -> dict:
+        """Load a section and its image (runs on a worker thread).
+
+            Params:
+                snum (int): the section number
+                pixmap_dim (tuple): the w and h of the field view
+                window (list): the x, y, w, and h of the field window
+                state (tuple): the series state when the load was scheduled
+            Returns:
+                (dict): the section, the decoded image, the keys used to check them, and the estimated size in bytes
+        """
+        section_key = getFileKey(
+            os.path.join(self.series.getwdir(), self.series.sections[snum])
+        )
+        section = self.series.loadSection(snum)
+        nbytes = os.path.getsize(section.filepath) * 4  # parsed traces are larger than their JSON
+
+        # decode the image tiles into the shared tile cache (QImage is safe off the GUI thread)
+        images = ImageLayer(section, self.series)
+        images.prefetchTiles(pixmap_dim, window)
+        image, image_key = None, None
+        if images.image_found and not images.is_zarr_file:
+            image = images.image
+            image_key = images.tiled_image.source
+            nbytes += image.sizeInBytes()
+
+        return {
+            "state": state,
+            "section_key": section_key,
+            "section": section,
+            "image": image,
+            "image_key": image_key,
+            "nbytes": nbytes
+        }
+
+    def take(self, snum : int) -> SectionLayer:
+        """Create the layer for a prefetched section if one is ready (None otherwise).
+
+            Params:
+                snum (int): the section number
+        """
+        f = self.futures.pop(snum, None)
+        if f is None or not f.done() or f.cancelled() or f.exception():
+            return None
+
+        result = f.result()
+        section = result["section"]
+
+        # discard if the series or the section file has changed since it was loaded
+        if result["state"] != self.getSeriesState():
+            return None
+        if (result["section_key"] is None or
+            result["section_key"] != getFileKey(section.filepath)):
+            return None
+
+        # group visibility was applied on the worker thread: apply the current one
+        section.traces_group_hide = []
+        section.setGroupVisibility(self.series.groups_visibility)
+
+        # reuse the decoded image if the image file has not changed
+        image = result["image"]
+        if image is not None:
+            src_fp = section.src_fp
+            if not os.path.isfile(src_fp) or result["image_key"] != (src_fp, os.path.getmtime(src_fp)):
+                image = None
+
+        return SectionLayer(section, self.series, image=image)
+
+    def clear(self):
+        """Discard all prefetched sections."""
+        for f in self.futures.values():
+            f.cancel()
+        self.futures = {}
+        self.wanted = []
+        self.skipped = set()
+        self.estimates = {}
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        self.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -12,15 +12,16 @@ from PyReconstruct.modules.datatypes import (
 
 class SectionLayer(ImageLayer, TraceLayer):
 
-    def __init__(self, section : Section, series : Series, load_image_layer=True):
+    def __init__(self, section : Section, series : Series, load_image_layer=True, image : QImage = None):
         """Create the section layer object.
         
             Params:
                 section (Section): the section object for the layer
                 series (Series): the series object
+                image (QImage): the already decoded section image (plain images only)
         """
         if load_image_layer:
-            ImageLayer.__init__(self, section, series)
+            ImageLayer.__init__(self, section, series, image)
             
         TraceLayer.__init__(self, section, series)
     
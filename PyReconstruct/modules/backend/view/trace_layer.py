@@ -1,6 +1,5 @@
 import math
 import numpy as np
-from skimage.draw import polygon
 
 from PySide6.QtWidgets import QLabel
 from PySide6.QtCore import Qt, QPoint, QLine
@@ -25,12 +24,15 @@ from PyReconstruct.modules.calc import (
     pointInPoly,
     pixmapPointToField,
     fieldPointToPixmap,
+    fieldPointsToPixmap,
     getDistanceFromTrace,
     getExterior, 
     mergeTraces, 
     reducePoints, 
     cutTraces,
-    area
+    area,
+    labelTraces,
+    rasterizeLabels
 )
 from PyReconstruct.modules.gui.utils import drawOutlinedText
 
@@ -84,10 +86,29 @@ class TraceLayer():
             Returns:
                 (list): list of pixel points
         """
-        new_pts = []
-        for point in trace.points:
-            new_pts.append(self.pointToPix(point, tform=tform, qpoint=qpoints))
-        return new_pts
+        pix_points = self.traceToPixArray(trace, tform).tolist()
+        if qpoints:
+            return [QPoint(x, y) for x, y in pix_points]
+        else:
+            return [(x, y) for x, y in pix_points]
+    
+    def traceToPixArray(self, trace : Trace, tform : Transform = None) -> np.ndarray:
+        """Return the pixel points corresponding to a trace as an array.
+        
+            Params:
+                trace (Trace): the trace to convert
+                tform (Transform): the transform to apply (otherwise, uses the section transform)
+            Returns:
+                (np.ndarray): (N, 2) integer array of pixel points
+        """
+        if tform is None:
+            tform = self.section.tform
+        return fieldPointsToPixmap(
+            tform.mapArray(trace.points),
+            self.series.window,
+            self.pixmap_dim,
+            self.section.mag
+        )
     
     def getTrace(self, pix_x : float, pix_y : float) -> Trace:
         """"Return the closest trace to the given field coordinates.
@@ -196,8 +217,7 @@ class TraceLayer():
         copied_traces = []
         for trace in self.section.selected_traces:
             trace = trace.copy()
-            tform = self.section.tform
-            trace.points = [tform.map(*p) for p in trace.points]
+            trace.points = self.section.tform.map(trace.points)
             copied_traces.append(trace)
         
         if cut:
@@ -215,40 +235,23 @@ class TraceLayer():
                 (bool) if the trace is within the current field window view
         """        
         ## Convert to screen coordinates
-        qpoints = self.traceToPix(trace, qpoints=True)
+        pix_points = self.traceToPixArray(trace)
 
-        if not qpoints:
+        if not len(pix_points):
             print("EMPTY TRACE DETECTED")
             return
 
         ## Get bounds
-        xmin = qpoints[0].x()
-        xmax = xmin
-        ymin = qpoints[0].y()
-        ymax = ymin
-        
-        for p in qpoints[1:]:
-            
-            x = p.x()
-            y = p.y()
-            
-            if x < xmin:
-                xmin = x
-                
-            elif x > xmax:
-                xmax = x
-                
-            if y < ymin:
-                ymin = y
-                
-            elif y > ymax:
-                ymax = y
+        xmin, ymin = pix_points.min(axis=0).tolist()
+        xmax, ymax = pix_points.max(axis=0).tolist()
         
         trace_bounds = xmin, ymin, xmax, ymax
         screen_bounds = 0, 0, *self.pixmap_dim
 
         ## Draw if in view
         if boundsOverlap(trace_bounds, screen_bounds):
+
+            qpoints = [QPoint(x, y) for x, y in pix_points.tolist()]
             
             ## Set up painter
             painter = QPainter(trace_layer)
@@ -475,7 +478,12 @@ class TraceLayer():
 
         if window_moved:
             
-            trace_list = self.section.tracesAsList()
+            # only visit the traces that may be in the window (padded by a screen pixel)
+            x, y, w, h = tuple(window)
+            pad = w / pixmap_w
+            trace_list = self.section.tracesInBounds(
+                (x - pad, y - pad, x + w + pad, y + h + pad)
+            )
             
         else:
             trace_list = self.traces_in_view.copy()
@@ -528,26 +536,6 @@ class TraceLayer():
                 
         return trace_layer
 
-    def _drawTraceLabel(self, arr : np.ndarray, trace : Trace, label : int, tform : Transform = None):
-        """Draw labels of a trace on a trace layer.
-        
-            Params:
-                arr (np.ndarray): the array to draw the labels on
-                trace (Trace): the trace to draw
-                label (int): the label to use
-                tform (Transform): the transform to apply to the trace
-        """
-        # convert to screen coordinates
-        points = self.traceToPix(trace, tform=tform)
-
-        # get polygon coords
-        y_vals = [y for x, y in points]
-        x_vals = [x for x, y in points]
-        yy, xx = polygon(y_vals, x_vals, arr.shape)
-
-        # insert in trace_layer
-        arr[yy, xx] = label
-    
     def generateLabelsArray(self, pixmap_dim : tuple, window : list, traces : list[Trace], tform : Transform = None):
         """Generate numpy array with traces drawn as labels.
         
@@ -563,41 +551,20 @@ class TraceLayer():
         self.series.window = window
         self.pixmap_dim = pixmap_dim
         pixmap_w, pixmap_h = tuple(pixmap_dim)
-        arr = np.zeros(shape=(pixmap_h, pixmap_w), dtype=np.uint32)   
-
-        for trace in traces:
-            self._drawTraceLabel(
-                arr, 
-                trace, 
-                hashName(trace.name), 
-                tform
-            )
+        arr = np.zeros(shape=(pixmap_h, pixmap_w), dtype=np.uint32)
 
-        return arr
+        if tform is None:
+            tform = self.section.tform
 
-def hashName(name : str):
-    """Create a hash label for a name.
-    
-        Params:
-            name (str): the name to hash
-    """
-    hash = 0
-    p = 0
-    for c in name:
-        add_to_hash = False
-        n = ord(c.lower())
-        if 48 <= n < 58:
-            n -= 48
-            add_to_hash = True
-        elif 97 <= n < 123:
-            n -= 87
-            add_to_hash = True
-        if add_to_hash:
-            hash += n * 36 ** p
-            p += 1
-            if hash >= 2**32:
-                hash %= 2**32
-    return hash
+        rasterizeLabels(
+            labelTraces(traces),
+            (pixmap_h, pixmap_w),
+            window,
+            tform=tform,
+            out=arr
+        )
+
+        return arr
 
 def boundsOverlap(b1 : tuple, b2 : tuple):
     """Check if two bounding boxes intersect.
@@ -1,3 +1,5 @@
 from .generate_volumes import generateVolumes
+from .mesh_engine import gatherObjects, generateMeshes
+from .mesh_lod import generateLODs, chooseLevels, screenSize, toPolyData
 from .export_volumes import *
 from .objects_3D import Surface, Spheres
@@ -6,13 +6,13 @@ from typing import List
 import numpy as np
 import trimesh
 
-from .objects_3D import Surface, Spheres, Contours
+from .objects_3D import exportMesh
+from .mesh_engine import gatherObjects, generateMeshes
 
 from PyReconstruct.modules.datatypes import Series
-from PyReconstruct.modules.gui.utils import notify
 
 
-def export3DObjects(series: Series, obj_names : list, output_dir : str, export_type: str, notify_user: bool = True) -> None:
+def export3DObjects(series: Series, obj_names : list, output_dir : str, export_type: str, notify_user: bool = True, max_workers : int = None) -> None:
     """Export 3D objects.
 
         Params:
@@ -20,68 +20,29 @@ def export3DObjects(series: Series, obj_names : list, output_dir : str, export_t
             obj_names (list): a list of objects to export
             output_dir (str): directory to place exported files
             export_type (str): export format
+            notify_user (bool): True if the user should be notified in the GUI
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
         Returns:
             void
     """
 
-    obj_data = {}
-
-    for obj_name in obj_names:
-
-        mode = series.getAttr(obj_name, "3D_mode")
-            
-        if mode == "surface":
-            obj_data[obj_name] = Surface(obj_name, series)
-            
-        elif mode == "spheres":
-            obj_data[obj_name] = Spheres(obj_name, series)
-            
-        elif mode == "contours":
-            obj_data[obj_name] = Contours(obj_name, series)
-
-    for snum, section in series.enumerateSections(show_progress=False):
-
-        # # Assume somewhat uniform section thickness
-        # tform = section.tform
-
-        for obj_name in obj_names:
-
-            if obj_name not in section.contours:
-
-                continue
-
-            ## Get objects alignment
-            obj_alignment = series.getAttr(obj_name, "alignment")
-
-            if not obj_alignment:
-                
-                tform = section.tform
-            
-            else:
-
-                tform = section.tforms[obj_alignment]
-            
-            for trace in section.contours[obj_name]:
-
-                ## Collect all points if generating full surface
-                obj_data[obj_name].addTrace(trace, snum, tform)
+    ## Gather traces for all objects in one pass through the sections
+    
+    obj_data = gatherObjects(series, [{"name": obj_name} for obj_name in obj_names])
 
-    ## Iterate through objects and export 3D meshes
+    ## Generate meshes in parallel and export each one as it is finished
 
     output_directory = Path(output_dir)
 
-    for obj_name, obj_3D in obj_data.items():
+    for obj_name, tm, _ in generateMeshes(series, obj_data, max_workers):
 
         output_file = output_directory / f"{obj_name}.{export_type}"
 
-        if type(obj_3D) is Surface or type(obj_3D) is Spheres:
-
-            obj_3D.exportTrimesh(
-                output_file,
-                export_type,
-            )
+        exportMesh(tm, output_file, export_type)
 
     if notify_user:
+
+        from PyReconstruct.modules.gui.utils import notify  # (only needed in the GUI)
         
         notify(f"Object(s) exported to directory:\n\n{output_directory.absolute()}\n")
 
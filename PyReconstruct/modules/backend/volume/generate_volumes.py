@@ -1,6 +1,7 @@
 from typing import Union
 
 from .objects_3D import Surface, Spheres, Contours, Ztrace3D
+from .mesh_engine import gatherObjects, generateMeshes
 
 from PyReconstruct.modules.datatypes import Series
 
@@ -35,42 +36,11 @@ def generateVolumes(series_like : Series_like_obj, objs : dict, ztraces : dict):
         if d["name"] not in series.ztraces:
             ztraces.remove(d)
     
-    # create the 3D objects
-    obj_data = {}
-    for d in objs:
-        name = d["name"]
-        mode = series.getAttr(name, "3D_mode")
-        color = d["color"] if "color" in d else None
-        alpha = d["alpha"] if "alpha" in d else None
-        tform = d["tform"] if "tform" in d else None
-        args = (name, series, color, alpha, tform)
-        if mode == "surface":
-            obj_data[name] = Surface(*args)
-        elif mode == "spheres":
-            obj_data[name] = Spheres(*args)
-        elif mode == "contours":
-            obj_data[name] = Contours(*args)
+    # gather the traces for all objects in one pass through the sections
+    obj_data = gatherObjects(series, objs)
 
-    # iterate through all sections and gather points (and colors)
-    mags = []
-    thicknesses = []
-
-    for snum, section in series.enumerateSections(show_progress=False):
-        # ASSUME SOMEWHAT UNIFORM THICKNESS
-        thicknesses.append(section.thickness)
-        mags.append(section.mag)
-
-        for obj_name in obj_data.keys():
-            if obj_name in section.contours:
-                # get the transform sepcific to the object
-                alignment = series.getAttr(obj_name, "alignment")
-                if not alignment:
-                    tform = section.tform
-                else:
-                    tform = section.tforms[alignment]
-                for trace in section.contours[obj_name]:
-                    # collect all points if generating a full surface
-                    obj_data[obj_name].addTrace(trace, snum, tform)
+    # generate the surface and sphere meshes (and their levels of detail) in parallel
+    meshes = {name : (tm, lods) for name, tm, lods in generateMeshes(series, obj_data, lods=True)}
     
     # create ztraces
     ztrace_data = {}
@@ -88,12 +58,17 @@ def generateVolumes(series_like : Series_like_obj, objs : dict, ztraces : dict):
     extremes = []
 
     for obj_name, obj_3D in obj_data.items():
-        extremes = addToExtremes(extremes, obj_3D.extremes)
-
-        if type(obj_3D) is Surface:
-            mesh_data_list.append(obj_3D.generate3D())
-        elif type(obj_3D) is Spheres:
-            mesh_data_list.append(obj_3D.generate3D())
+        if obj_3D.extremes:
+            extremes = addToExtremes(extremes, obj_3D.extremes)
+
+        if type(obj_3D) in (Surface, Spheres):
+            if obj_name not in meshes:  # no traces to mesh (see generateMeshes)
+                continue
+            tm, lods = meshes[obj_name]
+            mesh_data = obj_3D.generate3D(tm)
+            # decimated levels of detail for the 3D scene
+            mesh_data["lods"] = lods
+            mesh_data_list.append(mesh_data)
         elif type(obj_3D) is Contours:
             mesh_data_list.append(obj_3D.generate3D())
     
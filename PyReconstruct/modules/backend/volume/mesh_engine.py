@@ -0,0 +1,182 @@
+"""Gather 3D object data and generate meshes in parallel.
+
+Meshes are generated in two stages: a single pass over the sections gathers
+the traces of every requested object, then the meshes (voxelization and
+marching cubes for surfaces) are generated on a process pool with one task per
+object. Tasks are only started while their estimated memory use fits in the
+memory budget, so a few very large objects cannot exhaust the memory. The
+levels of detail used by the 3D scene are decimated in the same tasks. Finished
+meshes are stored in the series mesh cache (see datatypes/mesh_cache.py) and
+objects that have not changed since are not meshed again.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .objects_3D import Surface, Spheres, Contours, VOXEL_BYTES
+from .mesh_lod import generateLODs
+
+from PyReconstruct.modules.datatypes import Series
+from PyReconstruct.modules.datatypes.parallel_open import InlineExecutor
+from PyReconstruct.modules.datatypes.mesh_cache import MeshCache, getMeshCacheFp, getMeshKey
+from PyReconstruct.modules.backend.func import determine_cpus
+
+# total voxels below which meshes are generated in the current process
+PARALLEL_MIN_VOXELS = 2 * 10**7
+
+
+def gatherObjects(series : Series, objs : list) -> dict:
+    """Gather the trace data for a set of objects in a single pass through the sections.
+
+        Params:
+            series (Series): the series containing the objects
+            objs (list): the objects to gather (dicts containing name and optionally color, alpha, tform)
+        Returns:
+            (dict): object name : 3D object (Surface, Spheres or Contours)
+    """
+    obj_data = {}
+    for d in objs:
+        name = d["name"]
+        mode = series.getAttr(name, "3D_mode")
+        args = (name, series, d.get("color"), d.get("alpha"), d.get("tform"))
+        if mode == "surface":
+            obj_data[name] = Surface(*args)
+        elif mode == "spheres":
+            obj_data[name] = Spheres(*args)
+        elif mode == "contours":
+            obj_data[name] = Contours(*args)
+
+    # only visit the sections that contain the objects
+    for snum, section in series.enumerateObjectSections(list(obj_data), show_progress=False):
+        for obj_name, obj_3D in obj_data.items():
+            if obj_name not in section.contours:
+                continue
+            # get the transform specific to the object
+            alignment = series.getAttr(obj_name, "alignment")
+            if not alignment:
+                tform = section.tform
+            else:
+                tform = section.tforms[alignment]
+            for trace in section.contours[obj_name]:
+                obj_3D.addTrace(trace, snum, tform)
+
+    return obj_data
+
+
+def getMemoryBudget() -> int:
+    """Return the memory (in bytes) that meshing tasks may use at once."""
+    try:
+        available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):  # not available on this platform
+        available = 4 * 2**30
+    return available // 2
+
+
+def meshTask(fn, args : tuple, mesh_data : tuple = None, lods : bool = False) -> tuple:
+    """Generate a mesh and optionally its levels of detail.
+
+    Only uses picklable arguments so that it can be run in a worker process.
+
+        Params:
+            fn (function): the mesh function (from getMeshTask)
+            args (tuple): the arguments for the mesh function
+            mesh_data (tuple): the already generated mesh data (only the levels of detail are generated)
+            lods (bool): True if the levels of detail should be generated
+        Returns:
+            (tuple): the output of the mesh function
+            (list): (vertices, faces) for each level below full detail (None if not generated)
+    """
+    if mesh_data is None:
+        mesh_data = fn(*args)
+    return mesh_data, (generateLODs(mesh_data[0], mesh_data[1]) if lods else None)
+
+
+def generateMeshes(series : Series, obj_data : dict, max_workers : int = None, memory_budget : int = None, use_cache : bool = True, lods : bool = False):
+    """Generate the trimesh objects for surfaces and spheres, yielding each as it is finished.
+
+    Meshes are not yielded in order.
+
+        Params:
+            series (Series): the series containing the objects
+            obj_data (dict): object name : 3D object (from gatherObjects)
+            max_workers (int): the maximum number of processes (default: from the cpu_max option)
+            memory_budget (int): the memory (in bytes) that tasks may use at once (default: half of the available memory)
+            use_cache (bool): True if meshes should be read from and stored in the mesh cache
+            lods (bool): True if the levels of detail for the 3D scene should be generated
+        Yields:
+            (str): the object name
+            (trimesh.Trimesh): the mesh
+            (list): (vertices, faces) for each level below full detail (None if lods is False)
+    """
+    if max_workers is None:
+        max_workers = determine_cpus(series.getOption("cpu_max"))
+    if memory_budget is None:
+        memory_budget = getMemoryBudget()
+
+    cache = MeshCache(getMeshCacheFp(series.hidden_dir)) if use_cache else None
+
+    # largest first so that they are not left running alone at the end
+    tasks = []
+    for name, obj_3D in obj_data.items():
+        if type(obj_3D) in (Surface, Spheres) and obj_3D.extremes:
+            fn, args = obj_3D.getMeshTask()
+            key, mesh_data = None, None
+            if cache:
+                key = getMeshKey(series.getAttr(name, "3D_mode"), args)
+                mesh_data = cache.get(name, key)
+                if mesh_data is not None:
+                    mesh_lods = cache.getLODs(name, key) if lods else None
+                    if not lods or mesh_lods is not None:
+                        yield name, obj_3D.toTrimesh(*mesh_data), mesh_lods
+                        continue
+            # (only the levels of detail are missing if the mesh was cached)
+            nbytes = obj_3D.estimateMemory() if mesh_data is None else 0
+            tasks.append((nbytes, name, (fn, args, mesh_data, lods), key))
+    tasks.sort(key=lambda x: x[0], reverse=True)
+
+    total = sum(t[0] for t in tasks)
+    if not tasks:
+        if cache:
+            cache.close()
+        return
+    elif max_workers <= 1 or len(tasks) <= 1 or total < PARALLEL_MIN_VOXELS * VOXEL_BYTES:
+        executor = InlineExecutor()
+    else:
+        # spawn rather than fork: the GUI process may be running other threads
+        executor = ProcessPoolExecutor(
+            max_workers=min(max_workers, len(tasks)),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    running = {}  # future : (name, estimated memory, cache key, True if the mesh was cached)
+    in_use = 0
+    try:
+        while tasks or running:
+            # start the largest tasks that fit in the budget (always allow one)
+            while len(running) < max_workers:
+                for i, (nbytes, _, _, _) in enumerate(tasks):
+                    if not running or in_use + nbytes <= memory_budget:
+                        break
+                else:
+                    break
+                nbytes, name, task_args, key = tasks.pop(i)
+                cached = task_args[2] is not None
+                running[executor.submit(meshTask, *task_args)] = (name, nbytes, key, cached)
+                in_use += nbytes
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, nbytes, key, cached = running.pop(future)
+                in_use -= nbytes
+                mesh_data, mesh_lods = future.result()
+                if cache:
+                    if not cached:
+                        cache.put(name, key, mesh_data)
+                    if mesh_lods is not None:
+                        cache.putLODs(name, key, mesh_lods)
+                yield name, obj_data[name].toTrimesh(*mesh_data), mesh_lods
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if cache:
+            cache.close()
@@ -0,0 +1,168 @@
+"""Level-of-detail (LOD) variants of 3D object meshes.
+
+Each surface and sphere mesh is decimated into a few coarser levels, each
+keeping LOD_REDUCTION of the triangles of the level before it. Levels are
+generated in the meshing tasks and stored with the mesh in the series mesh
+cache (see mesh_engine.generateMeshes) so they are only computed once. The 3D
+scene picks a level for each object from its size on screen and the scene
+triangle budget (see chooseLevels).
+"""
+
+import math
+import heapq
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+
+LOD_REDUCTION = 0.25  # fraction of the triangles kept at each coarser level
+LOD_LEVELS = 4  # the maximum number of levels (including full detail)
+LOD_MIN_FACES = 2000  # meshes with fewer triangles are not decimated further
+TRIANGLES_PER_PIXEL = 0.5  # triangles beyond this density are not visible
+
+
+def toPolyData(vertices : np.ndarray, faces : np.ndarray) -> vtk.vtkPolyData:
+    """Create vtk polydata for a triangle mesh.
+
+        Params:
+            vertices (np.ndarray): the (N, 3) vertices
+            faces (np.ndarray): the (M, 3) triangle faces
+        Returns:
+            (vtk.vtkPolyData): the polydata
+    """
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(
+        np.ascontiguousarray(vertices, dtype=np.float64),
+        deep=True
+    ))
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    cells = vtk.vtkCellArray()
+    cells.SetCells(
+        len(faces),
+        numpy_support.numpy_to_vtkIdTypeArray(
+            np.column_stack((np.full(len(faces), 3), faces)).ravel(),
+            deep=True
+        )
+    )
+    poly = vtk.vtkPolyData()
+    poly.SetPoints(points)
+    poly.SetPolys(cells)
+    return poly
+
+
+def fromPolyData(poly : vtk.vtkPolyData) -> tuple:
+    """Get the vertices and triangle faces of vtk polydata.
+
+        Params:
+            poly (vtk.vtkPolyData): the (triangulated) polydata
+        Returns:
+            (np.ndarray): the (N, 3) vertices
+            (np.ndarray): the (M, 3) triangle faces
+    """
+    if not poly.GetNumberOfPoints():
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    vertices = numpy_support.vtk_to_numpy(poly.GetPoints().GetData()).astype(np.float64)
+    faces = numpy_support.vtk_to_numpy(poly.GetPolys().GetData()).reshape(-1, 4)[:,1:]
+    return vertices, faces.astype(np.int64)
+
+
+def decimateMesh(vertices : np.ndarray, faces : np.ndarray, fraction : float) -> tuple:
+    """Reduce the number of triangles in a mesh with quadric decimation.
+
+        Params:
+            vertices (np.ndarray): the (N, 3) vertices
+            faces (np.ndarray): the (M, 3) triangle faces
+            fraction (float): the fraction of the triangles to keep
+        Returns:
+            (np.ndarray): the decimated vertices
+            (np.ndarray): the decimated faces
+    """
+    decimate = vtk.vtkQuadricDecimation()
+    decimate.SetInputData(toPolyData(vertices, faces))
+    decimate.SetTargetReduction(1 - fraction)
+    decimate.VolumePreservationOn()
+    decimate.Update()
+    return fromPolyData(decimate.GetOutput())
+
+
+def generateLODs(vertices : np.ndarray, faces : np.ndarray) -> list:
+    """Generate the coarser levels of detail for a mesh.
+
+        Params:
+            vertices (np.ndarray): the (N, 3) vertices
+            faces (np.ndarray): the (M, 3) triangle faces
+        Returns:
+            (list): (vertices, faces) for each level below full detail (coarsest last)
+    """
+    lods = []
+    for _ in range(LOD_LEVELS - 1):
+        if len(faces) < LOD_MIN_FACES:
+            break
+        new_vertices, new_faces = decimateMesh(vertices, faces, LOD_REDUCTION)
+        if not len(new_faces) or len(new_faces) >= len(faces):
+            break
+        lods.append((new_vertices, new_faces))
+        vertices, faces = new_vertices, new_faces
+    return lods
+
+
+def chooseLevels(objs : list, budget : int) -> list:
+    """Choose the level of detail for each object in a scene.
+
+    Each object starts at the finest level that is not denser than its size on
+    screen can show. While the scene is over the triangle budget, the object
+    with the most triangles per pixel is moved to its next coarser level.
+
+        Params:
+            objs (list): (size on screen in pixels, triangle counts for each level, True if full detail is required) for each object
+            budget (int): the maximum number of triangles in the scene
+        Returns:
+            (list): the level for each object
+    """
+    levels = []
+    total = 0
+    heap = []
+    for i, (pixels, counts, full_detail) in enumerate(objs):
+        level = 0
+        if not full_detail:
+            visible = pixels * pixels * TRIANGLES_PER_PIXEL
+            while level < len(counts) - 1 and counts[level] > visible:
+                level += 1
+            if level < len(counts) - 1:
+                density = counts[level] / max(pixels * pixels, 1)
+                heapq.heappush(heap, (-density, i))
+        levels.append(level)
+        total += counts[level]
+
+    while total > budget and heap:
+        _, i = heapq.heappop(heap)
+        pixels, counts, _ = objs[i]
+        total -= counts[levels[i]] - counts[levels[i] + 1]
+        levels[i] += 1
+        if levels[i] < len(counts) - 1:
+            density = counts[levels[i]] / max(pixels * pixels, 1)
+            heapq.heappush(heap, (-density, i))
+
+    return levels
+
+
+def screenSize(bounds : tuple, camera, height : int) -> float:
+    """Estimate the diameter (in pixels) of an object on screen.
+
+        Params:
+            bounds (tuple): xmin, xmax, ymin, ymax, zmin, zmax of the object in world coordinates
+            camera (vtk.vtkCamera): the scene camera
+            height (int): the height of the view in pixels
+        Returns:
+            (float): the diameter of the bounding sphere on screen
+    """
+    xmin, xmax, ymin, ymax, zmin, zmax = bounds
+    radius = math.dist((xmin, ymin, zmin), (xmax, ymax, zmax)) / 2
+    if camera.GetParallelProjection():
+        return radius / max(camera.GetParallelScale(), 1e-12) * height
+    center = ((xmin + xmax) / 2, (ymin + ymax) / 2, (zmin + zmax) / 2)
+    d = math.dist(center, camera.GetPosition())
+    if d <= radius:
+        return math.inf
+    return radius / (d * math.tan(math.radians(camera.GetViewAngle()) / 2)) * height
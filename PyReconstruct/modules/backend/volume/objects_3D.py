@@ -37,6 +37,12 @@ def exportMesh(tm, output_file, export_type):
                 fp.write(trimesh.exchange.dae.export_collada(tm))
                     
 
+VOXEL_BYTES = 12  # peak bytes per voxel while meshing (bool volume + float copy for marching cubes)
+BLOCK_SIZE = 256  # edge length of the voxel blocks used for large surfaces
+CHUNKED_MIN_VOXELS = 2**27  # surfaces with more voxels than this are meshed in blocks
+SPHERE_BYTES = 2**14  # bytes per sphere mesh
+
+
 class Object3D():
 
     def __init__(self, name, series : Series, color=None, alpha=None, tform=None):
@@ -58,6 +64,27 @@ class Object3D():
             if y > self.extremes[3]: self.extremes[3] = y
             if s < self.extremes[4]: self.extremes[4] = s
             if s > self.extremes[5]: self.extremes[5] = s
+    
+    def addPoints(self, points : list, snum : int, tform : Transform = None) -> list:
+        """Transform trace points and keep track of their extreme values.
+        
+            Params:
+                points (list): the trace points
+                snum (int): the section number
+                tform (Transform): the transform to apply to the points
+            Returns:
+                (list): the transformed points
+        """
+        if tform:
+            arr = tform.mapArray(points)
+        else:
+            arr = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(arr):
+            xmin, ymin = arr.min(axis=0).tolist()
+            xmax, ymax = arr.max(axis=0).tolist()
+            self.addToExtremes(xmin, ymin, snum)
+            self.addToExtremes(xmax, ymax, snum)
+        return list(map(tuple, arr.tolist()))
 
 class Surface(Object3D):
 
@@ -77,106 +104,75 @@ class Surface(Object3D):
             self.traces[snum]["pos"] = []
             self.traces[snum]["neg"] = []
         
-        pts = []
-        for pt in trace.points:
-            if tform:
-                x, y = tform.map(*pt)
-            else:
-                x, y = pt
-            self.addToExtremes(x, y, snum)
-            pts.append((x, y))
+        pts = self.addPoints(trace.points, snum, tform)
         
         if trace.negative:
             self.traces[snum]["neg"].append(pts)
         else:
             self.traces[snum]["pos"].append(pts)
 
-    def generateTrimesh(self):
-        """Generate a trimesh object from traces."""
+    def getMeshTask(self) -> tuple:
+        """Return the function and picklable arguments that generate the mesh.
+        
+            Returns:
+                (function): surfaceMesh
+                (tuple): the arguments for the function
+        """
         # calculate the xy resolution for the volume
         vres_min = min(self.series.avg_mag, self.series.avg_thickness)
         vres_max = max(self.series.avg_mag, self.series.avg_thickness)
         vres_percent = self.series.getOption("3D_xy_res")
         vres = vres_min + (1 - vres_percent / 100) * (vres_max - vres_min)
-        # calculate the dimensions of bounding box for empty array
-        xmin, xmax, ymin, ymax, smin, smax = tuple(self.extremes)
-        vshape = (
-            round((xmax-xmin)/vres)+1,
-            round((ymax-ymin)/vres)+1,
-            smax-smin+1
+
+        return surfaceMesh, (
+            self.traces,
+            tuple(self.extremes),
+            vres,
+            self.series.avg_thickness,
+            self.series.getOption("3D_smoothing"),
+            self.series.getOption("smoothing_iterations")
         )
     
-        # create empty numpy volume
-        volume = np.zeros(vshape, dtype=bool)
-
-        # add the traces to the volume
-        for snum, trace_lists in self.traces.items():
-            for trace in trace_lists["pos"]:
-                x_values = []
-                y_values = []
-                for x, y in trace:
-                    x_values.append(round((x-xmin) / vres))
-                    y_values.append(round((y-ymin) / vres))
-                x_pos, y_pos = polygon(
-                    np.array(x_values),
-                    np.array(y_values)
-                )
-                volume[x_pos, y_pos, snum - smin] = True
-            # subtract out the negative traces
-            for trace in trace_lists["neg"]:
-                x_values = []
-                y_values = []
-                for x, y in trace:
-                    x_values.append(round((x-xmin) / vres))
-                    y_values.append(round((y-ymin) / vres))
-                x_pos, y_pos = polygon(
-                    np.array(x_values),
-                    np.array(y_values)
-                )
-                volume[x_pos, y_pos, snum - smin] = False
-
-        # generate trimesh
-        tm = trimesh.voxel.ops.matrix_to_marching_cubes(volume)
-        tm : trimesh.base.Trimesh
+    def estimateMemory(self) -> int:
+        """Estimate the peak memory (in bytes) needed to generate the mesh."""
+        _, (_, extremes, vres, _, _, _) = self.getMeshTask()
+        xmin, xmax, ymin, ymax, smin, smax = extremes
+        voxels = (round((xmax-xmin)/vres)+3) * (round((ymax-ymin)/vres)+3) * (smax-smin+3)
+        if voxels > CHUNKED_MIN_VOXELS:
+            # only one block is held in memory at a time (plus the vertices and faces)
+            voxels = (BLOCK_SIZE+2)**3
+        return voxels * VOXEL_BYTES
+
+    def toTrimesh(self, vertices : np.ndarray, faces : np.ndarray, normals : np.ndarray) -> trimesh.Trimesh:
+        """Create the trimesh object for generated vertices, faces and vertex normals."""
+        tm = trimesh.Trimesh(vertices=vertices, faces=faces, vertex_normals=normals, process=False)
 
         # add metadata
         tm.metadata["name"] = self.name
         tm.metadata["color"] = self.color if self.color else self.default_color
         tm.metadata["alpha"] = self.series.getAttr(self.name, "3D_opacity")
 
-        smoothing = self.series.getOption("3D_smoothing")
-        iterations = self.series.getOption("smoothing_iterations")
-
-        # smooth trimesh
-        if smoothing == "humphrey":
-            trimesh.smoothing.filter_humphrey(tm, iterations=iterations)
-        elif smoothing == "laplacian":
-            trimesh.smoothing.filter_laplacian(tm, iterations=iterations)
-        elif smoothing == "mut_dif_laplacian":
-            trimesh.smoothing.filter_mut_dif_laplacian(tm, iterations=iterations)
-        elif smoothing == "taubin":
-            trimesh.smoothing.filter_taubin(tm, iterations=iterations)
-
-        # provide real vertex locations
-        # (i.e., normalize to real world dimensions)
-        tm.vertices[:,:2] *= vres
-        tm.vertices[:,0] += xmin
-        tm.vertices[:,1] += ymin
-        tm.vertices[:,2] += smin
-        tm.vertices[:,2] *= self.series.avg_thickness
-
         return tm
 
+    def generateTrimesh(self):
+        """Generate a trimesh object from traces."""
+        fn, args = self.getMeshTask()
+        return self.toTrimesh(*fn(*args))
+
     def exportTrimesh(self, output_file, export_type):
         """Export trimesh object to file."""
 
         tm = self.generateTrimesh()
         exportMesh(tm, output_file, export_type)
 
-    def generate3D(self):
-        """Generate the openGL mesh for a surface object."""
-
-        tm = self.generateTrimesh()
+    def generate3D(self, tm : trimesh.Trimesh = None):
+        """Generate the openGL mesh for a surface object.
+        
+            Params:
+                tm (trimesh.Trimesh): the already generated trimesh (optional)
+        """
+        if tm is None:
+            tm = self.generateTrimesh()
 
         mesh_data = {
             "name": self.name,
@@ -212,27 +208,31 @@ class Spheres(Object3D):
 
         self.radii.append(trace.getRadius(tform))
 
-    def generateTrimesh(self):
-        """Generate trimesh object of spheres."""
-
-        verts = []
-        faces = []
-
-        all_spheres = []
+    def getMeshTask(self) -> tuple:
+        """Return the function and picklable arguments that generate the mesh.
         
-        for point, radius in zip(
+            Returns:
+                (function): spheresMesh
+                (tuple): the arguments for the function
+        """
+        return spheresMesh, (
             self.centroids,
-            self.radii
-        ):
-            x, y, s = point
-            z = s * self.series.avg_thickness
-            sphere = trimesh.primitives.Sphere(radius=radius, center=(x,y,z), subdivisions=1)
-            all_spheres.append(sphere)
-            
-            faces += (sphere.faces + len(verts)).tolist()
-            verts += sphere.vertices.tolist()
-        
-        return trimesh.util.concatenate(all_spheres)
+            self.radii,
+            self.series.avg_thickness
+        )
+    
+    def estimateMemory(self) -> int:
+        """Estimate the peak memory (in bytes) needed to generate the mesh."""
+        return len(self.centroids) * SPHERE_BYTES
+
+    def toTrimesh(self, vertices : np.ndarray, faces : np.ndarray) -> trimesh.Trimesh:
+        """Create the trimesh object for generated vertices and faces."""
+        return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+    def generateTrimesh(self):
+        """Generate trimesh object of spheres."""
+        fn, args = self.getMeshTask()
+        return self.toTrimesh(*fn(*args))
 
     def exportTrimesh(self, output_file, export_type):
         """Export trimesh sphere(s) to file."""
@@ -240,10 +240,14 @@ class Spheres(Object3D):
         tm = self.generateTrimesh()
         exportMesh(tm, output_file, export_type)
             
-    def generate3D(self):
-        """Generate the openGL meshes for sphere objects."""
-
-        tm = self.generateTrimesh()
+    def generate3D(self, tm : trimesh.Trimesh = None):
+        """Generate the openGL meshes for sphere objects.
+        
+            Params:
+                tm (trimesh.Trimesh): the already generated trimesh (optional)
+        """
+        if tm is None:
+            tm = self.generateTrimesh()
         
         mesh_data = {
             "name": self.name,
@@ -273,14 +277,7 @@ class Contours(Object3D):
         if snum not in self.traces:
             self.traces[snum] = []
         
-        pts = []
-        for pt in trace.points:
-            if tform:
-                x, y = tform.map(*pt)
-            else:
-                x, y = pt
-            self.addToExtremes(x, y, snum)
-            pts.append((x, y))
+        pts = self.addPoints(trace.points, snum, tform)
         
         if trace.closed:
             pts.append(pts[0])
@@ -368,6 +365,230 @@ class Ztrace3D(Object3D):
         return mesh_data
 
 
+def surfaceMesh(traces : dict, extremes : tuple, vres : float, thickness : float, smoothing : str, iterations : int, block_size : int = None) -> tuple:
+    """Voxelize traces and generate a (smoothed) surface mesh.
+
+    Only uses picklable arguments so that it can be run in a worker process.
+    Large objects are voxelized and meshed in blocks (see chunkedMarchingCubes).
+    
+        Params:
+            traces (dict): section number : {"pos": trace point lists, "neg": trace point lists}
+            extremes (tuple): xmin, xmax, ymin, ymax, smin, smax of the traces
+            vres (float): the xy resolution of the volume
+            thickness (float): the section thickness
+            smoothing (str): the smoothing filter
+            iterations (int): the number of smoothing iterations
+            block_size (int): the edge length of the voxel blocks (default: only use blocks for large objects)
+        Returns:
+            (np.ndarray): the mesh vertices in field coordinates
+            (np.ndarray): the mesh faces
+            (np.ndarray): the vertex normals
+    """
+    # calculate the dimensions of bounding box for empty array
+    xmin, xmax, ymin, ymax, smin, smax = extremes
+    vshape = (
+        round((xmax-xmin)/vres)+1,
+        round((ymax-ymin)/vres)+1,
+        smax-smin+1
+    )
+
+    # convert the traces to voxel coordinates
+    polys = voxelPolygons(traces, xmin, ymin, smin, vres)
+
+    # generate trimesh
+    if block_size is None and np.prod(vshape, dtype=np.int64) > CHUNKED_MIN_VOXELS:
+        block_size = BLOCK_SIZE
+    if block_size is None or max(vshape) <= block_size:
+        volume = rasterizePolygons(polys, (0, 0, 0), vshape)
+        tm = trimesh.voxel.ops.matrix_to_marching_cubes(volume)
+        del(volume)
+    else:
+        tm = chunkedMarchingCubes(polys, vshape, block_size)
+    tm : trimesh.base.Trimesh
+
+    # smooth trimesh
+    if smoothing == "humphrey":
+        trimesh.smoothing.filter_humphrey(tm, iterations=iterations)
+    elif smoothing == "laplacian":
+        trimesh.smoothing.filter_laplacian(tm, iterations=iterations)
+    elif smoothing == "mut_dif_laplacian":
+        trimesh.smoothing.filter_mut_dif_laplacian(tm, iterations=iterations)
+    elif smoothing == "taubin":
+        trimesh.smoothing.filter_taubin(tm, iterations=iterations)
+
+    # provide real vertex locations
+    # (i.e., normalize to real world dimensions)
+    tm.vertices[:,:2] *= vres
+    tm.vertices[:,0] += xmin
+    tm.vertices[:,1] += ymin
+    tm.vertices[:,2] += smin
+    tm.vertices[:,2] *= thickness
+
+    return np.array(tm.vertices), np.array(tm.faces), np.array(tm.vertex_normals)
+
+
+def voxelPolygons(traces : dict, xmin : float, ymin : float, smin : int, vres : float) -> list:
+    """Convert traces to polygons in voxel coordinates.
+
+        Params:
+            traces (dict): section number : {"pos": trace point lists, "neg": trace point lists}
+            xmin (float): the x origin of the volume
+            ymin (float): the y origin of the volume
+            smin (int): the first section of the volume
+            vres (float): the xy resolution of the volume
+        Returns:
+            (list): (z, x values, y values, fill value) for each polygon in the order they are drawn
+    """
+    polys = []
+    for snum, trace_lists in traces.items():
+        # negative traces are subtracted after the positive traces are drawn
+        for key, value in (("pos", True), ("neg", False)):
+            for trace in trace_lists[key]:
+                pts = np.asarray(trace, dtype=np.float64).reshape(-1, 2)
+                polys.append((
+                    snum - smin,
+                    np.rint((pts[:,0] - xmin) / vres).astype(np.int64),
+                    np.rint((pts[:,1] - ymin) / vres).astype(np.int64),
+                    value
+                ))
+    return polys
+
+
+def rasterizePolygons(polys : list, origin : tuple, shape : tuple) -> np.ndarray:
+    """Draw voxel polygons into a boolean volume.
+
+        Params:
+            polys (list): the polygons (from voxelPolygons)
+            origin (tuple): the voxel coordinates of the first voxel of the volume
+            shape (tuple): the shape of the volume
+        Returns:
+            (np.ndarray): the volume
+    """
+    x0, y0, z0 = origin
+    volume = np.zeros(shape, dtype=bool)
+    for z, xs, ys, value in polys:
+        x_pos, y_pos = polygon(xs - x0, ys - y0, shape[:2])
+        volume[x_pos, y_pos, z - z0] = value
+    return volume
+
+
+def blockRanges(n : int, block_size : int) -> list:
+    """Split an axis into blocks that share their boundary voxels.
+
+        Params:
+            n (int): the length of the axis
+            block_size (int): the maximum length of a block
+        Returns:
+            (list): the start and end (exclusive) of each block
+    """
+    step = max(block_size - 1, 1)
+    return [(start, min(start + block_size, n)) for start in range(0, max(n - 1, 1), step)]
+
+
+def chunkedMarchingCubes(polys : list, vshape : tuple, block_size : int) -> trimesh.Trimesh:
+    """Run marching cubes block by block so that the full volume is never held in memory.
+
+    Neighbouring blocks share one layer of voxels, so every marching cubes cell
+    belongs to exactly one block and the vertices on a shared layer are
+    generated identically by both blocks. Merging the duplicate vertices
+    stitches the pieces into the same watertight mesh that marching cubes
+    produces for the whole volume. Empty blocks are skipped.
+
+        Params:
+            polys (list): the polygons (from voxelPolygons)
+            vshape (tuple): the shape of the full volume
+            block_size (int): the maximum edge length of a block
+        Returns:
+            (trimesh.Trimesh): the mesh in voxel coordinates
+    """
+    from skimage import measure
+
+    # polygon bounds for quickly finding the polygons in each block
+    bounds = np.array(
+        [(z, xs.min(), xs.max(), ys.min(), ys.max()) for z, xs, ys, _ in polys],
+        dtype=np.int64
+    ).reshape(-1, 5)
+
+    ranges = [blockRanges(n, block_size) for n in vshape]
+    all_vertices = []
+    all_faces = []
+    nverts = 0
+
+    for x0, x1 in ranges[0]:
+        for y0, y1 in ranges[1]:
+            for z0, z1 in ranges[2]:
+                in_block = np.flatnonzero(
+                    (bounds[:,0] >= z0) & (bounds[:,0] < z1) &
+                    (bounds[:,2] >= x0) & (bounds[:,1] < x1) &
+                    (bounds[:,4] >= y0) & (bounds[:,3] < y1)
+                )
+                if not len(in_block):
+                    continue
+                block = rasterizePolygons(
+                    [polys[i] for i in in_block],
+                    (x0, y0, z0),
+                    (x1 - x0, y1 - y0, z1 - z0)
+                )
+
+                # pad only on the outside of the full volume
+                pad = [
+                    (int(start == 0), int(end == n))
+                    for (start, end), n in zip(((x0, x1), (y0, y1), (z0, z1)), vshape)
+                ]
+                if not block.any() or (block.all() and not np.any(pad)):
+                    continue
+                rev_block = np.pad(np.logical_not(block), pad, constant_values=True)
+                del(block)
+
+                vertices, faces, _, _ = measure.marching_cubes(rev_block, level=0.5)
+                del(rev_block)
+                vertices += np.array([x0, y0, z0]) - np.array([lo for lo, _ in pad])
+                all_vertices.append(vertices)
+                all_faces.append(faces + nverts)
+                nverts += len(vertices)
+
+    if not all_vertices:
+        return trimesh.Trimesh()
+
+    # merge the vertices shared between blocks
+    # (vertices lie on a half voxel grid, so shared vertices are exactly equal)
+    vertices, inverse = np.unique(
+        np.concatenate(all_vertices),
+        axis=0,
+        return_inverse=True
+    )
+    del(all_vertices)
+    faces = inverse.reshape(-1)[np.concatenate(all_faces)]
+
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+
+def spheresMesh(centroids : list, radii : list, thickness : float) -> tuple:
+    """Generate a single mesh of spheres.
+
+    Only uses picklable arguments so that it can be run in a worker process.
+    
+        Params:
+            centroids (list): the x, y, section number of each sphere
+            radii (list): the radius of each sphere
+            thickness (float): the section thickness
+        Returns:
+            (np.ndarray): the mesh vertices
+            (np.ndarray): the mesh faces
+    """
+    all_spheres = []
+    
+    for point, radius in zip(centroids, radii):
+        x, y, s = point
+        z = s * thickness
+        sphere = trimesh.primitives.Sphere(radius=radius, center=(x,y,z), subdivisions=1)
+        all_spheres.append(sphere)
+    
+    tm = trimesh.util.concatenate(all_spheres)
+
+    return np.array(tm.vertices), np.array(tm.faces)
+
+
 def getCircleVertices(radius, segments):
     """
     Generate vertices for a circle in the XY plane.
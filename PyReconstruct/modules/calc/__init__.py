@@ -1,6 +1,7 @@
 from .pfconversions import (
     pixmapPointToField,
-    fieldPointToPixmap
+    fieldPointToPixmap,
+    fieldPointsToPixmap
 )
 from .quantification import (
     area,
@@ -17,7 +18,10 @@ from .quantification import (
     colorize,
     ellipseFromPair,
     rolling_average,
-    interpolate_points
+    interpolate_points,
+    traceMetrics,
+    batchTraceMetrics,
+    hullFeret
 )
 from .feret import (
     feret
@@ -33,3 +37,13 @@ from .image import (
     point_list_2_pix
 )
 from .correlation import correlate
+from .labels import (
+    hashName,
+    labelTraces,
+    rasterizeLabels
+)
+from .overlap import (
+    polygonArea,
+    intersectionArea,
+    overlapRatio
+)
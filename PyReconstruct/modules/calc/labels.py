@@ -0,0 +1,189 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .pfconversions import fieldPointsToPixmap
+
+
+@lru_cache(maxsize=2**16)
+def hashName(name : str):
+    """Create a hash label for a name.
+
+        Params:
+            name (str): the name to hash
+    """
+    hash = 0
+    p = 0
+    for c in name:
+        add_to_hash = False
+        n = ord(c.lower())
+        if 48 <= n < 58:
+            n -= 48
+            add_to_hash = True
+        elif 97 <= n < 123:
+            n -= 87
+            add_to_hash = True
+        if add_to_hash:
+            hash += n * 36 ** p
+            p += 1
+            if hash >= 2**32:
+                hash %= 2**32
+    return hash
+
+
+def labelTraces(traces : list) -> list:
+    """Get the picklable label data for a list of traces.
+
+        Params:
+            traces (list[Trace]): the traces to draw as labels (in drawing order)
+        Returns:
+            (list): (label, negative, (N, 2) points array) for each trace
+    """
+    return [
+        (hashName(trace.name), trace.negative, np.asarray(trace.points, dtype=np.float64).reshape(-1, 2))
+        for trace in traces
+    ]
+
+
+def fillPolygons(polys : list, shape : tuple) -> np.ndarray:
+    """Get the pixels inside any of a set of polygons.
+
+    Uses the same rule as skimage.draw.polygon: a pixel is inside a polygon if
+    its center is inside (even-odd) or on the outline (a vertex, or a point on
+    an odd number of edges). Each polygon is filled on its own, so polygons
+    that overlap (or repeat) do not cancel out.
+
+        Params:
+            polys (list): (N, 2) integer arrays of x, y pixel points
+            shape (tuple): the h and w of the mask
+        Returns:
+            (np.ndarray): the boolean mask
+    """
+    h, w = shape
+    mask = np.zeros(shape, dtype=bool)
+    if not polys or h == 0 or w == 0:
+        return mask
+
+    # the edges of every polygon (last point back to the first)
+    starts = np.concatenate(polys).astype(np.int64)
+    ends = np.concatenate([np.roll(p, -1, axis=0) for p in polys]).astype(np.int64)
+    poly_ids = np.repeat(np.arange(len(polys)), [len(p) for p in polys])
+
+    ## Interior: spans between pairs of edge crossings on each row
+    # orient the edges downward and drop the horizontal ones
+    flip = starts[:, 1] > ends[:, 1]
+    top = np.where(flip[:, None], ends, starts)
+    bottom = np.where(flip[:, None], starts, ends)
+    keep = top[:, 1] != bottom[:, 1]
+    top, bottom, edge_poly = top[keep], bottom[keep], poly_ids[keep]
+
+    # each edge crosses the rows from its top (inclusive) to its bottom (exclusive)
+    y0 = np.maximum(top[:, 1], 0)
+    y1 = np.minimum(bottom[:, 1], h)
+    n_rows = np.maximum(y1 - y0, 0)
+    if n_rows.sum():
+        edge = np.repeat(np.arange(len(top)), n_rows)
+        rows = np.repeat(y0, n_rows) + np.arange(n_rows.sum()) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+        # x of the crossing as an exact fraction: num / dy
+        dx = bottom[edge, 0] - top[edge, 0]
+        dy = bottom[edge, 1] - top[edge, 1]
+        num = top[edge, 0] * dy + (rows - top[edge, 1]) * dx
+
+        # pair up consecutive crossings of the same polygon and row
+        # (a pixel is inside if an odd number of crossings are to its right)
+        order = np.lexsort((num / dy, rows, edge_poly[edge]))
+        num, dy, rows = num[order], dy[order], rows[order]
+        x0 = np.maximum(-(-num[0::2] // dy[0::2]), 0)  # ceil
+        x1 = np.minimum(-(-num[1::2] // dy[1::2]) - 1, w - 1)
+        rows = rows[0::2]
+        spans = x0 <= x1
+        x0, x1, rows = x0[spans], x1[spans], rows[spans]
+
+        # count the spans covering each pixel
+        cover = (
+            np.bincount(rows * (w + 1) + x0, minlength=h * (w + 1)) -
+            np.bincount(rows * (w + 1) + x1 + 1, minlength=h * (w + 1))
+        )
+        mask |= np.cumsum(cover.reshape(h, w + 1)[:, :w], axis=1) > 0
+
+    ## Outline: the vertices and the pixels on an odd number of edges
+    d = ends - starts
+    steps = np.gcd(np.abs(d[:, 0]), np.abs(d[:, 1]))
+    counts = np.maximum(steps - 1, 0)  # the pixels between the ends of each edge
+    edge = np.repeat(np.arange(len(starts)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    step = d[edge] // steps[edge][:, None]
+    pts = starts[edge] + k[:, None] * step
+    if len(pts):
+        # count the edges of the same polygon through each pixel
+        lo = pts.min(axis=0)
+        span = pts.max(axis=0) - lo + 1
+        keys = (poly_ids[edge] * span[1] + (pts[:, 1] - lo[1])) * span[0] + (pts[:, 0] - lo[0])
+        keys, first, n_edges = np.unique(keys, return_index=True, return_counts=True)
+        pts = pts[first[n_edges % 2 == 1]]
+    pts = np.concatenate((starts, pts))
+    inside = (pts[:, 0] >= 0) & (pts[:, 0] < w) & (pts[:, 1] >= 0) & (pts[:, 1] < h)
+    mask[pts[inside, 1], pts[inside, 0]] = True
+
+    return mask
+
+
+def rasterizeLabels(label_traces : list, shape : tuple, window : list, tform=None, out : np.ndarray = None) -> np.ndarray:
+    """Draw traces into a label array.
+
+    All trace points are mapped to pixels at once. Consecutive traces with the
+    same label are filled together (see fillPolygons) in the crop they cover;
+    negative traces then clear their label inside them (holes).
+
+        Params:
+            label_traces (list): (label, negative, points) for each trace (from labelTraces)
+            shape (tuple): the h and w of the array
+            window (list): the x, y, w, and h of the array in field coordinates
+            tform (Transform): the transform to apply to the trace points
+            out (np.ndarray): the array to draw on (default: a new uint64 array)
+        Returns:
+            (np.ndarray): the label array
+    """
+    h, w = shape
+    arr = np.zeros(shape, dtype=np.uint64) if out is None else out
+    label_traces = [t for t in label_traces if len(t[2])]
+    if not label_traces:
+        return arr
+
+    # map all of the points at once
+    lengths = [len(points) for _, _, points in label_traces]
+    points = np.concatenate([points for _, _, points in label_traces])
+    if tform is not None:
+        points = tform.mapArray(points)
+    pix = fieldPointsToPixmap(points, window, (w, h), 1)
+    polys = np.split(pix, np.cumsum(lengths)[:-1])
+
+    i = 0
+    while i < len(label_traces):
+        # gather the run of traces with the same label
+        label = label_traces[i][0]
+        j = i
+        while j < len(label_traces) and label_traces[j][0] == label:
+            j += 1
+        run = polys[i:j]
+        negative = [t[1] for t in label_traces[i:j]]
+        i = j
+
+        # fill within the bounds of the run
+        run_pix = np.concatenate(run)
+        x0, y0 = np.maximum(run_pix.min(axis=0), 0)
+        x1, y1 = np.minimum(run_pix.max(axis=0) + 1, (w, h))
+        if x0 >= x1 or y0 >= y1:
+            continue
+        crop = arr[y0:y1, x0:x1]
+        offset = np.array([x0, y0], dtype=np.int64)
+
+        pos = [p - offset for p, neg in zip(run, negative) if not neg]
+        if pos:
+            crop[fillPolygons(pos, crop.shape)] = label
+
+        neg = [p - offset for p, neg in zip(run, negative) if neg]
+        if neg:
+            crop[fillPolygons(neg, crop.shape) & (crop == label)] = 0
+
+    return arr
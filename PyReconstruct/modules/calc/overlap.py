@@ -0,0 +1,237 @@
+"""Exact overlap of polygons.
+
+The intersection area of two simple polygons is found with Green's theorem:
+the boundary of the intersection is made of the pieces of each polygon's
+boundary that lie inside the other polygon, so both boundaries are split at
+their crossings and the shoelace terms of the inside pieces are summed. Edges
+shared by both polygons are counted once when they run in the same
+direction. All pairwise edge tests are vectorized with numpy.
+"""
+
+import numpy as np
+
+# the maximum number of elements in a pairwise array (pairs are chunked above this)
+CHUNK_SIZE = 2**20
+# tolerance for crossings at the ends of edges (fraction of the edge length)
+PARAM_EPS = 1e-9
+
+
+def signedArea(pts : np.ndarray) -> float:
+    """Get the signed area of a polygon (positive if counter-clockwise).
+
+        Params:
+            pts (np.ndarray): the (N, 2) points of the polygon
+        Returns:
+            (float): the signed area
+    """
+    x, y = pts[:,0], pts[:,1]
+    return float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+
+def _nextPoints(pts):
+    """Return the end points of the edges of a polygon."""
+    return np.concatenate((pts[1:], pts[:1]))
+
+
+def _cross(a, b):
+    """Return the z component of the cross product of 2D vectors."""
+    return a[...,0] * b[...,1] - a[...,1] * b[...,0]
+
+
+def _edgeCrossings(a, b, c, d, eps, skip_adjacent=False):
+    """Find where the edges a->b cross the edges c->d.
+
+    Parallel edges (cross product of the edges within eps) are not crossings.
+
+        Returns:
+            (tuple): edge index in ab, edge index in cd, param along ab, param along cd
+    """
+    found = ([], [], [], [])
+    r, s = b - a, d - c
+    ax0, ax1 = np.minimum(a[:,0], b[:,0]), np.maximum(a[:,0], b[:,0])
+    ay0, ay1 = np.minimum(a[:,1], b[:,1]), np.maximum(a[:,1], b[:,1])
+    cx0, cx1 = np.minimum(c[:,0], d[:,0]), np.maximum(c[:,0], d[:,0])
+    cy0, cy1 = np.minimum(c[:,1], d[:,1]), np.maximum(c[:,1], d[:,1])
+    n, m = len(a), len(c)
+    step = max(1, CHUNK_SIZE // max(m, 1))
+    for i0 in range(0, n, step):
+        i1 = min(i0 + step, n)
+        # only edges with overlapping bounds can cross
+        ei, ej = np.nonzero(
+            (ax0[i0:i1,None] <= cx1[None,:]) & (cx0[None,:] <= ax1[i0:i1,None]) &
+            (ay0[i0:i1,None] <= cy1[None,:]) & (cy0[None,:] <= ay1[i0:i1,None])
+        )
+        ei += i0
+        if skip_adjacent:
+            adjacent = (ej == ei) | (ej == (ei + 1) % n) | (ei == (ej + 1) % m)
+            ei, ej = ei[~adjacent], ej[~adjacent]
+        ca = c[ej] - a[ei]
+        denom = _cross(r[ei], s[ej])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = _cross(ca, s[ej]) / denom
+            u = _cross(ca, r[ei]) / denom
+        hit = (
+            (np.abs(denom) > eps) &
+            (t >= -PARAM_EPS) & (t <= 1 + PARAM_EPS) &
+            (u >= -PARAM_EPS) & (u <= 1 + PARAM_EPS)
+        )
+        found[0].append(ei[hit])
+        found[1].append(ej[hit])
+        found[2].append(np.minimum(np.maximum(t[hit], 0), 1))
+        found[3].append(np.minimum(np.maximum(u[hit], 0), 1))
+    return tuple(np.concatenate(f) for f in found)
+
+
+def isSimplePolygon(pts : np.ndarray) -> bool:
+    """Check that a polygon does not cross itself.
+
+        Params:
+            pts (np.ndarray): the (N, 2) points of the polygon
+        Returns:
+            (bool): True if no two non-adjacent edges intersect
+    """
+    if len(pts) < 4:
+        return True
+    b = _nextPoints(pts)
+    eps = 1e-12 * max(float(np.ptp(pts, axis=0).max()), 1.0) ** 2
+    ei, _, _, _ = _edgeCrossings(pts, b, pts, b, eps, skip_adjacent=True)
+    return not len(ei)
+
+
+def _insideParts(a, b, c, d, params, eps, keep_shared):
+    """Sum the shoelace terms of the pieces of edges a->b that lie inside polygon c->d.
+
+        Params:
+            params (tuple): edge indices and params where the edges a->b are split
+            keep_shared (bool): True if pieces on the boundary of c->d running the same way are counted
+    """
+    n = len(a)
+    idx = np.concatenate((np.arange(n), np.arange(n), params[0]))
+    t = np.concatenate((np.zeros(n), np.ones(n), params[1]))
+    order = np.lexsort((t, idx))
+    idx, t = idx[order], t[order]
+    same = idx[1:] == idx[:-1]
+    e = idx[:-1][same]
+    t0, t1 = t[:-1][same], t[1:][same]
+    keep = t1 - t0 > 1e-12
+    e, t0, t1 = e[keep], t0[keep], t1[keep]
+
+    r = b - a
+    p0 = a[e] + r[e] * t0[:,None]
+    p1 = a[e] + r[e] * t1[:,None]
+    mid = (p0 + p1) / 2
+
+    s = d - c
+    s_len2 = np.maximum((s ** 2).sum(axis=1), eps)
+    tol = eps ** 0.5
+    cx0, cx1 = np.minimum(c[:,0], d[:,0]) - tol, np.maximum(c[:,0], d[:,0]) + tol
+    cy0, cy1 = np.minimum(c[:,1], d[:,1]) - tol, np.maximum(c[:,1], d[:,1]) + tol
+    include = np.zeros(len(mid), dtype=bool)
+    step = max(1, CHUNK_SIZE // max(len(c), 1))
+    for i0 in range(0, len(mid), step):
+        i1 = min(i0 + step, len(mid))
+        x = mid[i0:i1,0][:,None]
+        y = mid[i0:i1,1][:,None]
+
+        # even-odd rule (only edges straddling the ray need the crossing x)
+        pi, ci = np.nonzero((c[None,:,1] > y) != (d[None,:,1] > y))
+        xint = c[ci,0] + (mid[i0 + pi,1] - c[ci,1]) * s[ci,0] / s[ci,1]
+        crossings = np.bincount(pi[mid[i0 + pi,0] < xint], minlength=i1 - i0)
+        inside = crossings % 2 == 1
+
+        # pieces lying on an edge of the other polygon (only edges whose bounds contain the midpoint)
+        pi, ci = np.nonzero((cx0 <= x) & (x <= cx1) & (cy0 <= y) & (y <= cy1))
+        w = mid[i0 + pi] - c[ci]
+        proj = np.clip((w * s[ci]).sum(axis=1) / s_len2[ci], 0, 1)
+        on_edge = ((w - proj[:,None] * s[ci]) ** 2).sum(axis=1) <= eps
+        pi, ci = pi[on_edge], ci[on_edge]
+        shared = np.zeros(i1 - i0, dtype=bool)
+        shared[pi] = True
+        if keep_shared:
+            same_dir = np.zeros(i1 - i0, dtype=bool)
+            same_dir[pi[(r[e[i0 + pi]] * s[ci]).sum(axis=1) > 0]] = True
+            include[i0:i1] = np.where(shared, same_dir, inside)
+        else:
+            include[i0:i1] = inside & ~shared
+
+    return float(_cross(p0[include], p1[include]).sum()) / 2
+
+
+def intersectionArea(pts1 : np.ndarray, pts2 : np.ndarray) -> float:
+    """Get the area of the intersection of two simple polygons.
+
+        Params:
+            pts1 (np.ndarray): the (N, 2) points of the first polygon
+            pts2 (np.ndarray): the (M, 2) points of the second polygon
+        Returns:
+            (float): the intersection area
+    """
+    # orient both polygons counter-clockwise
+    if signedArea(pts1) < 0:
+        pts1 = pts1[::-1]
+    if signedArea(pts2) < 0:
+        pts2 = pts2[::-1]
+
+    # shift to the shared origin to reduce rounding error
+    origin = np.minimum(pts1.min(axis=0), pts2.min(axis=0))
+    a = pts1 - origin
+    c = pts2 - origin
+    b = _nextPoints(a)
+    d = _nextPoints(c)
+    scale = max(float(np.ptp(np.concatenate((a, c)), axis=0).max()), 1e-12)
+    eps = (1e-9 * scale) ** 2
+
+    ei, ej, t, u = _edgeCrossings(a, b, c, d, 1e-12 * scale ** 2)
+    area = _insideParts(a, b, c, d, (ei, t), eps, keep_shared=True)
+    area += _insideParts(c, d, a, b, (ej, u), eps, keep_shared=False)
+
+    return max(area, 0.0)
+
+
+def _removeRepeats(pts : np.ndarray) -> np.ndarray:
+    """Remove points that repeat the previous point (including a closing point)."""
+    if len(pts) < 2:
+        return pts
+    return pts[np.any(pts != np.roll(pts, 1, axis=0), axis=1)]
+
+
+def polygonArea(pts) -> float:
+    """Get the area of a polygon that does not cross itself.
+
+        Params:
+            pts (list or np.ndarray): the points of the polygon
+        Returns:
+            (float): the area (None if the polygon crosses itself)
+    """
+    pts = _removeRepeats(np.asarray(pts, dtype=np.float64).reshape(-1, 2))
+    if len(pts) < 3:
+        return 0.0
+    if not isSimplePolygon(pts):
+        return None
+    return abs(signedArea(pts))
+
+
+def overlapRatio(pts1, pts2, areas : tuple = None) -> float:
+    """Get the intersection over union of two polygons.
+
+        Params:
+            pts1 (list or np.ndarray): the points of the first polygon
+            pts2 (list or np.ndarray): the points of the second polygon
+            areas (tuple): the areas of the polygons if already known (from polygonArea)
+        Returns:
+            (float): the ratio of the intersection to the union (None if either polygon crosses itself)
+    """
+    if areas is None:
+        areas = polygonArea(pts1), polygonArea(pts2)
+    area1, area2 = areas
+    if area1 is None or area2 is None:
+        return None
+    if area1 == 0 or area2 == 0:
+        return 0.0
+
+    pts1 = _removeRepeats(np.asarray(pts1, dtype=np.float64).reshape(-1, 2))
+    pts2 = _removeRepeats(np.asarray(pts2, dtype=np.float64).reshape(-1, 2))
+    intersect_area = min(intersectionArea(pts1, pts2), area1, area2)
+    union_area = area1 + area2 - intersect_area
+
+    return intersect_area / union_area
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def pixmapPointToField(x : float, y : float, pixmap_dim : tuple, window : list, mag : float) -> tuple:
     """Convert main window pixmap coordinates to field window coordinates.
     
@@ -38,4 +41,24 @@ def fieldPointToPixmap(x : float, y : float, window : list, pixmap_dim : tuple,
     y = (y - window_y)/ mag * y_scaling
     y = pixmap_h - y
 
-    return round(x), round(y)
\ No newline at end of file
+    return round(x), round(y)
+
+def fieldPointsToPixmap(points : np.ndarray, window : list, pixmap_dim : tuple, mag : float) -> np.ndarray:
+    """Convert an array of field window coordinates to main window pixmap coordinates.
+    
+        Params:
+            points (np.ndarray): (N, 2) array of field points
+            window (list): the field viewing window
+            pixmap_dim (tuple): the w, h of pixmap
+            mag (float): the image magnification (microns/pixel)
+        Returns:
+            (np.ndarray): (N, 2) integer array of pixmap points (same rounding as fieldPointToPixmap)
+    """
+    pixmap_w, pixmap_h = tuple(pixmap_dim)
+    window_x, window_y, window_w, window_h = tuple(window)
+    x_scaling = pixmap_w / (window_w / mag)
+    y_scaling = pixmap_h / (window_h / mag)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    x = (points[:, 0] - window_x) / mag * x_scaling
+    y = pixmap_h - (points[:, 1] - window_y) / mag * y_scaling
+    return np.rint(np.column_stack((x, y))).astype(np.int64)
@@ -7,6 +7,9 @@ import numpy as np
 from typing import List
 
 from scipy.interpolate import interp1d
+from scipy.spatial import ConvexHull
+
+from .feret import feret
 
 
 def area(pts : list) -> float:
@@ -343,3 +346,166 @@ def interpolate_points(points: List[tuple], spacing=0.01):
     return list(
         zip(x_new, y_new)
     )
+
+
+def _batchCentroid(x : np.ndarray, y : np.ndarray, xn : np.ndarray, yn : np.ndarray, trace_idx : np.ndarray, counts : np.ndarray) -> np.ndarray:
+    """Find the centroids of concatenated traces (same results as centroid).
+    
+        Params:
+            x, y (np.ndarray): the point coordinates
+            xn, yn (np.ndarray): the coordinates of the next point on each trace (wrapping around)
+            trace_idx (np.ndarray): the trace index of each point
+            counts (np.ndarray): the number of points in each trace
+        Returns:
+            (np.ndarray): (K, 2) array of centroids
+    """
+    k = len(counts)
+    cross = x*yn - xn*y
+    signed_area = np.bincount(trace_idx, cross, k) / 2
+    sx = np.bincount(trace_idx, (x + xn)*cross, k)
+    sy = np.bincount(trace_idx, (y + yn)*cross, k)
+    has_area = np.abs(signed_area) > 1e-6
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = np.where(
+            has_area[:, None],
+            np.column_stack((sx, sy)) / (6 * signed_area[:, None]),
+            np.column_stack((
+                np.bincount(trace_idx, x, k),
+                np.bincount(trace_idx, y, k)
+            )) / counts[:, None]
+        )
+    return np.round(c, 6)
+
+
+def batchTraceMetrics(points : np.ndarray, offsets : np.ndarray, closed : np.ndarray, negative : np.ndarray = None, tforms : np.ndarray = None) -> dict:
+    """Compute the metrics for many traces at once.
+
+    The results match the per-trace functions used for trace data: length is
+    lineDistance, area is area (zero for open traces, negative for negative
+    traces), centroid is the centroid of the untransformed points mapped by the
+    transform, radius is the distance from the transformed centroid to the
+    farthest point, and feret is (min, max) for closed traces and (0, 0) for
+    open traces.
+    
+        Params:
+            points (np.ndarray): (M, 2) array of the untransformed points of all traces
+            offsets (np.ndarray): (K+1) start index of each trace in points (last value is M)
+            closed (np.ndarray): (K) True for each closed trace
+            negative (np.ndarray): (K) True for each negative trace
+            tforms (np.ndarray): (2, 3) transform for all traces or (K, 2, 3) transform for each trace
+        Returns:
+            (dict): "length", "area", "radius" (K), "centroid" and "feret" (K, 2)
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    closed = np.asarray(closed, dtype=bool)
+    k = len(offsets) - 1
+    if k == 0:
+        return {
+            "length": np.zeros(0),
+            "area": np.zeros(0),
+            "radius": np.zeros(0),
+            "centroid": np.zeros((0, 2)),
+            "feret": np.zeros((0, 2))
+        }
+    starts = offsets[:-1]
+    counts = np.diff(offsets)
+    if np.any(counts < 1):
+        raise ValueError("Traces must have at least one point.")
+    trace_idx = np.repeat(np.arange(k), counts)
+
+    # index of the next point on each trace (the last point wraps to the first)
+    last = offsets[1:] - 1
+    nxt = np.arange(len(points)) + 1
+    nxt[last] = starts
+
+    # centroid of the untransformed points
+    x, y = points[:, 0], points[:, 1]
+    raw_centroid = _batchCentroid(x, y, x[nxt], y[nxt], trace_idx, counts)
+
+    # transform the points and centroids
+    if tforms is None:
+        tformed = points
+        centroids = raw_centroid
+    else:
+        tforms = np.asarray(tforms, dtype=np.float64)
+        if tforms.ndim == 2:
+            tformed = points @ tforms[:, :2].T + tforms[:, 2]
+            centroids = raw_centroid @ tforms[:, :2].T + tforms[:, 2]
+        else:
+            m = tforms[trace_idx]
+            tformed = np.einsum("nij,nj->ni", m[:, :, :2], points) + m[:, :, 2]
+            centroids = np.einsum("kij,kj->ki", tforms[:, :, :2], raw_centroid) + tforms[:, :, 2]
+    
+    x, y = tformed[:, 0], tformed[:, 1]
+    xn, yn = x[nxt], y[nxt]
+
+    # length (the closing segment only counts for closed traces)
+    seg = np.hypot(xn - x, yn - y)
+    seg[last[~closed]] = 0
+    length = np.round(np.bincount(trace_idx, seg, k), 7)
+
+    # area
+    area = np.abs(np.bincount(trace_idx, x*yn - xn*y, k) / 2)
+    area[~closed] = 0
+    if negative is not None:
+        area[np.asarray(negative, dtype=bool)] *= -1
+
+    # radius (from the centroid of the transformed points)
+    tformed_centroid = _batchCentroid(x, y, xn, yn, trace_idx, counts)
+    dist = np.hypot(x - tformed_centroid[trace_idx, 0], y - tformed_centroid[trace_idx, 1])
+    radius = np.maximum.reduceat(dist, starts)
+
+    # feret diameters (from the convex hull of each closed trace)
+    ferets = np.zeros((k, 2))
+    for i in np.flatnonzero(closed & (counts > 1)):
+        ferets[i] = hullFeret(tformed[starts[i]:offsets[i+1]])
+
+    return {
+        "length": length,
+        "area": area,
+        "radius": radius,
+        "centroid": centroids,
+        "feret": ferets
+    }
+
+
+def traceMetrics(points : np.ndarray, closed : bool = True, negative : bool = False, tform : np.ndarray = None) -> dict:
+    """Compute the metrics for a single trace (see batchTraceMetrics).
+    
+        Params:
+            points (np.ndarray): (N, 2) array of the untransformed points
+            closed (bool): True if the trace is closed
+            negative (bool): True if the trace is negative
+            tform (np.ndarray): (2, 3) transform applied to the points
+        Returns:
+            (dict): "length", "area", "radius" (float), "centroid" and "feret" (tuple)
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    m = batchTraceMetrics(points, [0, len(points)], [closed], [negative], tform)
+    return {
+        "length": float(m["length"][0]),
+        "area": float(m["area"][0]),
+        "radius": float(m["radius"][0]),
+        "centroid": tuple(m["centroid"][0].tolist()),
+        "feret": tuple(m["feret"][0].tolist())
+    }
+
+
+def hullFeret(points : np.ndarray) -> tuple:
+    """Find the min and max Feret diameters of a set of points.
+
+    The rotating calipers only need the convex hull vertices, so larger
+    point sets are reduced to their hull first.
+    
+        Params:
+            points (np.ndarray): (N, 2) array of points
+        Returns:
+            (tuple): the min and max Feret diameters
+    """
+    if len(points) > 16:
+        try:
+            points = points[ConvexHull(points).vertices]
+        except Exception:  # degenerate (e.g. colinear) point sets
+            pass
+    return feret([tuple(p) for p in points.tolist()])
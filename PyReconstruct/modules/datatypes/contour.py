@@ -1,4 +1,5 @@
 from .trace import Trace
+from .trace_duplicates import matchTraces
 from .flag import Flag
 
 class Contour():
@@ -151,20 +152,14 @@ class Contour():
         # gather remaining traces that aren't the same between series
         rem_s_traces = self[i:]
         rem_o_traces = other[i:]
-        first_comparison = True
-        for o_trace in rem_o_traces.copy():
-            found_i = None
-            for i, s_trace in enumerate(rem_s_traces):
-                if first_comparison:  # skip the first comparison -- we already know its false
-                    first_comparison = False
-                    continue
-                if s_trace.overlaps(o_trace, threshold=0.95):
-                    addDuplicate(s_trace, o_trace, traces)
-                    found_i = i
-                    break
-            if found_i is not None:
-                rem_s_traces.pop(found_i)
-                rem_o_traces.remove(o_trace)
+        # skip the first comparison -- we already know its false
+        pairs = matchTraces(rem_s_traces, rem_o_traces, threshold=0.95, skip=(0, 0))
+        for si, oi in pairs:
+            addDuplicate(rem_s_traces[si], rem_o_traces[oi], traces)
+        paired_s = set(si for si, _ in pairs)
+        paired_o = set(oi for _, oi in pairs)
+        rem_s_traces = [t for si, t in enumerate(rem_s_traces) if si not in paired_s]
+        rem_o_traces = [t for oi, t in enumerate(rem_o_traces) if oi not in paired_o]
         traces += rem_s_traces + rem_o_traces
         
         # replace traces list with new list
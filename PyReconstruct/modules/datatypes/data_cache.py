@@ -0,0 +1,160 @@
+"""Persistent cache of per-section series data summaries.
+
+Summaries (see parallel_open.summarizeSection) are keyed by a hash of the
+section file contents and of the alignment information used to compute them,
+so a section that is saved with new contents, or whose object alignments
+change, simply misses the cache. The cache is a small SQLite database stored
+next to the hidden series directory. It is only an accelerator: any error
+reading or writing it is ignored and the summary is recomputed.
+
+The cache file travels with the series folder, so the summaries are stored as
+JSON and checked when read (never unpickled): a planted or corrupt entry is
+treated as a miss.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+
+CACHE_VERSION = 2  # bump when the summary format or TraceData changes
+
+
+def getCacheFp(hidden_dir : str) -> str:
+    """Return the cache filepath for a hidden series directory.
+
+    The cache sits beside the jser as .<series name>.cache (outside the hidden
+    directory, so it outlives each session).
+
+        Params:
+            hidden_dir (str): the hidden series directory
+    """
+    return os.path.join(
+        os.path.dirname(hidden_dir),
+        os.path.basename(hidden_dir) + ".cache"
+    )
+
+
+def getCacheKey(section_fp : str, align_info : tuple) -> str:
+    """Return the cache key for a section file.
+
+        Params:
+            section_fp (str): the section filepath
+            align_info (tuple): the alignment information (see parallel_open.getAlignInfo)
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(json.dumps([CACHE_VERSION, align_info], sort_keys=True).encode("utf-8"))
+    with open(section_fp, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+SUMMARY_KEYS = (
+    "thickness", "calgrid", "locked", "bc_profiles", "src",
+    "mag", "flags", "tforms", "traces", "reset_alignment"
+)
+
+
+def encodeSummary(summary : dict) -> str:
+    """Encode a section summary as JSON.
+
+        Params:
+            summary (dict): the section summary (see parallel_open.summarizeSection)
+        Returns:
+            (str): the JSON text
+    """
+    data = dict(summary)
+    data["traces"] = {
+        name : [trace_data.getList() for trace_data in trace_list]
+        for name, trace_list in summary["traces"].items()
+    }
+    return json.dumps(data)
+
+
+def decodeSummary(text : str) -> dict:
+    """Decode a section summary from JSON.
+
+        Params:
+            text (str): the JSON text (see encodeSummary)
+        Returns:
+            (dict): the section summary
+    """
+    from .series_data import TraceData  # (imports this module)
+
+    data = json.loads(text)
+    if not isinstance(data, dict) or set(data.keys()) != set(SUMMARY_KEYS):
+        raise ValueError("Invalid section summary")
+    if not isinstance(data["traces"], dict) or not isinstance(data["tforms"], dict):
+        raise ValueError("Invalid section summary")
+    if not isinstance(data["src"], str) or not isinstance(data["reset_alignment"], list):
+        raise ValueError("Invalid section summary")
+    data["traces"] = {
+        str(name) : [TraceData.fromList(l) for l in trace_list]
+        for name, trace_list in data["traces"].items()
+    }
+    return data
+
+
+class SeriesDataCache():
+
+    def __init__(self, fp : str):
+        """Open the series data cache.
+
+            Params:
+                fp (str): the filepath for the cache database
+        """
+        self.fp = fp
+        try:
+            self.conn = sqlite3.connect(fp, timeout=30)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, data TEXT)"
+            )
+        except sqlite3.Error:
+            self.conn = None
+
+    def get(self, key : str) -> dict:
+        """Return a cached section summary (None if not cached).
+
+            Params:
+                key (str): the cache key
+        """
+        if self.conn is None:
+            return None
+        try:
+            row = self.conn.execute(
+                "SELECT data FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            return decodeSummary(row[0]) if row else None
+        except Exception:
+            return None
+
+    def update(self, summaries : dict, keep : set = None):
+        """Store section summaries and optionally discard all others.
+
+            Params:
+                summaries (dict): cache key : section summary
+                keep (set): the keys to keep (None to keep all existing entries)
+        """
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO summaries VALUES (?, ?)",
+                    [(k, encodeSummary(s)) for k, s in summaries.items()]
+                )
+                if keep is not None:
+                    stale = [
+                        (k,) for (k,) in self.conn.execute("SELECT key FROM summaries")
+                        if k not in keep
+                    ]
+                    self.conn.executemany("DELETE FROM summaries WHERE key = ?", stale)
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """Close the cache database."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -1,4 +1,5 @@
 import os
+import getpass
 
 # MFO = modifiable from options dialog
 
@@ -6,8 +7,8 @@ def get_username() -> str:
     """Return username."""
     try:
         user = os.getlogin()
-    except FileNotFoundError:
-        user = os.environ.get("USER")
+    except OSError:  # no controlling terminal (e.g., jobs run by cron or a scheduler)
+        user = getpass.getuser()
     return user
 
 default_settings = {
@@ -45,11 +46,18 @@ default_settings = {
     "left_handed": False,  # MFO
     "utc": False,  # MFO
     "cpu_max": 100, 
+    "undo_memory_mb": 256,  # memory budget for undo states before they are written to disk
+    "undo_max_states": 1000,  # undo states kept for each section (0 for no limit)
+    "undo_max_age": 0,  # minutes that undo states are kept (0 for no limit)
+    "section_cache_mb": 512,  # memory budget for parsed sections kept for reloading (0 to disable)
+    "prefetch_sections": 2,  # sections loaded in the background on each side of the current section (0 to disable)
+    "prefetch_mb": 512,  # memory budget for prefetched sections
 
     # view
     "3D_xy_res": 0,  # 0-100  # MFO
     "3D_smoothing": "humphrey",  # MFO
     "smoothing_iterations": 10,  # MFO
+    "3D_triangle_budget": 2000000,  # triangles drawn in the 3D scene before using coarser levels of detail  # MFO
     "screenshot_res": 300,
     "show_ztraces": True,  # MFO
     "fill_opacity": 0.2,  # MFO
@@ -58,6 +66,7 @@ default_settings = {
     "show_flags": "unresolved",  # MFO
     "display_closest": True,  # MFO
     "flag_size": 14,  # MFO
+    "image_cache_mb": 512,  # memory budget for cached image tiles
 
     # mouse tools
     "pointer": ["lasso", "exc"],  # MFO
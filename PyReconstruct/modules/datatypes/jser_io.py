@@ -0,0 +1,136 @@
+"""Streaming reader and writer for jser files.
+
+A jser file is a single JSON object that can be several GB in size. These
+helpers parse and write it one top-level value (or one section) at a time so
+that memory use stays close to the size of the largest section.
+"""
+
+import os
+import json
+
+CHUNK_SIZE = 2**22  # characters read from the file at a time
+
+
+class JserReader():
+
+    def __init__(self, fp : str, chunk_size : int = CHUNK_SIZE):
+        """Iterate through the top-level items of a jser file.
+
+        Items of the "sections" list are yielded one at a time as
+        ("sections", (snum, section_data)); all other items are yielded as
+        (key, value).
+
+            Params:
+                fp (str): the filepath to the jser
+                chunk_size (int): the number of characters to read at a time
+        """
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.consumed = 0  # characters parsed so far (for progress)
+
+    def __iter__(self):
+        with open(self.fp, "r") as self.f:
+            self.buf = ""
+            self.pos = 0
+            self.eof = False
+
+            self._expect("{")
+            if self._peek() == "}":
+                return
+            while True:
+                key = self._value()
+                self._expect(":")
+                if key == "sections" and self._peek() == "[":
+                    self._expect("[")
+                    if self._peek() == "]":
+                        self._expect("]")
+                    else:
+                        snum = 0
+                        while True:
+                            yield key, (snum, self._value())
+                            snum += 1
+                            if self._next() == "]":
+                                break
+                else:
+                    yield key, self._value()
+                if self._next() == "}":
+                    break
+
+    def _fill(self, n : int):
+        """Read more characters into the buffer, dropping those already parsed."""
+        chunk = self.f.read(n)
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def _peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\n\r":
+                self.pos += 1
+                self.consumed += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError(f"Unexpected end of jser file: {self.fp}")
+            self._fill(self.chunk_size)
+
+    def _next(self) -> str:
+        """Consume and return the next non-whitespace character."""
+        c = self._peek()
+        self.pos += 1
+        self.consumed += 1
+        return c
+
+    def _expect(self, c : str):
+        """Consume the next non-whitespace character and check that it matches."""
+        found = self._next()
+        if found != c:
+            raise ValueError(f"Expected '{c}' but found '{found}' in jser file: {self.fp}")
+
+    def _value(self):
+        """Decode the next JSON value, reading more of the file as needed."""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a value ending at the buffer edge could be a truncated number
+                if end < len(self.buf) or self.eof:
+                    self.consumed += end - self.pos
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # grow the buffer geometrically so large values are parsed in few passes
+            self._fill(max(self.chunk_size, len(self.buf)))
+
+
+def writeJser(fp : str, sections, series_data : dict, log : str):
+    """Write a jser file one section at a time.
+
+    The file is written next to its destination and moved into place when
+    complete.
+
+        Params:
+            fp (str): the filepath to the jser
+            sections (iterable): the section data (or None) for each section number in order
+            series_data (dict): the series data
+            log (str): the series log
+    """
+    tmp_fp = fp + ".tmp"
+    with open(tmp_fp, "w") as f:
+        # the series is written first so that sections can be fully processed as they are read
+        f.write('{"series": ')
+        f.write(json.dumps(series_data))
+        f.write(', "log": ')
+        f.write(json.dumps(log))
+        f.write(', "sections": [')
+        for i, section_data in enumerate(sections):
+            if i:
+                f.write(", ")
+            f.write(json.dumps(section_data))
+        f.write("]}")
+    os.replace(tmp_fp, fp)
@@ -177,9 +177,107 @@ class Log():
 class LogSet():
 
     def __init__(self):
-        """Create the log set."""
-        self.dyn_logs = {}  # organized by name and event
-        self.all_logs = []
+        """Create the log set.
+        
+        Logs are kept in an append-only list; removed logs are replaced with
+        None so that the position of a log never changes. The logs for each
+        object are indexed by position so that lookups and removals only
+        touch the logs of that object.
+        """
+        self.dyn_logs = {}  # organized by name and event (stores positions)
+        self.logs = []  # append-only, None for removed logs
+        self.obj_index = {}  # obj_name : list of positions (in order)
+        self.count = 0  # the number of logs that have not been removed
+        self.log_list = None  # the logs that have not been removed (built when first needed)
+    
+    @property
+    def all_logs(self) -> list:
+        """The logs in the set (in order).
+
+        The list is kept between calls: do NOT modify it. Use iterLogs to
+        simply go through the logs.
+        """
+        if self.log_list is None:
+            self.log_list = [log for log in self.logs if log is not None]
+        return self.log_list
+    
+    def __len__(self):
+        return self.count
+    
+    def iterLogs(self, start : int = 0):
+        """Iterate through the logs in the set.
+        
+            Params:
+                start (int): the position to start from
+            Yields:
+                (int): the position of the log
+                (Log): the log
+        """
+        for pos in range(start, len(self.logs)):
+            log = self.logs[pos]
+            if log is not None:
+                yield pos, log
+    
+    def getLast(self) -> Log:
+        """Get the most recent log in the set (None if empty)."""
+        for pos in range(len(self.logs) - 1, -1, -1):
+            if self.logs[pos] is not None:
+                return self.logs[pos]
+        return None
+    
+    def append(self, log : Log) -> int:
+        """Append a log to the set and index it.
+        
+            Params:
+                log (Log): the log to append
+            Returns:
+                (int): the position of the log
+        """
+        pos = len(self.logs)
+        self.logs.append(log)
+        if log.obj_name not in self.obj_index:
+            self.obj_index[log.obj_name] = []
+        self.obj_index[log.obj_name].append(pos)
+        self.count += 1
+        if self.log_list is not None:
+            self.log_list.append(log)
+        return pos
+    
+    def removeObjectLogs(self, obj_name : str, condition):
+        """Remove the logs for an object that meet a condition.
+        
+            Params:
+                obj_name (str): the name of the object
+                condition (function): takes a log and returns True if it should be removed
+        """
+        if obj_name not in self.obj_index:
+            return
+        kept = []
+        for pos in self.obj_index[obj_name]:
+            log = self.logs[pos]
+            if log is None:
+                continue
+            if condition(log):
+                self.logs[pos] = None
+                self.count -= 1
+                self.log_list = None
+            else:
+                kept.append(pos)
+        if kept:
+            self.obj_index[obj_name] = kept
+        else:
+            del(self.obj_index[obj_name])
+    
+    def getDynLog(self, obj_key : str, event : str) -> Log:
+        """Get the dynamically tracked log for an object and event (None if not tracked).
+        
+            Params:
+                obj_key (str): the object name ("-" if None)
+                event (str): the event of the log
+        """
+        if obj_key in self.dyn_logs and event in self.dyn_logs[obj_key]:
+            return self.logs[self.dyn_logs[obj_key][event]]
+        return None
     
     def addLog(self, user : str, obj_name : str, snum : int, event : str):
         """Add a log to the set.
@@ -190,22 +288,24 @@ class LogSet():
                 snum (int): the section number associated with the log
                 event (str): the description of the event
         """
+        last_log = self.getLast()
+
         # compare the user to the last log
-        if self.all_logs and user != self.all_logs[-1].user:
+        if last_log and user != last_log.user:
             # clear dynamic log if so
             self.dyn_logs = {}
         
         if snum is not None:  # dynamic log
             obj_key = obj_name if obj_name else "-"
-            if obj_key in self.dyn_logs and event in self.dyn_logs[obj_key]:
-                self.dyn_logs[obj_key][event].addSection(snum)
+            dyn_log = self.getDynLog(obj_key, event)
+            if dyn_log:
+                dyn_log.addSection(snum)
             else:
                 if obj_key not in self.dyn_logs:
                     self.dyn_logs[obj_key] = {}
                 d, t = getDateTime()
                 l = Log(d, t, user, obj_name, snum, event)
-                self.all_logs.append(l)
-                self.dyn_logs[obj_key][event] = l
+                self.dyn_logs[obj_key][event] = self.append(l)
         else:  # static log
             d, t = getDateTime()
             log = Log(d, t, user, obj_name, snum, event)
@@ -214,25 +314,26 @@ class LogSet():
             if event == "Create object":
                 # check the previous log to see if traces were created
                 if (
-                    self.all_logs and
-                    self.all_logs[-1].obj_name == obj_name and 
-                    "Create trace(s)" in self.all_logs[-1].event):
-                    event = self.all_logs[-1].event
-                    self.all_logs[-1].event = event.replace("trace(s)", "object")
+                    last_log and
+                    last_log.obj_name == obj_name and 
+                    "Create trace(s)" in last_log.event):
+                    event = last_log.event
+                    last_log.event = event.replace("trace(s)", "object")
                 else:
-                    self.all_logs.append(log)
+                    self.append(log)
             elif event == "Delete object":
                 # remove object from dynamic log
                 if obj_name in self.dyn_logs:
                     del(self.dyn_logs[obj_name])
                 # remove all previous logs associated with the object
-                for l in self.all_logs.copy():
-                    if l.obj_name == obj_name and "Create object" not in l.event:
-                        self.all_logs.remove(l)
-                self.all_logs.append(log)
+                self.removeObjectLogs(
+                    obj_name,
+                    lambda l : "Create object" not in l.event
+                )
+                self.append(log)
             # non-special cases
             else:
-                self.all_logs.append(log)
+                self.append(log)
         
         # # for debugging
         # # Clear console
@@ -249,13 +350,13 @@ class LogSet():
                 log (Log): the log to add to the set
                 track_dyn (bool): True if log should be dynamically tracked
         """
-        self.all_logs.append(log)
+        pos = self.append(log)
         if track_dyn:
             if log.section_ranges:
                 obj_key = log.obj_name if log.obj_name else "-"
                 if obj_key not in self.dyn_logs:
                     self.dyn_logs[obj_key] = {}
-                self.dyn_logs[obj_key][log.event] = log
+                self.dyn_logs[obj_key][log.event] = pos
     
     def getLogList(self, as_str=False):
         """Return the stored logs as a list.
@@ -267,22 +368,18 @@ class LogSet():
         """
         if as_str:
             logs_str = []
-            for log in self.all_logs:
+            for _, log in self.iterLogs():
                 logs_str.append(str(log))
             return "\n".join(logs_str)
         else:
-            return self.all_logs.copy()
+            return self.all_logs
     
     def __str__(self):
         return self.getLogList(as_str=True)
 
     def getList(self) -> list:
         """Return log set as a list"""
-        log_list = self.getLogList()
-        for i, log in enumerate(log_list):
-            log_list[i] = str(log)
-        
-        return log_list
+        return [str(log) for _, log in self.iterLogs()]
     
     def fromList(log_list : list):
         """Get a log set from a list.
@@ -305,34 +402,58 @@ class LogSet():
         
         return log_set
     
+    def getObjectSet(self, obj_names : list):
+        """Get a log set containing only the logs for a set of objects.
+        
+            Params:
+                obj_names (list): the names of the objects to include
+            Returns:
+                (LogSet): the new log set (shares the log objects)
+        """
+        positions = []
+        for name in set(obj_names):
+            positions += self.obj_index.get(name, [])
+        positions.sort()
+
+        log_set = LogSet()
+        for pos in positions:
+            if self.logs[pos] is not None:
+                log_set.addExistingLog(self.logs[pos])
+        
+        return log_set
+    
     def removeCuration(self, obj_name : str):
         """Remove all curation logs in the session.
         
             Params:
                 obj_name (str): the name of the object to remove curation for
         """
-        for log in self.all_logs.copy():
-            if (obj_name == log.obj_name and 
-                ("curated" in log.event or "curation" in log.event)):
-                self.all_logs.remove(log)
+        self.removeObjectLogs(
+            obj_name,
+            lambda log : "curated" in log.event or "curation" in log.event
+        )
     
     def getLastIndex(self, snum : int, cname : str):
-        """Scan the history and return the date for a contour on a given section.
+        """Scan the history of a contour and return the position of its last log on a given section.
+
+        Positions are indices into the append-only log list (the same as the
+        index in all_logs if no logs have been removed).
         
             Params:
                 snum (int): the section number
                 cname (str): the contour name
+            Returns:
+                (int): the position of the last log (-1 if none)
         """
-        i = len(self.all_logs) - 1
-        for log in reversed(self.all_logs):
+        for pos in reversed(self.obj_index.get(cname, [])):
+            log = self.logs[pos]
             if (
-                log.obj_name == cname and 
+                log is not None and
                 ("ztrace" not in log.event) and 
                 (log.containsSection(snum) or (log.section_ranges is None))
             ):
-                return i
-            i -= 1
-        return i
+                return pos
+        return -1
 
 class LogSetPair():
 
@@ -346,19 +467,19 @@ class LogSetPair():
         self.logset0 = logset0
         self.logset1 = logset1
 
-        # get the index for the diverge
+        # get the index for the diverge (and the positions of the last shared log in each set)
         i = 0
-        while (
-            i < len(self.logset0.all_logs) and
-            i < len(self.logset1.all_logs) and
-            self.logset0.all_logs[i] == self.logset1.all_logs[i]
-        ):
+        self.last_shared_pos = [-1, -1]
+        for (pos0, log0), (pos1, log1) in zip(logset0.iterLogs(), logset1.iterLogs()):
+            if log0 != log1:
+                break
+            self.last_shared_pos = [pos0, pos1]
             i += 1
         
         self.last_shared_index = i-1
 
         self.complete_match = (
-            i == len(self.logset0.all_logs) == len(self.logset1.all_logs)
+            i == len(self.logset0) == len(self.logset1)
         )
     
     def importLogs(
@@ -380,8 +501,7 @@ class LogSetPair():
                 regex_filters (list): the list of regex filters used to filter names
         """
         # filter out similar history
-        for i in range(self.last_shared_index + 1, len(self.logset1.all_logs)):
-            log = self.logset1.all_logs[i]
+        for _, log in self.logset1.iterLogs(self.last_shared_pos[1] + 1):
 
             # check for trace/ztrace status
             include_log = traces and ("ztrace" not in log.event)
@@ -409,7 +529,7 @@ class LogSetPair():
         if traces:
             # iterate through the series log and update the last users
             last_user_data = {}  # obj_name : (user, datetime)
-            for log in self.logset0.all_logs[self.last_shared_index+1:]:
+            for _, log in self.logset0.iterLogs(self.last_shared_pos[0] + 1):
                 log : Log
                 if log.obj_name and ("ztrace" not in log.event):
                     user0, dt0 = log.user, (log.date + log.time)
@@ -438,6 +558,6 @@ class LogSetPair():
         modified_since_diverge = [False, False]
         for i, ls in enumerate((self.logset0, self.logset1)):
             last_index = ls.getLastIndex(snum, cname)
-            if last_index > self.last_shared_index:
+            if last_index > self.last_shared_pos[i]:
                 modified_since_diverge[i] = True
         return tuple(modified_since_diverge)
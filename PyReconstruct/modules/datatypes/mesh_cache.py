@@ -0,0 +1,265 @@
+"""Persistent cache of generated 3D object meshes.
+
+Meshes are keyed by object name and by a digest of everything used to
+generate them (the transformed traces, which include the transforms and the
+object alignment, the 3D mode and the volume resolution and smoothing), so a
+changed object simply misses the cache. Only the latest mesh is kept for each
+object, and the meshes of objects that no longer exist are pruned when the
+series is saved (see pruneMeshes). Like the series data cache, the cache is a
+SQLite database stored next to the hidden series directory and any error
+reading or writing it is ignored. Decimated levels of detail are stored in a
+separate table under the same key as the mesh (see
+backend/volume/mesh_lod.py).
+
+The cache file travels with the series folder, so meshes are stored as the
+raw bytes of their numpy arrays with dtype and shape columns (never pickled)
+and are checked when read: a planted or corrupt entry is treated as a miss.
+"""
+
+import os
+import pickle
+import sqlite3
+import hashlib
+
+import numpy as np
+
+CACHE_VERSION = 2  # bump when the mesh generation changes
+
+
+def getMeshCacheFp(hidden_dir : str) -> str:
+    """Return the mesh cache filepath for a hidden series directory.
+
+        Params:
+            hidden_dir (str): the hidden series directory
+    """
+    return os.path.join(
+        os.path.dirname(hidden_dir),
+        os.path.basename(hidden_dir) + ".meshes"
+    )
+
+
+def getMeshKey(mode : str, mesh_args : tuple) -> str:
+    """Return the digest of the data used to generate a mesh.
+
+        Params:
+            mode (str): the 3D mode of the object
+            mesh_args (tuple): the picklable arguments of the mesh function
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(pickle.dumps((CACHE_VERSION, mode, mesh_args), protocol=4))
+    return h.hexdigest()
+
+
+ARRAY_KINDS = "biuf"  # the numpy dtype kinds that can be stored
+
+
+def toRows(arrays : list) -> list:
+    """Convert numpy arrays to cache rows.
+
+        Params:
+            arrays (list): the numpy arrays
+        Returns:
+            (list): (part, dtype, shape, data) for each array
+    """
+    rows = []
+    for part, a in enumerate(arrays):
+        a = np.ascontiguousarray(a)
+        if a.dtype.kind not in ARRAY_KINDS:
+            raise TypeError(f"Cannot store {a.dtype} arrays")
+        rows.append((
+            part,
+            a.dtype.str,
+            ",".join(str(n) for n in a.shape),
+            a.tobytes()
+        ))
+    return rows
+
+
+def fromRows(rows : list) -> list:
+    """Convert cache rows back to numpy arrays (see toRows).
+
+        Params:
+            rows (list): (part, dtype, shape, data) for each array
+        Returns:
+            (list): the numpy arrays (None if the rows are not valid)
+    """
+    arrays = []
+    for i, (part, dtype, shape, data) in enumerate(sorted(rows)):
+        if part != i:
+            return None
+        dtype = np.dtype(str(dtype))
+        if dtype.kind not in ARRAY_KINDS:
+            return None
+        shape = tuple(int(n) for n in str(shape).split(",") if n)
+        if any(n < 0 for n in shape) or int(np.prod(shape, dtype=np.int64)) * dtype.itemsize != len(data):
+            return None
+        arrays.append(np.frombuffer(data, dtype=dtype).reshape(shape).copy())
+    return arrays
+
+
+class MeshCache():
+
+    def __init__(self, fp : str):
+        """Open the mesh cache.
+
+            Params:
+                fp (str): the filepath for the cache database
+        """
+        self.fp = fp
+        try:
+            self.conn = sqlite3.connect(fp, timeout=30)
+            with self.conn:
+                # (tables from older versions held pickled meshes)
+                self.conn.execute("DROP TABLE IF EXISTS meshes")
+                self.conn.execute("DROP TABLE IF EXISTS lods")
+                for table in ("mesh_arrays", "lod_arrays"):
+                    self.conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {table} (name TEXT, key TEXT, part INTEGER, dtype TEXT, shape TEXT, data BLOB, PRIMARY KEY (name, key, part))"
+                    )
+        except sqlite3.Error:
+            self.conn = None
+
+    def getArrays(self, table : str, name : str, key : str) -> list:
+        """Return the cached arrays stored for an object (None if not cached).
+
+            Params:
+                table (str): the table name
+                name (str): the object name
+                key (str): the cache key
+        """
+        if self.conn is None:
+            return None
+        try:
+            rows = self.conn.execute(
+                f"SELECT part, dtype, shape, data FROM {table} WHERE name = ? AND key = ?", (name, key)
+            ).fetchall()
+            return fromRows(rows) if rows else None
+        except Exception:
+            return None
+
+    def putArrays(self, table : str, name : str, key : str, arrays : list):
+        """Store the arrays for an object, replacing any other version of them.
+
+            Params:
+                table (str): the table name
+                name (str): the object name
+                key (str): the cache key
+                arrays (list): the numpy arrays
+        """
+        if self.conn is None:
+            return
+        try:
+            rows = toRows(arrays)
+            with self.conn:
+                self.conn.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+                self.conn.executemany(
+                    f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?)",
+                    [(name, key) + row for row in rows]
+                )
+        except (sqlite3.Error, TypeError):
+            pass
+
+    def get(self, name : str, key : str) -> tuple:
+        """Return the cached mesh data for an object (None if not cached).
+
+            Params:
+                name (str): the object name
+                key (str): the mesh key (from getMeshKey)
+        """
+        arrays = self.getArrays("mesh_arrays", name, key)
+        return None if arrays is None else tuple(arrays)
+
+    def put(self, name : str, key : str, mesh_data : tuple):
+        """Store the mesh data for an object, replacing any other version of it.
+
+            Params:
+                name (str): the object name
+                key (str): the mesh key (from getMeshKey)
+                mesh_data (tuple): the arrays returned by the mesh function
+        """
+        self.putArrays("mesh_arrays", name, key, mesh_data)
+
+    def getLODs(self, name : str, key : str) -> list:
+        """Return the cached levels of detail for an object mesh (None if not cached).
+
+            Params:
+                name (str): the object name
+                key (str): the mesh key (from getMeshKey)
+        """
+        if self.conn is None:
+            return None
+        try:
+            # an object without levels is stored with an empty marker
+            if self.conn.execute(
+                "SELECT 1 FROM lod_arrays WHERE name = ? AND key = ? AND part = -1", (name, key)
+            ).fetchone():
+                return []
+        except sqlite3.Error:
+            return None
+        arrays = self.getArrays("lod_arrays", name, key)
+        if arrays is None or len(arrays) % 2:
+            return None
+        return [(arrays[i], arrays[i+1]) for i in range(0, len(arrays), 2)]
+
+    def putLODs(self, name : str, key : str, lods : list):
+        """Store the levels of detail for an object mesh, replacing any other version of it.
+
+            Params:
+                name (str): the object name
+                key (str): the mesh key (from getMeshKey)
+                lods (list): (vertices, faces) for each level
+        """
+        if lods:
+            self.putArrays("lod_arrays", name, key, [a for level in lods for a in level])
+            return
+        if self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM lod_arrays WHERE name = ?", (name,))
+                self.conn.execute(
+                    "INSERT INTO lod_arrays VALUES (?, ?, -1, '', '', x'')", (name, key)
+                )
+        except sqlite3.Error:
+            pass
+
+    def prune(self, keep_names):
+        """Remove the cached meshes (and levels of detail) of all other objects.
+
+            Params:
+                keep_names (iterable): the names of the objects to keep
+        """
+        if self.conn is None:
+            return
+        keep_names = set(keep_names)
+        try:
+            with self.conn:
+                for table in ("mesh_arrays", "lod_arrays"):
+                    names = [row[0] for row in self.conn.execute(f"SELECT DISTINCT name FROM {table}")]
+                    self.conn.executemany(
+                        f"DELETE FROM {table} WHERE name = ?",
+                        [(name,) for name in names if name not in keep_names]
+                    )
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """Close the cache database."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def pruneMeshes(hidden_dir : str, keep_names):
+    """Remove the cached meshes of objects that are not in the series (if the cache exists).
+
+        Params:
+            hidden_dir (str): the hidden series directory
+            keep_names (iterable): the names of the objects in the series
+    """
+    fp = getMeshCacheFp(hidden_dir)
+    if not os.path.isfile(fp):
+        return
+    cache = MeshCache(fp)
+    cache.prune(keep_names)
+    cache.close()
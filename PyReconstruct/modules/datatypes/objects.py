@@ -36,15 +36,20 @@ class Objects():
 
         series_code = self.series.code
 
-        for obj_name in sorted(self.series.data["objects"].keys()):
+        ## Get the quantities for all objects at once
+        obj_names = sorted(self.series.data["objects"].keys())
+        stats = self.series.data.trace_table.getObjectStats(obj_names)
+        lines = [out_str]
 
-            out_str += f"{series_code}{sep}"
+        for i, obj_name in enumerate(obj_names):
+
+            out_str = f"{series_code}{sep}"
             out_str += f"{obj_name}{sep}"
-            out_str += f"{self.series.data.getStart(obj_name)}{sep}"
-            out_str += f"{self.series.data.getEnd(obj_name)}{sep}"
-            out_str += f"{self.series.data.getCount(obj_name)}{sep}"
-            out_str += f"{self.series.data.getFlatArea(obj_name)}{sep}"
-            out_str += f"{self.series.data.getVolume(obj_name)}{sep}"
+            out_str += f"{stats['start'][i]}{sep}"
+            out_str += f"{stats['end'][i]}{sep}"
+            out_str += f"{stats['count'][i]}{sep}"
+            out_str += f"{stats['flat_area'][i]}{sep}"
+            out_str += f"{stats['volume'][i]}{sep}"
             out_str += f"{':'.join(self.series.object_groups.getObjectGroups(obj_name))}{sep}"
             out_str += f"{':'.join(self.series.data.getTags(obj_name))}{sep}"
             out_str += f"{self.series.getAttr(obj_name, 'last_user')}{sep}"
@@ -68,6 +73,9 @@ class Objects():
             ## Remove seperator from comments
             comments = self.series.getAttr(obj_name, "comment").replace(sep, "_")
             out_str += comments + "\n"
+            lines.append(out_str)
+        
+        out_str = "".join(lines)
             
         if out_fp:
             
@@ -0,0 +1,208 @@
+"""Functions run on a process pool while opening a jser file.
+
+Each worker normalizes a section, writes its hidden file, and computes the
+section's series data summary (section attributes and TraceData for each
+object). Summaries only contain picklable data; the parent process merges them
+into SeriesData with SeriesData.addSectionSummary.
+"""
+
+import os
+import json
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .section import Section
+from .trace import Trace
+from .transform import Transform
+from .series_data import batchTraceData
+from .section_store import readSectionDict, writeSectionDict
+from .data_cache import SeriesDataCache, getCacheKey
+
+# jser files smaller than this are opened in the current process
+PARALLEL_MIN_SIZE = 32 * 2**20
+
+# jser characters of the parsed sections that may wait for the process pool at once
+# (a parsed section takes several times its size in the jser)
+PENDING_MAX_SIZE = 64 * 2**20
+
+
+class InlineExecutor():
+    """Executor that runs submitted functions immediately in the current process."""
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def getExecutor(file_size : int, max_workers : int):
+    """Return the executor used to open a jser file.
+
+        Params:
+            file_size (int): the size of the jser file in bytes
+            max_workers (int): the maximum number of processes
+    """
+    if max_workers <= 1 or file_size < PARALLEL_MIN_SIZE:
+        return InlineExecutor()
+    # spawn rather than fork: the GUI process may be running other threads
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def getAlignInfo(series_data : dict) -> tuple:
+    """Get the alignment information needed to summarize sections.
+
+        Params:
+            series_data (dict): the series JSON data
+        Returns:
+            (str): the series alignment
+            (dict): object name : fixed alignment (for objects with a fixed alignment)
+    """
+    obj_alignments = {}
+    for name, attrs in series_data["obj_attrs"].items():
+        if attrs.get("alignment") is not None:
+            obj_alignments[name] = attrs["alignment"]
+    return series_data["alignment"], obj_alignments
+
+
+def unpackSection(section_data : dict, snum : int, section_fp : str, binary : bool, align_info : tuple = None, cache_fp : str = None) -> tuple:
+    """Normalize a section from a jser and write it to the hidden directory.
+
+        Params:
+            section_data (dict): the section JSON data
+            snum (int): the section number
+            section_fp (str): the filepath for the hidden section file
+            binary (bool): True if the section should be written in the binary format
+            align_info (tuple): from getAlignInfo (None if the summary should not be computed)
+            cache_fp (str): the series data cache filepath (None if not using the cache)
+        Returns:
+            (tuple): see getSummary (None if align_info was not provided)
+    """
+    Section.updateJSON(section_data, snum)  # update any missing attributes
+    section_data["align_locked"] = True  # lock the section
+
+    if binary:
+        writeSectionDict(section_fp, section_data)
+    else:
+        with open(section_fp, "w") as f:
+            json.dump(section_data, f)
+
+    if align_info is None:
+        return None
+    return getSummary(section_fp, snum, align_info, cache_fp, section_data)
+
+
+def resubmitSection(section_fp : str, snum : int, binary : bool, align_info : tuple, cache_fp : str = None) -> tuple:
+    """Finish a section that was unpacked before the series data was read.
+
+    (Old jser layouts can list sections before the series.) The section was
+    written as JSON without a summary: rewrite it in the series section
+    format and summarize it.
+
+        Params:
+            section_fp (str): the filepath for the hidden section file
+            snum (int): the section number
+            binary (bool): True if the section should be written in the binary format
+            align_info (tuple): from getAlignInfo
+            cache_fp (str): the series data cache filepath (None if not using the cache)
+        Returns:
+            (tuple): see getSummary
+    """
+    section_data = readSectionDict(section_fp)
+    if binary:
+        writeSectionDict(section_fp, section_data)
+    return getSummary(section_fp, snum, align_info, cache_fp, section_data)
+
+
+def getSummary(section_fp : str, snum : int, align_info : tuple, cache_fp : str = None, section_data : dict = None) -> tuple:
+    """Get the summary of a hidden section file, using the cache if possible.
+
+        Params:
+            section_fp (str): the filepath for the hidden section file
+            snum (int): the section number
+            align_info (tuple): from getAlignInfo
+            cache_fp (str): the series data cache filepath (None if not using the cache)
+            section_data (dict): the updated section data if already loaded
+        Returns:
+            (int): the section number
+            (str): the cache key (None if not using the cache)
+            (dict): the section summary
+            (bool): True if the summary was found in the cache
+    """
+    key = None
+    if cache_fp:
+        key = getCacheKey(section_fp, align_info)
+        cache = SeriesDataCache(cache_fp)
+        summary = cache.get(key)
+        cache.close()
+        if summary is not None:
+            return snum, key, summary, True
+
+    if section_data is None:
+        section_data = readSectionDict(section_fp)
+        Section.updateJSON(section_data, snum)
+    return snum, key, summarizeSection(section_data, snum, align_info), False
+
+
+def summarizeSection(section_data : dict, snum : int, align_info : tuple) -> dict:
+    """Compute the series data summary for a section.
+
+        Params:
+            section_data (dict): the (updated) section JSON data
+            snum (int): the section number
+            align_info (tuple): from getAlignInfo
+        Returns:
+            (dict): the section summary
+    """
+    alignment, obj_alignments = align_info
+
+    tforms = {"no-alignment": Transform.identity()}
+    for a, tform_list in section_data["tforms"].items():
+        tforms[a] = Transform(tform_list)
+
+    contours = {}
+    contour_tforms = {}
+    reset_alignment = []
+    for name, trace_lists in section_data["contours"].items():
+        obj_alignment = obj_alignments.get(name)
+        if obj_alignment is None:
+            obj_alignment = alignment
+        elif obj_alignment not in tforms:
+            reset_alignment.append(name)
+            obj_alignment = alignment
+
+        trace_list = []
+        for l in trace_lists:
+            trace = Trace.fromList(list(l), name)
+            # screen for defective traces (as in Section)
+            n = len(trace.points)
+            if n == 2:
+                trace.closed = False
+            if n > 1:
+                trace_list.append(trace)
+        if trace_list:
+            contours[trace.name] = trace_list
+            contour_tforms[trace.name] = tforms[obj_alignment]
+    
+    traces = batchTraceData(contours, contour_tforms)
+
+    return {
+        "thickness": section_data["thickness"],
+        "calgrid": section_data["calgrid"],
+        "locked": section_data["align_locked"],
+        "bc_profiles": section_data["brightness_contrast_profiles"],
+        "src": os.path.basename(section_data["src"]),
+        "mag": section_data["mag"],
+        "flags": section_data["flags"],
+        "tforms": section_data["tforms"],
+        "traces": traces,
+        "reset_alignment": reset_alignment
+    }
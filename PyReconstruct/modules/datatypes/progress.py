@@ -0,0 +1,78 @@
+"""Progress reporting that does not require a GUI.
+
+Series operations report their progress through getProgbar. When the GUI is
+running (a QApplication exists) this is the usual progress dialog; otherwise
+progress is printed as text, so the same operations can run in scripts and
+batch jobs without a display. Qt widgets are only imported when the GUI has
+already loaded them.
+"""
+
+import sys
+
+LOG_STEP = 10  # percent between lines when output is not a terminal
+
+
+class BasicProgbar():
+    def __init__(self, text : str, maximum=100):
+        """Create a 'vanilla' progress indicator.
+
+        Params:
+            text (str): the text to display by the indicator
+        """
+        self.text = text
+        self.max = maximum
+        # a terminal shows one updating line; logs get a line every LOG_STEP percent
+        self.interactive = sys.stdout.isatty()
+        self.logged = -1
+        if self.max == 0:
+            self.print(f"{text} | Loading...")
+        else:
+            self.setValue(0)
+
+    def print(self, s : str):
+        """Print a progress line."""
+        if self.interactive:
+            print(s, end="\r", flush=True)
+        else:
+            print(s, flush=True)
+
+    def setValue(self, n):
+        """Update the progress indicator.
+
+            Params:
+                p (float): the percentage of progress made
+        """
+        if self.max == 0:
+            return
+        p = n / self.max * 100
+        if self.interactive:
+            self.print(f"{self.text} | {p :.1f}%")
+        elif p // LOG_STEP > self.logged:
+            self.logged = p // LOG_STEP
+            self.print(f"{self.text} | {p :.0f}%")
+        if n == self.max:
+            self.close()
+
+    def wasCanceled(self):
+        """Dummy function -- do nothing!"""
+        return False
+
+    def close(self):
+        """Force finish the progbar."""
+        if self.interactive:
+            print()
+
+
+def getProgbar(text, cancel=True, maximum=100):
+    """Create a progress bar (a dialog if the GUI is running, text otherwise).
+
+        Params:
+            text (str): the text for the progress bar
+            cancel (bool): True if progress bar is cancelable
+            maximum (int): the max value for the progress bar
+    """
+    qt_widgets = sys.modules.get("PySide6.QtWidgets")
+    if qt_widgets is not None and qt_widgets.QApplication.instance():
+        from PyReconstruct.modules.gui.utils import getProgbar as getDialogProgbar
+        return getDialogProgbar(text, cancel, maximum)
+    return BasicProgbar(text, maximum)
@@ -7,9 +7,11 @@ from .contour import Contour
 from .trace import Trace
 from .flag import Flag
 from .transform import Transform
+from .trace_index import TraceIndex
+from .trace_duplicates import findOverlapping
 from .log import LogSetPair
-
-from PyReconstruct.modules.gui.utils import notify
+from .section_store import readSectionDict, writeSection
+from .section_cache import getFileKey
 
 from PyReconstruct.modules.calc import (
     getDistanceFromTrace,
@@ -43,50 +45,21 @@ class Section():
         self.temp_hide = []          # traces to temp hide
         self.traces_group_hide = []  # traces to hide by group viz
 
-        with open(self.filepath, "r") as f:
-            section_data = json.load(f)
-        
-        Section.updateJSON(section_data, n)  # update any missing attributes
-
-        self.src = os.path.basename(section_data["src"])
-        self.bc_profiles = section_data["brightness_contrast_profiles"]
-        self.mag = section_data["mag"]
-        self.align_locked = section_data["align_locked"]
-
-        self.tforms = TransformsDict()
-        
-        for a in section_data["tforms"]:
-            self.tforms[a] = Transform(section_data["tforms"][a])
-        
-        self.thickness = section_data["thickness"]
-        self.contours : dict[str, Contour] = {}
-
-        for name in section_data["contours"]:
-            
-            trace_list = []
-            
-            for trace_data in section_data["contours"][name]:
-                trace = Trace.fromList(trace_data, name)
-                # screen for defective traces
-                l = len(trace.points)
-                if l == 2:
-                    trace.closed = False
-                if l > 1:
-                    trace_list.append(trace)
-                    
-            self.contours[name] = Contour(
-                name,
-                trace_list
-            )
-        
-        self.flags = [Flag.fromList(l, self.n) for l in section_data["flags"]]
-
-        self.calgrid = section_data["calgrid"]
+        # use the cached contents if the file has not changed
+        contents = series.section_cache.get(n, self.filepath)
+        if contents is None:
+            file_key = getFileKey(self.filepath)
+            self.setContents(Section.readContents(self.filepath, n), copy=False)
+            self.cacheContents(file_key)
+        else:
+            self.setContents(contents)
 
         ## Modify temp_hide based on group visibility
         self.setGroupVisibility(series.groups_visibility)
         
         ## For GUI use
+        self.unsaved_contours = set()  # modified contours not yet written to file
+        self.trace_index = None  # spatial index (built when first queried)
         self.clearTracking()
     
     @property
@@ -141,6 +114,113 @@ class Section():
                 )
             ]
 
+    @staticmethod
+    def readContents(fp : str, n : int) -> dict:
+        """Read the contents of a section file.
+        
+            Params:
+                fp (str): the section filepath
+                n (int): the section number
+            Returns:
+                (dict): the section contents (see getContents)
+        """
+        section_data = readSectionDict(fp)
+        
+        Section.updateJSON(section_data, n)  # update any missing attributes
+
+        tforms = TransformsDict()
+        for a in section_data["tforms"]:
+            tforms[a] = Transform(section_data["tforms"][a])
+
+        contours = {}
+        for name in section_data["contours"]:
+            
+            trace_list = []
+            
+            for trace_data in section_data["contours"][name]:
+                trace = Trace.fromList(trace_data, name)
+                # screen for defective traces
+                l = len(trace.points)
+                if l == 2:
+                    trace.closed = False
+                if l > 1:
+                    trace_list.append(trace)
+                    
+            contours[name] = trace_list
+
+        return {
+            "src": os.path.basename(section_data["src"]),
+            "bc_profiles": section_data["brightness_contrast_profiles"],
+            "mag": section_data["mag"],
+            "align_locked": section_data["align_locked"],
+            "tforms": tforms,
+            "thickness": section_data["thickness"],
+            "contours": contours,
+            "flags": [Flag.fromList(l, n) for l in section_data["flags"]],
+            "calgrid": section_data["calgrid"]
+        }
+    
+    def getContents(self) -> dict:
+        """Return a copy of the saved contents of the section.
+        
+            Returns:
+                (dict): the section attributes, with contours as name : list of traces
+        """
+        tforms = TransformsDict()
+        for a, t in self.tforms.items():
+            if a != "no-alignment":
+                tforms[a] = t.copy()
+        return {
+            "src": self.src,
+            "bc_profiles": self.bc_profiles.copy(),
+            "mag": self.mag,
+            "align_locked": self.align_locked,
+            "tforms": tforms,
+            "thickness": self.thickness,
+            "contours": {
+                name : [trace.copy() for trace in contour]
+                for name, contour in self.contours.items()
+                if not contour.isEmpty()
+            },
+            "flags": [f.copy() for f in self.flags],
+            "calgrid": self.calgrid
+        }
+    
+    def setContents(self, contents : dict, copy=True):
+        """Set the saved contents of the section.
+        
+            Params:
+                contents (dict): the section contents (see getContents)
+                copy (bool): False if the contents are not used anywhere else
+        """
+        self.src = contents["src"]
+        self.bc_profiles = contents["bc_profiles"].copy() if copy else contents["bc_profiles"]
+        self.mag = contents["mag"]
+        self.align_locked = contents["align_locked"]
+        self.tforms = TransformsDict()
+        for a, t in contents["tforms"].items():
+            if a != "no-alignment":
+                self.tforms[a] = t.copy() if copy else t
+        self.thickness = contents["thickness"]
+        self.contours : dict[str, Contour] = {}
+        for name, trace_list in contents["contours"].items():
+            self.contours[name] = Contour(
+                name,
+                [trace.copy() for trace in trace_list] if copy else trace_list
+            )
+        self.flags = [f.copy() for f in contents["flags"]] if copy else contents["flags"]
+        self.calgrid = contents["calgrid"]
+    
+    def cacheContents(self, file_key : tuple = None):
+        """Store a copy of the section contents in the series section cache.
+        
+            Params:
+                file_key (tuple): the key for the file the contents match (see section_cache.getFileKey)
+        """
+        cache = self.series.section_cache
+        if cache.getBudget() > 0:
+            cache.put(self.n, self.filepath, self.getContents(), file_key)
+    
     @staticmethod
     def updateJSON(section_data, n):
         """Add missing attributes to section JSON.
@@ -320,9 +400,16 @@ class Section():
         if update_series_data:
             self.series.data.updateSection(self, update_traces=True)
     
-        d = self.getDict()
-        with open(self.filepath, "w") as f:
-            f.write(json.dumps(d, indent=1))
+        if self.series.getOption("section_format") == "binary":
+            writeSection(self, self.unsaved_contours.union(self.getAllModifiedNames()))
+        else:
+            d = self.getDict()
+            with open(self.filepath, "w") as f:
+                f.write(json.dumps(d, indent=1))
+        self.unsaved_contours = set()
+
+        # write through to the section cache
+        self.cacheContents()
     
     def tracesAsList(self) -> list[Trace]:
         """Return the trace dictionary as a list. Does NOT copy traces.
@@ -336,6 +423,38 @@ class Section():
                 trace_list.append(trace)
         return trace_list
     
+    def getTraceIndex(self) -> TraceIndex:
+        """Return the spatial index of the traces on the section.
+        
+        The index is kept up to date by addTrace and removeTrace. It is also
+        rebuilt if the number of traces has changed without them, but code
+        that changes the points of traces in place must either remove and add
+        the traces or call invalidateTraceIndex.
+        
+            Returns:
+                (TraceIndex): the trace index
+        """
+        if (
+            self.trace_index is None or
+            len(self.trace_index) != sum(len(c) for c in self.contours.values())
+        ):
+            self.trace_index = TraceIndex(self.tracesAsList())
+        return self.trace_index
+    
+    def invalidateTraceIndex(self):
+        """Discard the trace index after modifying the contours directly."""
+        self.trace_index = None
+    
+    def tracesInBounds(self, bounds : tuple) -> list[Trace]:
+        """Return the traces that may overlap a field rectangle. Does NOT copy traces.
+        
+            Params:
+                bounds (tuple): xmin, ymin, xmax, ymax of the rectangle in field coordinates
+            Returns:
+                (list): the traces with (transformed) bounding boxes overlapping the rectangle
+        """
+        return self.getTraceIndex().query(bounds, self.tform)
+    
     def setAlignLocked(self, align_locked : bool):
         """Set the alignment locked status of the section.
         
@@ -365,6 +484,8 @@ class Section():
     
     def clearTracking(self):
         """Clear the added_traces and removed_traces lists."""
+        if hasattr(self, "added_traces"):  # keep track of contours to save
+            self.unsaved_contours.update(self.getAllModifiedNames())
         self.added_traces = []
         self.removed_traces = []
         self.modified_contours = set()
@@ -384,6 +505,8 @@ class Section():
         # modify the traces
         for trace in self.tracesAsList():
             trace.magScale(self.mag, new_mag)
+        self.unsaved_contours.update(self.contours.keys())
+        self.invalidateTraceIndex()
         
         # modify the ztraces
         for ztrace in self.series.ztraces.values():
@@ -417,6 +540,9 @@ class Section():
         else:
             self.contours[trace.name] = Contour(trace.name, [trace])
         
+        if self.trace_index is not None:
+            self.trace_index.add(trace)
+        
         self.added_traces.append(trace)
     
     def removeTrace(self, trace : Trace, log_event=True):
@@ -429,6 +555,8 @@ class Section():
         if trace.name in self.contours:
             self.contours[trace.name].remove(trace)
             self.removed_traces.append(trace)
+            if self.trace_index is not None:
+                self.trace_index.remove(trace)
         if log_event:
             self.series.addLog(trace.name, self.n, "Delete trace(s)")
     
@@ -573,21 +701,21 @@ class Section():
         closest_trace_interior = None
         tform = self.tform
 
-        # only check the traces within the view if provided
+        # only check the traces close to the point (and within the view if provided)
+        pad = radius + 2 / self.mag  # distances are measured on the pixel grid
+        traces = self.tracesInBounds(
+            (field_x - pad, field_y - pad, field_x + pad, field_y + pad)
+        )
         if traces_in_view:
-            traces = traces_in_view
-        else:
-            traces = self.tracesAsList()
+            in_view = set(id(trace) for trace in traces_in_view)
+            traces = [trace for trace in traces if id(trace) in in_view]
         
         # iterate through all traces to get closest
         for trace in traces:
             # skip hidden traces
             if not include_hidden and trace.hidden:
                 continue
-            points = []
-            for point in trace.points:
-                x, y = tform.map(*point)
-                points.append((x,y))
+            points = tform.map(trace.points)
             
             # find the distance of the point from each trace
             dist = getDistanceFromTrace(
@@ -828,18 +956,16 @@ class Section():
         """
         tform = self.tform
 
+        # forward transform, translate, and reverse transform in one step
+        shift_tform = Transform.compose([
+            tform,
+            Transform([1, 0, dx, 0, 1, dy]),
+            tform.inverted()
+        ])
+
         for trace in self.selected_traces:
             self.removeTrace(trace, log_event=False)
-            for i, p in enumerate(trace.points):
-                # apply forward transform
-                x, y = tform.map(*p)
-                # apply translate
-                x += dx
-                y += dy
-                # apply reverse transform
-                x, y = tform.map(x, y, inverted=True)
-                # replace point
-                trace.points[i] = (x, y)
+            trace.points = shift_tform.map(trace.points)
             self.addTrace(trace, log_event=False)
             if log_event:
                 self.series.addLog(trace.name, self.n, "Modify trace(s)")
@@ -985,12 +1111,10 @@ class Section():
                     traces1, traces2 = conflict_traces_s, conflict_traces_o
                 elif keep_below == "other":
                     traces1, traces2 = conflict_traces_o, conflict_traces_s
-                # iterate through traces and delete overlaps in unfavored series
-                for trace1 in traces1:
-                    for trace2 in traces2.copy():
-                        if trace1.overlaps(trace2, threshold=0):
-                            traces2.remove(trace2)
-                            self.contours[cname].remove(trace2)
+                # delete overlaps in unfavored series
+                overlapping = findOverlapping(traces1, traces2, threshold=0)
+                for j in reversed(overlapping):
+                    self.contours[cname].remove(traces2.pop(j))
                 # clear favored traces, as they will never be conflicts
                 traces1.clear()
                 # any traces left in unfavored traces will be flagged
@@ -1010,6 +1134,7 @@ class Section():
             
             if self.contours[cname].isEmpty(): del(self.contours[cname])  # remove contour from self if empty
         
+        self.invalidateTraceIndex()
         self.save()
     
     def addSelectedTrace(self, trace : Trace):
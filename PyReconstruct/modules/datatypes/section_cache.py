@@ -0,0 +1,145 @@
+"""In-memory cache of parsed sections.
+
+Reading a section file and building its traces is the slowest part of
+Series.loadSection, and the same sections are loaded over and over (moving
+between sections, series-wide operations, undo and redo). The cache keeps a
+private copy of the contents of recently loaded sections and every load gets
+its own copy of the traces, so callers can modify and discard the Section
+objects they are given as before.
+
+Entries are checked against the stat of the section file (inode, size and
+modification time) on every load, so a file that is replaced or changed
+outside of the app simply misses the cache. Section.save writes its contents
+through to the cache, and series-wide operations that rename or rewrite
+section files clear it. The least recently used sections are dropped when
+the estimated size passes the section_cache_mb budget.
+
+Sections are loaded from worker threads (the section prefetcher) as well as
+the GUI thread, so every access to the entries holds the cache lock.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+POINT_BYTES = 112  # estimated memory for a point (tuple of two floats in a list)
+TRACE_BYTES = 1024  # estimated memory for the rest of a trace
+
+
+def getFileKey(fp : str) -> tuple:
+    """Return the stat values used to check that a file has not changed.
+
+        Params:
+            fp (str): the filepath
+        Returns:
+            (tuple): inode, size, modification time (None if the file does not exist)
+    """
+    try:
+        st = os.stat(fp)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def estimateSize(contents : dict) -> int:
+    """Estimate the memory used by the contents of a section.
+
+        Params:
+            contents (dict): the section contents (see Section.getContents)
+        Returns:
+            (int): the estimated number of bytes
+    """
+    size = 0
+    for trace_list in contents["contours"].values():
+        for trace in trace_list:
+            size += TRACE_BYTES + POINT_BYTES * len(trace.points)
+    return size
+
+
+class SectionCache():
+
+    def __init__(self, series = None):
+        """Create the cache of parsed sections.
+
+            Params:
+                series (Series): the series (the budget is read from its options)
+        """
+        self.series = series
+        self.entries = OrderedDict()  # snum : (filepath, file key, contents, size) (least recently used first)
+        self.memory_bytes = 0
+        self.lock = threading.RLock()
+
+    def getBudget(self) -> int:
+        """Return the memory budget for the cache in bytes."""
+        if self.series is None:
+            return 0
+        return int(self.series.getOption("section_cache_mb") * 2**20)
+
+    def get(self, snum : int, fp : str) -> dict:
+        """Return the cached contents of a section if the file is unchanged.
+
+        The contents are NOT copied (see Section.setContents).
+
+            Params:
+                snum (int): the section number
+                fp (str): the section filepath
+            Returns:
+                (dict): the section contents (None if not cached)
+        """
+        with self.lock:
+            entry = self.entries.get(snum)
+            if entry is None:
+                return None
+            entry_fp, file_key, contents, _ = entry
+            if entry_fp != fp or file_key is None or file_key != getFileKey(fp):
+                self.discard(snum)
+                return None
+            self.entries.move_to_end(snum)
+            return contents
+
+    def put(self, snum : int, fp : str, contents : dict, file_key : tuple = None):
+        """Store the contents of a section that matches its file.
+
+        The contents are stored as they are: the caller passes a copy that
+        is not used anywhere else.
+
+            Params:
+                snum (int): the section number
+                fp (str): the section filepath
+                contents (dict): the section contents (see Section.getContents)
+                file_key (tuple): the file key from before the file was read (checked now if None)
+        """
+        budget = self.getBudget()
+        size = estimateSize(contents)
+        if file_key is None:
+            file_key = getFileKey(fp)
+        with self.lock:
+            self.discard(snum)
+            if budget <= 0 or size > budget or file_key is None:
+                return
+            self.entries[snum] = (fp, file_key, contents, size)
+            self.memory_bytes += size
+            while self.memory_bytes > budget and self.entries:
+                _, (_, _, _, old_size) = self.entries.popitem(last=False)
+                self.memory_bytes -= old_size
+
+    def discard(self, snum : int):
+        """Remove a section from the cache.
+
+            Params:
+                snum (int): the section number
+        """
+        with self.lock:
+            entry = self.entries.pop(snum, None)
+            if entry is not None:
+                self.memory_bytes -= entry[3]
+
+    def clear(self):
+        """Remove all sections from the cache."""
+        with self.lock:
+            self.entries = OrderedDict()
+            self.memory_bytes = 0
+
+    def __len__(self):
+        """Return the number of cached sections."""
+        return len(self.entries)
@@ -0,0 +1,295 @@
+"""Binary on-disk storage for section files.
+
+A binary section file is laid out as:
+
+    MAGIC | point buffers ... | index (JSON) | index length (uint64) | INDEX_MAGIC
+
+Each contour owns one contiguous float64 buffer holding the x, y pairs of all
+of its traces. The index holds the section attributes and, for each contour,
+the offset of its buffer and a compact table of trace metadata (one row per
+trace: number of points, color, closed, negative, hidden, fill mode, tags).
+
+Saving only appends the buffers of the contours that were modified, followed
+by a new index; unmodified contours keep pointing at their old buffers. The
+append is made to a copy of the file that then replaces it, so a crash while
+saving leaves the previous version intact. The file is rewritten from scratch
+once more than half of it is unused.
+
+Section files in JSON format are still read transparently, so both formats can
+coexist in the same series.
+"""
+
+import os
+import json
+import shutil
+import struct
+
+import numpy as np
+
+MAGIC = b"PYRSEC1\n"
+INDEX_MAGIC = b"PYRSIDX\n"
+FOOTER_SIZE = 8 + len(INDEX_MAGIC)  # index length + index magic
+
+SECTION_ATTRS = (
+    "src",
+    "brightness_contrast_profiles",
+    "mag",
+    "align_locked",
+    "thickness",
+    "tforms",
+    "flags",
+    "calgrid"
+)
+
+
+def isBinarySection(fp : str) -> bool:
+    """Check if a section file is stored in the binary format.
+
+        Params:
+            fp (str): the section filepath
+        Returns:
+            (bool): True if the file is binary
+    """
+    with open(fp, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def readSectionDict(fp : str) -> dict:
+    """Read a section file (binary or JSON) as a JSON-style dictionary.
+
+        Params:
+            fp (str): the section filepath
+        Returns:
+            (dict): the section data
+    """
+    with open(fp, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            return json.load(f)
+        index, _ = _readIndex(f)
+        section_data = dict(index["section"])
+        section_data["contours"] = {}
+        for name, (offset, npoints, table) in index["contours"].items():
+            f.seek(offset)
+            buffer = np.frombuffer(f.read(npoints * 16), dtype="<f8")
+            section_data["contours"][name] = _unpackContour(buffer, table)
+    return section_data
+
+
+def writeSectionDict(fp : str, section_data : dict):
+    """Write a JSON-style section dictionary to a binary section file.
+
+        Params:
+            fp (str): the section filepath
+            section_data (dict): the section data
+    """
+    contours = {}
+    for name, trace_lists in section_data["contours"].items():
+        if trace_lists:
+            contours[name] = _packTraceLists(trace_lists)
+    _writeFull(fp, section_data, contours)
+
+
+def writeSection(section, names : set = None):
+    """Write a section object to its binary file.
+
+    Only the contours in names are written if the file is already binary.
+
+        Params:
+            section (Section): the section to save
+            names (set): the modified contour names (None to write all contours)
+    """
+    section_data = {
+        "src": section.src,
+        "brightness_contrast_profiles": section.bc_profiles,
+        "mag": section.mag,
+        "align_locked": section.align_locked,
+        "thickness": section.thickness,
+        "tforms": {
+            a: t.getList() for a, t in section.tforms.items() if a != "no-alignment"
+        },
+        "flags": [f.getList() for f in section.flags],
+        "calgrid": section.calgrid
+    }
+
+    if (
+        names is None or
+        not os.path.isfile(section.filepath) or
+        not isBinarySection(section.filepath)
+    ):
+        contours = {}
+        for name, contour in section.contours.items():
+            if not contour.isEmpty():
+                contours[name] = _packTraces(contour.getTraces())
+        _writeFull(section.filepath, section_data, contours)
+        return
+
+    # append to a copy so that the file is never left half written
+    tmp_fp = section.filepath + ".tmp"
+    shutil.copyfile(section.filepath, tmp_fp)
+    with open(tmp_fp, "r+b") as f:
+        index, index_start = _readIndex(f)
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        garbage = index["garbage"] + (end - index_start)  # the old index
+
+        # contours removed from the section without being marked as modified
+        names = set(names).union(
+            name for name in index["contours"] if name not in section.contours
+        )
+        for name in names:
+            if name in index["contours"]:
+                _, npoints, _ = index["contours"].pop(name)
+                garbage += npoints * 16
+            contour = section.contours.get(name)
+            if contour is None or contour.isEmpty():
+                continue
+            buffer, table = _packTraces(contour.getTraces())
+            index["contours"][name] = [f.tell(), len(buffer) // 2, table]
+            f.write(buffer.tobytes())
+
+        index["section"] = _sectionAttrs(section_data)
+        index["garbage"] = garbage
+        _writeIndex(f, index)
+        f.truncate()
+        size = f.tell()
+    os.replace(tmp_fp, section.filepath)
+
+    # compact the file once it is mostly unused
+    if garbage > size / 2:
+        writeSectionDict(section.filepath, readSectionDict(section.filepath))
+
+
+def _sectionAttrs(section_data : dict) -> dict:
+    """Return the non-contour attributes of a section dictionary."""
+    return {k: section_data[k] for k in SECTION_ATTRS if k in section_data}
+
+
+def _packTraces(traces : list) -> tuple:
+    """Pack trace objects into a point buffer and a metadata table.
+
+        Params:
+            traces (list): the traces of a single contour
+        Returns:
+            (np.ndarray): the float64 point buffer (x, y interleaved)
+            (list): the trace metadata table
+    """
+    table = []
+    arrays = []
+    for trace in traces:
+        table.append([
+            len(trace.points),
+            trace.color,
+            trace.closed,
+            trace.negative,
+            trace.hidden,
+            trace.fill_mode,
+            list(trace.tags)
+        ])
+        arrays.append(np.asarray(trace.points, dtype=np.float64).reshape(-1, 2))
+    buffer = np.round(np.concatenate(arrays), 7).astype("<f8").ravel()
+    return buffer, table
+
+
+def _packTraceLists(trace_lists : list) -> tuple:
+    """Pack JSON-style trace lists into a point buffer and a metadata table.
+
+        Params:
+            trace_lists (list): the trace lists of a single contour
+        Returns:
+            (np.ndarray): the float64 point buffer (x, y interleaved)
+            (list): the trace metadata table
+    """
+    table = []
+    arrays = []
+    for x, y, color, closed, negative, hidden, fill_mode, tags in trace_lists:
+        table.append([len(x), color, closed, negative, hidden, fill_mode, tags])
+        arrays.append(np.column_stack((
+            np.asarray(x, dtype=np.float64),
+            np.asarray(y, dtype=np.float64)
+        )))
+    buffer = np.round(np.concatenate(arrays), 7).astype("<f8").ravel()
+    return buffer, table
+
+
+def _unpackContour(buffer : np.ndarray, table : list) -> list:
+    """Convert a point buffer and metadata table back to JSON-style trace lists.
+
+        Params:
+            buffer (np.ndarray): the float64 point buffer
+            table (list): the trace metadata table
+        Returns:
+            (list): the trace lists
+    """
+    points = buffer.reshape(-1, 2)
+    trace_lists = []
+    i = 0
+    for npoints, color, closed, negative, hidden, fill_mode, tags in table:
+        trace_points = points[i:i+npoints]
+        trace_lists.append([
+            trace_points[:, 0].tolist(),
+            trace_points[:, 1].tolist(),
+            color,
+            closed,
+            negative,
+            hidden,
+            fill_mode,
+            tags
+        ])
+        i += npoints
+    return trace_lists
+
+
+def _readIndex(f) -> tuple:
+    """Read the index of an open binary section file.
+
+        Params:
+            f: the open file object
+        Returns:
+            (dict): the index
+            (int): the position where the index starts
+    """
+    f.seek(-FOOTER_SIZE, os.SEEK_END)
+    footer = f.read(FOOTER_SIZE)
+    if footer[8:] != INDEX_MAGIC:
+        raise ValueError(f"Corrupted section file: {f.name}")
+    (length,) = struct.unpack("<Q", footer[:8])
+    index_start = f.seek(-FOOTER_SIZE - length, os.SEEK_END)
+    index = json.loads(f.read(length).decode("utf-8"))
+    return index, index_start
+
+
+def _writeIndex(f, index : dict):
+    """Write the index and footer at the current position of an open file.
+
+        Params:
+            f: the open file object
+            index (dict): the index
+    """
+    b = json.dumps(index).encode("utf-8")
+    f.write(b)
+    f.write(struct.pack("<Q", len(b)))
+    f.write(INDEX_MAGIC)
+
+
+def _writeFull(fp : str, section_data : dict, contours : dict):
+    """Write a complete binary section file.
+
+        Params:
+            fp (str): the section filepath
+            section_data (dict): the section attributes
+            contours (dict): contour name : (point buffer, metadata table)
+    """
+    index = {
+        "section": _sectionAttrs(section_data),
+        "contours": {},
+        "garbage": 0
+    }
+    tmp_fp = fp + ".tmp"
+    with open(tmp_fp, "wb") as f:
+        f.write(MAGIC)
+        for name, (buffer, table) in contours.items():
+            index["contours"][name] = [f.tell(), len(buffer) // 2, table]
+            f.write(buffer.tobytes())
+        _writeIndex(f, index)
+    os.replace(tmp_fp, fp)
@@ -4,6 +4,7 @@ import json
 import shutil
 from datetime import datetime
 from copy import deepcopy
+from concurrent.futures import wait, as_completed, FIRST_COMPLETED
 from pathlib import Path
 from typing import Union
 
@@ -12,13 +13,21 @@ from PySide6.QtCore import QSettings
 from .log import LogSet, LogSetPair
 from .ztrace import Ztrace
 from .section import Section
+from .section_store import readSectionDict
+from .jser_io import JserReader, writeJser
+from .parallel_open import getExecutor, getAlignInfo, unpackSection, resubmitSection, PENDING_MAX_SIZE
+from .data_cache import SeriesDataCache, getCacheFp
+from .section_cache import SectionCache
+from .mesh_cache import getMeshCacheFp, pruneMeshes
 from .trace import Trace
+from .trace_duplicates import iterSectionDuplicates
 from .transform import Transform
 from .obj_group_dict import ObjGroupDict
 from .series_data import SeriesData
 from .objects import Objects, SeriesObject
 from .default_settings import default_settings, default_series_settings
 from .host_tree import HostTree
+from .progress import getProgbar
 
 from PyReconstruct.modules.constants import (
     createHiddenDir,
@@ -26,7 +35,6 @@ from PyReconstruct.modules.constants import (
     getDateTime
 )
 from PyReconstruct.modules.constants import welcome_series_dir, default_traces
-from PyReconstruct.modules.gui.utils import getProgbar
 
 
 class Series():
@@ -94,6 +102,9 @@ class Series():
 
         self.options = series_data["options"]
 
+        # parsed sections (see section_cache.py)
+        self.section_cache = SectionCache(self)
+
         # possible existing log set
         if "log_set" in series_data:
             self.log_set = LogSet.fromList(series_data["log_set"])
@@ -138,11 +149,12 @@ class Series():
     
     ## OPENING, LOADING, AND MOVING THE JSER FILE
     @staticmethod
-    def openJser(fp : str):
+    def openJser(fp : str, max_workers : int = None):
         """Process the file containing all section and series information.
         
             Params:
                 fp (str): the filepath to the jser
+                max_workers (int): the number of processes used to unpack sections (defaults to all cores)
             Returns:
                 (Series): the series object created from the jser
         """
@@ -167,112 +179,149 @@ class Series():
             series.leave_open = True
             return series
 
-        # load json
-        with open(fp, "r") as f:
-            jser_data = json.load(f)
-        
-        # UPDATE FROM OLD JSER FORMATS
-        updated_jser_data = {}
-        sections_dict = {}
-        if "sections" not in jser_data and "series" not in jser_data:
-            # gather the sections and section numbers
-            for key in jser_data:
-                # key could just be the extension OR the name + extension
-                if "." in key:
-                    ext = key[key.rfind(".")+1:]
-                else:
-                    ext = key
-                # check if section or series data
-                if ext.isnumeric():
-                    snum = int(ext)
-                    sections_dict[snum] = jser_data[key]
-                else:
-                    updated_jser_data["series"] = jser_data[key]
-            # organize the sections in a list
-            sections_list = [None] * (max(sections_dict.keys())+1)
-            for snum, sdata in sections_dict.items():
-                sections_list[snum] = sdata
-            updated_jser_data["sections"] = sections_list
-            # replace data
-            jser_data = updated_jser_data
-        
-        # UPDATE TO INCLUDE A LOG
-        if "log" not in jser_data:
-            jser_data["log"] = "Date, Time, User, Obj, Sections, Event"
-        
         # creating loading bar
         progbar = getProgbar(
             text="Opening series..."
         )
-        progress = 0
-        final_value = 0
-        for sdata in jser_data["sections"]:
-            if sdata: final_value += 1
-        final_value *= 2  # for loading section data
-        final_value += 2  # unpacking series and log
+        file_size = max(os.path.getsize(fp), 1)
 
         # create the hidden directory
         hidden_dir = createHiddenDir(sdir, sname)
-        
-        # extract JSON series data
-        series_data = jser_data["series"]
-        # add empty log_set for opening/saving purposes
-        series_data["log_set"] = []
-        Series.updateJSON(series_data)
-        series_fp = os.path.join(hidden_dir, sname + ".ser")
-        with open(series_fp, "w") as f:
-            json.dump(series_data, f)
-        if progbar.wasCanceled():
-            return None
-        progress += 1
-        progbar.setValue(progress/final_value * 100)
 
-        # extract JSON section data
+        # stream the jser file, unpacking each section on the process pool as it is parsed
+        max_workers = max_workers or os.cpu_count() or 1
+        executor = getExecutor(file_size, max_workers)
+        pending = set()
+        pending_sizes = {}  # future : jser characters of its section (see PENDING_MAX_SIZE)
+        early_sections = []  # sections read before the series data (old jser layouts)
+        summaries = {}
+        cache_fp = getCacheFp(hidden_dir)
+        cache_keys = {}  # key : summary for every section
+        new_summaries = {}  # key : summary for sections not found in the cache
+
+        def collect(futures):
+            for future in futures:
+                pending_sizes.pop(future, None)
+                result = future.result()
+                if result is None:
+                    continue
+                snum, key, summary, cached = result
+                summaries[snum] = summary
+                cache_keys[key] = summary
+                if not cached:
+                    new_summaries[key] = summary
+
+        series_data = None
+        align_info = None
+        log_str = None
         sections = {}
-        for snum, section_data in enumerate(jser_data["sections"]):
-            # check for empty section, skip if so
-            if section_data is None:
-                continue
+        reader = JserReader(fp)
+        consumed = 0
+        try:
+            for key, value in reader:
+                value_size = reader.consumed - consumed
+                consumed = reader.consumed
+                if key == "sections":
+                    snum, section_data = value
+                elif key == "log":
+                    log_str = value
+                    continue
+                elif key == "series" or not key[key.rfind(".")+1:].isnumeric():
+                    # OLD JSER FORMATS: series key could be the extension OR the name + extension
+                    series_data = value
+                    series_data["log_set"] = []  # add empty log_set for opening/saving purposes
+                    Series.updateJSON(series_data)
+                    align_info = getAlignInfo(series_data)
+                    continue
+                else:
+                    snum, section_data = int(key[key.rfind(".")+1:]), value
+                
+                # check for empty section, skip if so
+                if section_data is None:
+                    continue
 
-            filename = sname + "." + str(snum)
-            section_fp = os.path.join(hidden_dir, filename)
+                # gather the section numbers and section filenames
+                filename = sname + "." + str(snum)
+                sections[snum] = filename
 
-            Section.updateJSON(section_data, snum)  # update any missing attributes
-            
-            section_data["align_locked"] = True  # lock the section
-
-            # gather the section numbers and section filenames
-            sections[snum] = filename
+                # (sections read before the series data are written as JSON and
+                # finished once it is read, see resubmitSection)
+                if series_data is None:
+                    early_sections.append(snum)
+                    binary = False
+                else:
+                    binary = series_data["options"]["section_format"] == "binary"
+                future = executor.submit(
+                    unpackSection,
+                    section_data,
+                    snum,
+                    os.path.join(hidden_dir, filename),
+                    binary,
+                    align_info,
+                    cache_fp
+                )
+                pending.add(future)
+                pending_sizes[future] = value_size
+                del(section_data)
+
+                # limit the parsed sections waiting in memory (by count and by size)
+                while pending and (
+                    len(pending) >= 2 * max_workers or
+                    sum(pending_sizes.values()) > PENDING_MAX_SIZE
+                ):
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
                 
-            with open(section_fp, "w") as f:
-                json.dump(section_data, f)
+                if progbar.wasCanceled():
+                    return None
+                progbar.setValue(reader.consumed / file_size * 50)
             
-            if progbar.wasCanceled():
-                return None
-            progress += 1
-            progbar.setValue(progress/final_value * 100)
-        
-        # extract the existing log
-        log_str = jser_data["log"]
-        existing_log_fp = os.path.join(hidden_dir, "existing_log.csv")
-        with open(existing_log_fp, "w") as f:
-            f.write(log_str)
-        if progbar.wasCanceled():
-            return None
-        progress += 1
-        progbar.setValue(progress/final_value * 100)
+            # extract JSON series data
+            series_fp = os.path.join(hidden_dir, sname + ".ser")
+            with open(series_fp, "w") as f:
+                json.dump(series_data, f)
+            
+            # extract the existing log
+            if log_str is None:  # UPDATE TO INCLUDE A LOG
+                log_str = "Date, Time, User, Obj, Sections, Event"
+            existing_log_fp = os.path.join(hidden_dir, "existing_log.csv")
+            with open(existing_log_fp, "w") as f:
+                f.write(log_str)
+
+            # gather the series data
+            collect(wait(pending).done)
+            binary = series_data["options"]["section_format"] == "binary"
+            pending = set(
+                executor.submit(
+                    resubmitSection,
+                    os.path.join(hidden_dir, sections[snum]),
+                    snum,
+                    binary,
+                    align_info,
+                    cache_fp
+                )
+                for snum in early_sections if snum in sections
+            )
+            for future in as_completed(pending):
+                collect([future])
+                if progbar.wasCanceled():
+                    return None
+                progbar.setValue(50 + len(summaries) / len(sections) * 50)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        # store the new summaries and drop those no longer used
+        cache = SeriesDataCache(cache_fp)
+        cache.update(new_summaries, keep=set(cache_keys))
+        cache.close()
         
         # create the series
         series = Series(series_fp, sections, get_series_data=False)
         series.jser_fp = fp
 
-        # gather the series data
-        for snum, section in series.enumerateSections(show_progress=False):
-            series.data.updateSection(section, update_traces=True, log_events=False)
-            if progbar.wasCanceled():
-                return None
-            progress += 1
-            progbar.setValue(progress/final_value * 100)
+        # merge the section summaries (in section order)
+        for snum in sorted(summaries):
+            series.data.addSectionSummary(snum, summaries[snum])
         
         return series
 
@@ -285,61 +334,43 @@ class Series():
         """
         self.save()
 
-        jser_data = {}
-
-        filenames = os.listdir(self.hidden_dir)
-
         progbar = getProgbar(
             text="Saving series...",
             cancel=False
         )
-        progress = 0
-        final_value = len(filenames)
+        final_value = max(self.sections.keys()) + 1
 
-        # get the max section number
-        sections_len = max(self.sections.keys())+1
-        jser_data["sections"] = [None] * sections_len
-        jser_data["series"] = {}
-        jser_data["log"] = ""
+        def iterSections():
+            """Read the sections one at a time (None for missing section numbers)."""
+            for snum in range(final_value):
+                if snum in self.sections:
+                    yield readSectionDict(os.path.join(self.hidden_dir, self.sections[snum]))
+                else:
+                    yield None
+                progbar.setValue((snum + 1) / final_value * 100)
 
-        for filename in filenames:
-            if "." not in filename:  # skip the timer file
-                continue
-            ext = filename[filename.rfind(".")+1:]
-            fp = os.path.join(self.hidden_dir, filename)
-
-            if ext.isnumeric():
-                with open(fp, "r") as f:
-                    filedata = json.load(f)
-                jser_data["sections"][int(ext)] = filedata
-            elif ext == "ser":
-                with open(fp, "r") as f:
-                    filedata = json.load(f)
-                # manually remove log set from series data if exists
-                if filedata.get("log_set"): del(filedata["log_set"])
-                # add the log_set string to the log
-                log_set_str = str(self.log_set)
-                if log_set_str:
-                    jser_data["log"] += "\n" + str(self.log_set)
-                # save the series
-                jser_data["series"] = filedata
-            elif filename == "existing_log.csv":
-                with open(fp, "r") as f:
-                    existing_log = ""
-                    for line in f.readlines():
-                        if line.strip():
-                            existing_log += line
-                # continue saving the existing log file
-                jser_data["log"] = existing_log + jser_data["log"]
-
-            progbar.setValue(progress/final_value * 100)
-            progress += 1
-        
-        save_str = json.dumps(jser_data)
+        with open(self.filepath, "r") as f:
+            series_data = json.load(f)
+        # manually remove log set from series data if exists
+        if series_data.get("log_set"): del(series_data["log_set"])
+
+        log = ""
+        existing_log_fp = os.path.join(self.hidden_dir, "existing_log.csv")
+        if os.path.isfile(existing_log_fp):
+            with open(existing_log_fp, "r") as f:
+                for line in f.readlines():
+                    if line.strip():
+                        log += line
+        # add the log_set string to the log
+        log_set_str = str(self.log_set)
+        if log_set_str:
+            log += "\n" + log_set_str
 
         jser_fp = self.jser_fp if not save_fp else save_fp
-        with open(jser_fp, "w") as f:
-            f.write(save_str)
+        writeJser(jser_fp, iterSections(), series_data, log)
+
+        # drop the cached 3D meshes of objects that no longer exist
+        pruneMeshes(self.hidden_dir, self.data["objects"].keys())
         
         if close:
             self.close()
@@ -369,6 +400,11 @@ class Series():
 
         shutil.move(old_hidden_dir, new_hidden_dir)
 
+        ## Move the series data and mesh caches with the hidden directory
+        for getFp in (getCacheFp, getMeshCacheFp):
+            if os.path.isfile(getFp(old_hidden_dir)):
+                shutil.move(getFp(old_hidden_dir), getFp(new_hidden_dir))
+
         ## Manually hide dir if Windows
         if os.name == "nt":
             import subprocess
@@ -414,6 +450,8 @@ class Series():
         if self.isWelcomeSeries() or self.leave_open:
             return
         
+        self.section_cache.clear()
+        
         if os.path.isdir(self.hidden_dir):
             
             for f in os.listdir(self.hidden_dir):
@@ -673,6 +711,9 @@ class Series():
             "med_dist"         : 0.1,  # MFO
             "big_dist"         : 1,  # MFO
             "autoseg"          : {},
+
+            # on-disk format for section files ("json" or "binary")
+            "section_format"    : "json",
             
         }
 
@@ -810,7 +851,7 @@ class Series():
         section = Section(section_num, self)
         return section
     
-    def enumerateSections(self, show_progress : bool = True, message : str = "Loading series data...", series_states=None, breakable=True):
+    def enumerateSections(self, show_progress : bool = True, message : str = "Loading series data...", series_states=None, breakable=True, section_numbers : list = None):
         """Allow iteration through the sections.
 
         Proper use in a for loop: for snum, section in series.enumerateSections():
@@ -820,10 +861,36 @@ class Series():
                 message (str): the message to display by the progress bar
                 series_states (dict): section number : SectionStates object (use with GUI for undo/redo)
                 breakable (bool): True if sereis state is breakable
+                section_numbers (list): the sections to iterate through (default: all)
             Returns:
                 (SeriesIterator): an iterable object for for loops
         """
-        return SeriesIterator(self, show_progress, message, series_states, breakable)
+        return SeriesIterator(self, show_progress, message, series_states, breakable, section_numbers)
+
+    def enumerateObjectSections(self, obj_names : list, show_progress : bool = True, message : str = "Loading series data...", series_states=None, breakable=True):
+        """Allow iteration through only the sections that contain a set of objects.
+
+        The sections are found from the series data, so the other section
+        files are not read. All sections are visited if the series data has
+        not been loaded for every section.
+        
+            Params:
+                obj_names (list): the names of the objects
+                show_progress (bool): True if progress should be displayed
+                message (str): the message to display by the progress bar
+                series_states (dict): section number : SectionStates object (use with GUI for undo/redo)
+                breakable (bool): True if series state is breakable
+            Returns:
+                (SeriesIterator): an iterable object for for loops
+        """
+        if set(self.sections).issubset(self.data["sections"]):
+            section_numbers = sorted(
+                snum for snum in self.data.getObjectSections(obj_names)
+                if snum in self.sections
+            )
+        else:
+            section_numbers = None
+        return self.enumerateSections(show_progress, message, series_states, breakable, section_numbers)
 
     def modifyAlignments(self, alignment_dict : dict, series_states=None, log_event=True):
         """Modify the series's alignment.
@@ -941,7 +1008,8 @@ class Series():
             
             points = []
             
-            for snum, section in self.enumerateSections(
+            for snum, section in self.enumerateObjectSections(
+                [obj_name],
                 message="Creating ztrace..."
             ):
                 
@@ -959,7 +1027,8 @@ class Series():
             
             points = []
 
-            for snum, section in self.enumerateSections(
+            for snum, section in self.enumerateObjectSections(
+                [obj_name],
                 message="Creating ztrace..."
             ):
                 
@@ -1087,6 +1156,7 @@ class Series():
             sname = self.sections[snum]
             self.sections[snum] = sname.replace(old_name, new_name)
         self.name = new_name
+        self.section_cache.clear()
 
     #### Series-wide trace functions ###############################################################
     
@@ -1097,7 +1167,8 @@ class Series():
                 obj_names (list): the objects to delete
                 series_states (dict): for use with GUI states
         """
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            obj_names,
             message="Deleting object(s)...",
             series_states=series_states
         ):
@@ -1128,7 +1199,8 @@ class Series():
             for obj_name in obj_names:
                 self.addLog(obj_name, None, f"Create copy {obj_name}_copy")
 
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+                obj_names,
                 message="Copying object(s)...",
                 series_states=series_states
         ):
@@ -1168,7 +1240,8 @@ class Series():
                 trace_name (str): the name of the traces to delete
                 tags (set): the tags to check to delete
         """
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            [trace_name],
             message="Deleting trace(s)...",
             series_states=series_states
         ):
@@ -1218,9 +1291,10 @@ class Series():
                 else:
                     self.addLog(obj_name, None, "Modify object")
         
-        ## Modify object on every section
+        ## Modify object on every section that contains it
         attrs_migrated = False
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            obj_names,
             message="Modifying object(s)...",
             series_states=series_states
         ):
@@ -1269,6 +1343,12 @@ class Series():
                             
                 section.save()
         
+        ## Objects without traces are not visited in the loop
+        if name and not attrs_migrated:
+            for obj_name in obj_names:
+                if obj_name != name:
+                    self.renameObjAttrs(obj_name, name)
+        
         self.modified = True
 
     def smoothObject(self, obj_names: list, series_states=None, log_event=True) -> None:
@@ -1282,7 +1362,8 @@ class Series():
 
                 self.addLog(obj_name, None, f"Smooth {obj_name} traces")
 
-        for _, section in self.enumerateSections(
+        for _, section in self.enumerateObjectSections(
+                obj_names,
                 message="Smoothing traces...",
                 series_states=series_states
         ):
@@ -1297,6 +1378,8 @@ class Series():
                     for trace in obj.traces:
                         trace.smooth(window=window, spacing=0.004)
 
+            # the traces were moved in place
+            section.invalidateTraceIndex()
             section.save()
 
             self.modified = True
@@ -1309,7 +1392,8 @@ class Series():
                 new_rad (float): the new radius for the traces of the object
                 series_states (dict): optional dict for GUI undo states
         """
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            obj_names,
             message="Modifying radii...",
             series_states=series_states
         ):
@@ -1331,7 +1415,8 @@ class Series():
                 new_shape (list): the new shape for the traces of the object
                 series_states (dict): optional dict for GUI undo states
         """
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            obj_names,
             message="Modifying shapes...",
             series_states=series_states
         ):
@@ -1362,7 +1447,8 @@ class Series():
                 series_states (dict): optional dict for GUI undo states
                 log_event (bool): True if event should be logged
         """
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            obj_names,
             message="Removing trace tags...",
             series_states=series_states
         ):
@@ -1396,7 +1482,8 @@ class Series():
                 series_states (dict): optional dict for GUI undo states
                 log_event (bool): True if event should be logged
         """
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            obj_names,
             message="Hiding object(s)..." if hide else "Unhiding object(s)...",
             series_states=series_states
         ):
@@ -1883,42 +1970,50 @@ class Series():
                 g = group
         return g
     
-    def deleteDuplicateTraces(self, threshold : float, include_locked=False, series_states=None, log_event=True):
+    def deleteDuplicateTraces(self, threshold : float, include_locked=False, series_states=None, log_event=True, max_workers : int = 1):
         """Delete all duplicate traces in the series (keep tags).
         
             Params:
                 threshold (float): the threshold for overlapping traces to be considered duplicates
                 series_states (dict): optional dict of undo states for GUI
                 log_event (bool): True if event should be logged
+                max_workers (int): the maximum number of processes used to search the sections
         """
+        if include_locked:
+            skip_names = set()
+        else:
+            skip_names = set(
+                name for name, attrs in self.obj_attrs.items() if attrs.get("locked")
+            )
+
+        # search the section files for duplicates
+        section_fps = {
+            snum : os.path.join(self.getwdir(), fname)
+            for snum, fname in self.sections.items()
+        }
+        progbar = getProgbar("Finding duplicate traces...", cancel=False)
+        found = {}
+        for i, (snum, duplicates) in enumerate(iterSectionDuplicates(
+            section_fps, threshold, skip_names, max_workers
+        )):
+            if duplicates:
+                found[snum] = duplicates
+            progbar.setValue((i + 1) / len(section_fps) * 100)
+
+        # only load the sections with duplicates
         removed = {}
         for snum, section in self.enumerateSections(
             message="Removing duplicate traces...",
-            series_states=series_states
+            series_states=series_states,
+            section_numbers=sorted(found)
         ):
-            found_on_section = False
-            for cname in section.contours:
-                if not include_locked and self.getAttr(cname, "locked"):
-                    continue
-                i = 1
-                while i < len(section.contours[cname]):
-                    trace1 = section.contours[cname][i]
-                    # check against all previous traces
-                    for j in range(i-1, -1, -1):
-                        trace2 = section.contours[cname][j]
-                        # if overlaps, remove trace and break
-                        if trace1.overlaps(trace2, threshold=threshold):
-                            if snum not in removed:
-                                removed[snum] = set()
-                            removed[snum].add(cname)
-                            found_on_section = True
-                            trace1.mergeTags(trace2)
-                            section.removeTrace(trace2)
-                            i -= 1
-                            break
-                    i += 1
-            if found_on_section:
-                section.save()
+            for cname, duplicates in found[snum].items():
+                traces = section.contours[cname].getTraces()
+                for i, j in duplicates:
+                    traces[i].mergeTags(traces[j])
+                    section.removeTrace(traces[j])
+                removed.setdefault(snum, set()).add(cname)
+            section.save()
         
         if log_event:
             self.addLog(None, None, "Delete all duplicate traces")
@@ -1950,7 +2045,7 @@ class Series():
         with open(csv_fp, "r") as f:
             log_list = f.readlines()[1:]
         full_hist = LogSet.fromList(log_list)
-        for log in self.log_set.all_logs:
+        for _, log in self.log_set.iterLogs():
             full_hist.addExistingLog(log)
         
         return full_hist
@@ -1984,6 +2079,9 @@ class Series():
         if not d:
             d = dict(tuple((snum, i) for i, snum in enumerate(self.sections.keys())))
         
+        # the cached sections are stored by section number
+        self.section_cache.clear()
+        
         # rename the section files
         for old_snum, new_snum in d.items():
             os.rename(
@@ -2408,7 +2506,7 @@ class Series():
         except:
             print("ERROR: corrupt history. Skipping editors update...")
             return set()
-        for l in ls.all_logs:
+        for _, l in ls.iterLogs():
             if l.user:
                 editors.add(l.user)
         return editors
@@ -2618,6 +2716,7 @@ class Series():
             # delete the file
             filename = self.sections[snum]
             os.remove(os.path.join(self.getwdir(), filename))
+            self.section_cache.discard(snum)
             # delete link to file
             del(self.sections[snum])
             if log_event:
@@ -2644,7 +2743,8 @@ class Series():
         ## Get original obj attrs
         alignment, obj_groups, host = self.objects.getSourceAttrs(name)
 
-        for snum, section in self.enumerateSections(
+        for snum, section in self.enumerateObjectSections(
+            [name],
             message="Splitting object...",
             series_states=series_states
         ):
@@ -2751,7 +2851,7 @@ class Series():
     
 class SeriesIterator():
 
-    def __init__(self, series : Series, show_progress : bool, message : str, series_states, breakable=True):
+    def __init__(self, series : Series, show_progress : bool, message : str, series_states, breakable=True, section_numbers : list = None):
         """Create the series iterator object.
         
             Params:
@@ -2760,8 +2860,10 @@ class SeriesIterator():
                 message (str): the message to show
                 series_states (dict): section number : SectionStates (for use with GUI)
                 breakable (bool): True if series state is breakable
+                section_numbers (list): the sections to iterate through (default: all)
         """
         self.series = series
+        self.requested_sections = section_numbers
         self.section = None
         self.show_progress = show_progress
         self.message = message
@@ -2771,7 +2873,10 @@ class SeriesIterator():
     
     def __iter__(self):
         """Allow the user to iterate through the sections."""
-        self.section_numbers = sorted(list(self.series.sections.keys()))
+        if self.requested_sections is None:
+            self.section_numbers = sorted(list(self.series.sections.keys()))
+        else:
+            self.section_numbers = list(self.requested_sections)
         self.sni = 0
         if self.show_progress:
             self.progbar = getProgbar(
@@ -2808,7 +2913,7 @@ class SeriesIterator():
         
         else:
             if self.show_progress:
-                self.progbar.setValue(self.sni / len(self.section_numbers) * 100)
+                self.progbar.setValue(100)
             raise StopIteration
 
 
@@ -1,37 +1,47 @@
 """Collect data to pass to table manager."""
+import os
 from typing import Union
 
-from PyReconstruct.modules.calc import lineDistance, area
+import numpy as np
+
+from PyReconstruct.modules.calc import traceMetrics, batchTraceMetrics
 
 from .section import Section
 from .transform import Transform
 from .trace import Trace
+from .flag import Flag
+from .data_cache import SeriesDataCache, getCacheFp
+from .trace_table import TraceTable
+from .progress import getProgbar
 
 
 class TraceData():
 
-    def __init__(self, trace : Trace, index : int, tform : Transform):
+    def __init__(self, trace : Trace, index : int, tform : Transform, metrics : dict = None):
         """Create a trace table item.
         
             Params:
                 trace (Trace): the trace object for the trace
                 tform (Transform): the transform applied to the trace
+                metrics (dict): precomputed metrics for the trace (see batchTraceData)
         """
         self.index = index
         self.closed = trace.closed
         self.hidden = trace.hidden
         self.negative = trace.negative
         self.tags = trace.tags
-        tformed_points = tform.map(trace.points)
-        self.length = lineDistance(tformed_points, closed=trace.closed)
-        if not self.closed:
-            self.area = 0
-        else:
-            self.area = area(tformed_points)
-            if self.negative: self.area *= -1
-        self.radius = trace.getRadius(tform)
-        self.centroid = trace.getCentroid(tform)
-        self.feret = trace.getFeret(tform)
+        if metrics is None:
+            metrics = traceMetrics(
+                trace.points,
+                trace.closed,
+                trace.negative,
+                tform.matrix[:2]
+            )
+        self.length = metrics["length"]
+        self.area = metrics["area"]
+        self.radius = metrics["radius"]
+        self.centroid = metrics["centroid"]
+        self.feret = metrics["feret"]
     
     def getTags(self):
         return self.tags
@@ -53,6 +63,86 @@ class TraceData():
 
     def __lt__(self, other):
         return self.index < other.index
+    
+    def getList(self) -> list:
+        """Get the trace data as a list of JSON values (see fromList)."""
+        return [
+            self.index,
+            self.closed,
+            self.hidden,
+            self.negative,
+            sorted(self.tags),
+            self.length,
+            self.area,
+            self.radius,
+            list(self.centroid),
+            list(self.feret)
+        ]
+    
+    @staticmethod
+    def fromList(l : list):
+        """Create a trace data object from a list (see getList).
+        
+            Params:
+                l (list): the list representation of the trace data
+        """
+        index, closed, hidden, negative, tags, length, area, radius, centroid, feret = l
+        trace_data = TraceData.__new__(TraceData)
+        trace_data.index = int(index)
+        trace_data.closed = bool(closed)
+        trace_data.hidden = bool(hidden)
+        trace_data.negative = bool(negative)
+        trace_data.tags = set(str(t) for t in tags)
+        trace_data.length = float(length)
+        trace_data.area = float(area)
+        trace_data.radius = float(radius)
+        trace_data.centroid = tuple(float(v) for v in centroid)
+        trace_data.feret = tuple(float(v) for v in feret)
+        return trace_data
+
+
+def batchTraceData(contours : dict, tforms : dict) -> dict:
+    """Create the trace data for many traces at once.
+    
+        Params:
+            contours (dict): name : list of traces
+            tforms (dict): name : the transform applied to the traces
+        Returns:
+            (dict): name : list of TraceData (for each name with traces)
+    """
+    names = [name for name, traces in contours.items() if traces]
+    traces = [trace for name in names for trace in contours[name]]
+    if not traces:
+        return {}
+    
+    m = batchTraceMetrics(
+        np.array([p for trace in traces for p in trace.points], dtype=np.float64),
+        np.cumsum([0] + [len(trace.points) for trace in traces]),
+        [trace.closed for trace in traces],
+        [trace.negative for trace in traces],
+        Transform.stack([tforms[name] for name in names for _ in contours[name]])
+    )
+    length = m["length"].tolist()
+    area = m["area"].tolist()
+    radius = m["radius"].tolist()
+    centroid = [tuple(c) for c in m["centroid"].tolist()]
+    feret = [tuple(f) for f in m["feret"].tolist()]
+
+    trace_data = {}
+    i = 0
+    for name in names:
+        trace_data[name] = []
+        for index, trace in enumerate(contours[name]):
+            trace_data[name].append(TraceData(trace, index, None, {
+                "length": length[i],
+                "area": area[i],
+                "radius": radius[i],
+                "centroid": centroid[i],
+                "feret": feret[i]
+            }))
+            i += 1
+    
+    return trace_data
 
 
 class ObjectData():
@@ -75,8 +165,27 @@ class ObjectData():
         """
         if section.n not in self.traces:
             self.traces[section.n] = []
-            
-        alignment = series.getAttr(trace.name, "alignment")
+
+        tform = ObjectData.getTform(trace.name, section, series)
+
+        i = len(self.traces[section.n])
+        
+        self.traces[section.n].append(
+            TraceData(trace, i, tform)
+        )
+    
+    @staticmethod
+    def getTform(name : str, section : Section, series) -> Transform:
+        """Get the transform used for an object's traces on a section.
+        
+            Params:
+                name (str): the name of the object
+                section (Section): the section containing the traces
+                series (Series): the series containing the object
+            Returns:
+                (Transform): the transform for the object's alignment
+        """
+        alignment = series.getAttr(name, "alignment")
         
         if alignment is None:
             
@@ -84,16 +193,10 @@ class ObjectData():
             
         elif alignment not in section.tforms:
             
-            series.setAttr(trace.name, "alignment", None)
+            series.setAttr(name, "alignment", None)
             alignment = series.alignment
 
-        tform = section.tforms[alignment]
-
-        i = len(self.traces[section.n])
-        
-        self.traces[section.n].append(
-            TraceData(trace, i, tform)
-        )
+        return section.tforms[alignment]
     
     def clearSection(self, snum : int):
         """Clear the traces on a specific section.
@@ -119,6 +222,7 @@ class SeriesData():
             "objects": {},
         }
         self.supress_logging = False
+        self.trace_table = TraceTable(self)  # columnar copy of the trace data for series-wide queries
     
     def __getitem__(self, index):
         """Allow direct indexing of data dictionary."""
@@ -149,10 +253,49 @@ class SeriesData():
             "sections": {},
             "objects": {},
         }
+        self.trace_table.markAll()
 
-        for snum, section in self.series.enumerateSections():
+        if self.series.isWelcomeSeries():
 
-            self.updateSection(section, update_traces=True, log_events=False)
+            for snum, section in self.series.enumerateSections():
+
+                self.updateSection(section, update_traces=True, log_events=False)
+            
+            return
+
+        ## Load unchanged sections from the cache and summarize the rest
+        from .parallel_open import getAlignInfo, getSummary  # (imports this module)
+
+        align_info = getAlignInfo({
+            "alignment": self.series.alignment,
+            "obj_attrs": self.series.obj_attrs
+        })
+        cache_fp = getCacheFp(self.series.hidden_dir)
+        progbar = getProgbar(
+            text="Loading series data...",
+            cancel=False
+        )
+        keys = set()
+        new_summaries = {}
+        snums = sorted(self.series.sections.keys())
+
+        for i, snum in enumerate(snums):
+
+            _, key, summary, cached = getSummary(
+                os.path.join(self.series.hidden_dir, self.series.sections[snum]),
+                snum,
+                align_info,
+                cache_fp
+            )
+            self.addSectionSummary(snum, summary)
+            keys.add(key)
+            if not cached:
+                new_summaries[key] = summary
+            progbar.setValue((i + 1) / len(snums) * 100)
+        
+        cache = SeriesDataCache(cache_fp)
+        cache.update(new_summaries, keep=keys)
+        cache.close()
     
     def updateSection(self, section : Section, update_traces=False, all_traces=True, log_events=True):
         """Update the existing section data.
@@ -191,6 +334,8 @@ class SeriesData():
             d["tforms"] = section.tforms.copy()
         
         if update_traces:
+
+            self.trace_table.markSection(section.n)
             
             ## Check if there are specific traces to be updated
             trace_names = section.getAllModifiedNames()
@@ -203,18 +348,26 @@ class SeriesData():
             removed_objects = set()
 
             ## Clear existing trace data on this section
+            contours = {}
+            tforms = {}
             for name in trace_names:
                 
-                ## Check if object is new
                 if name in self.data["objects"]:
                     self.data["objects"][name].clearSection(section.n)
-                    
-                ## Add new trace data
+                
                 if name in section.contours:
-                    for trace in section.contours[name]:
-                        is_new_object = self.addTrace(trace, section)
-                        if is_new_object:
-                            added_objects.add(name)
+                    contours[name] = section.contours[name].getTraces()
+                    tforms[name] = ObjectData.getTform(name, section, self.series)
+            
+            ## Add new trace data (all traces on the section at once)
+            for name, trace_data in batchTraceData(contours, tforms).items():
+                
+                ## Check if object is new
+                if name not in self.data["objects"]:
+                    self.data["objects"][name] = ObjectData()
+                    added_objects.add(name)
+                
+                self.data["objects"][name].traces[section.n] = trace_data
             
             ## Check for removed objects
             for name in trace_names:
@@ -239,6 +392,39 @@ class SeriesData():
                     ## Remove object from object attributes dicts
                     self.series.removeObjAttrs(obj_name)
     
+    def addSectionSummary(self, snum : int, summary : dict):
+        """Add the precomputed data for a section.
+
+        (Used when opening a series on a process pool, see parallel_open.py)
+        
+            Params:
+                snum (int): the section number
+                summary (dict): the section summary
+        """
+        tforms = {"no-alignment": Transform.identity()}
+        for a, tform_list in summary["tforms"].items():
+            tforms[a] = Transform(tform_list)
+
+        self.data["sections"][snum] = {
+            "thickness": summary["thickness"],
+            "calgrid": summary["calgrid"],
+            "locked": summary["locked"],
+            "bc_profiles": summary["bc_profiles"],
+            "src": summary["src"],
+            "mag": summary["mag"],
+            "flags": [Flag.fromList(l, snum) for l in summary["flags"]],
+            "tforms": tforms
+        }
+
+        self.trace_table.markSection(snum)
+        for name, trace_data in summary["traces"].items():
+            if name not in self.data["objects"]:
+                self.data["objects"][name] = ObjectData()
+            self.data["objects"][name].traces[snum] = trace_data
+
+        for name in summary["reset_alignment"]:
+            self.series.setAttr(name, "alignment", None)
+    
     def addTrace(self, trace : Trace, section : Section):
         """Add trace data to the existing object.
         
@@ -267,6 +453,7 @@ class SeriesData():
             new_object = False
         
         object_data[trace.name].addTrace(trace, section, self.series)
+        self.trace_table.markSection(section.n)
 
         return new_object
     
@@ -398,6 +585,8 @@ class SeriesData():
         
             Params:
                 obj_name (str): the name of the object to retrieve data for
+            Returns:
+                (float): the average radius (None if the object has no traces)
         """
         obj_data = self.data["objects"].get(obj_name)
         if obj_data is None:
@@ -407,6 +596,8 @@ class SeriesData():
         for trace_list in obj_data.traces.values():
             for trace_data in trace_list:
                 radii.append(trace_data.getRadius())
+        if not radii:
+            return None
         avg_radius = sum(radii) / len(radii)
 
         return avg_radius
@@ -443,6 +634,7 @@ class SeriesData():
         """
         for obj_data in self.data["objects"].values():
             obj_data.clearSection(snum)
+        self.trace_table.markSection(snum)
         
     def getTraceData(self, name : str, snum : int) -> list:
         """Get the list of trace data objects.
@@ -457,6 +649,21 @@ class SeriesData():
             return self.data["objects"][name].traces[snum]
         return None
 
+    def getObjectSections(self, obj_names : list) -> set:
+        """Get the sections that contain any traces of a set of objects.
+        
+            Params:
+                obj_names (list): the names of the objects
+            Returns:
+                (set): the section numbers
+        """
+        snums = set()
+        for name in obj_names:
+            obj_data = self.data["objects"].get(name)
+            if obj_data is not None:
+                snums.update(obj_data.traces.keys())
+        return snums
+
     def getFlagCount(self) -> int:
         """Get the number of flags in the series."""
         c = 0
@@ -472,58 +679,46 @@ class SeriesData():
         """
         out_str = "Name,Section,Index,Hidden,Closed,Tags,Length,Area,Radius,Centroid-x,Centroid-y,Feret-Max,Feret-Min\n"
 
-        ## Iterate through all traces
-        objs = self.data["objects"].keys()
-        
-        for name in sorted(objs):
-            
-            sections = self.series.sections.keys()
-            
-            for snum in sorted(sections):
-                
-                trace_list = self.getTraceData(name, snum)
-                
-                if not trace_list:
-                    
-                    continue
-                
-                for i, t in enumerate(trace_list):
-
-                    hidden     = "yes" if t.hidden else "no"
-                    closed     = "yes" if t.closed else "no"
-                    tags       = ' '.join(t.getTags())
-                    length     = round(t.getLength(), 7)
-                    xs_area    = round(t.getArea(), 7)
-                    radius     = round(t.getRadius(), 7)
-
-                    centroid   = t.getCentroid()
-                    centroid_x = round(centroid[0], 7)
-                    centroid_y = round(centroid[1], 7)
-
-                    feret      = t.getFeret()
-                    feret_max  = round(feret[1], 7)
-                    feret_min  = round(feret[0], 7)
-
-                    vals = [
-                        name,
-                        snum,
-                        i,
-                        hidden,
-                        closed,
-                        tags,
-                        length,
-                        xs_area,
-                        radius,
-                        centroid_x,
-                        centroid_y,
-                        feret_max,
-                        feret_min
-                    ]
-
-                    vals = list(map(str, vals))
-                    
-                    trace_line = ','.join(vals)
-                    out_str += trace_line + "\n"
+        ## Order the traces by name, section and index (from the trace table)
+        table = self.trace_table
+        columns = table.getColumns()
+        name_rank = np.empty(len(table.names), dtype=np.int64)
+        name_rank[np.argsort(np.array(table.names, dtype=object))] = np.arange(len(table.names))
+        order = np.lexsort((columns["index"], columns["section"], name_rank[columns["obj"]]))
+
+        ## Enumerate the traces of each object on each section
+        obj = columns["obj"][order]
+        section = columns["section"][order]
+        new_group = np.r_[True, (obj[1:] != obj[:-1]) | (section[1:] != section[:-1])]
+        group_start = np.maximum.accumulate(np.where(new_group, np.arange(len(obj)), 0))
+        enum = (np.arange(len(obj)) - group_start).tolist()
+
+        tags = {r : t for r, t in columns["tags"]}
+        values = [
+            [round(v, 7) for v in columns[c][order].tolist()]  # same rounding as before (not np.round)
+            for c in ("length", "area", "radius", "centroid_x", "centroid_y", "feret_max", "feret_min")
+        ]
+        lines = [out_str]
+        for row, o, snum, i, hidden, closed, *vals in zip(
+            order.tolist(),
+            obj.tolist(),
+            section.tolist(),
+            enum,
+            columns["hidden"][order].tolist(),
+            columns["closed"][order].tolist(),
+            *values
+        ):
+            vals = [
+                table.names[o],
+                snum,
+                i,
+                "yes" if hidden else "no",
+                "yes" if closed else "no",
+                ' '.join(tags.get(row, ())),
+                *vals
+            ]
+            lines.append(','.join(map(str, vals)) + "\n")
+        out_str = "".join(lines)
         
         # export the csv file
         if out_fp:
@@ -6,7 +6,7 @@ import numpy as np
 from .transform import Transform
 from .points import Points
 
-from PyReconstruct.modules.calc import centroid, distance, feret
+from PyReconstruct.modules.calc import centroid, distance, feret, overlapRatio
 from PyReconstruct.modules.constants import blank_palette_contour
 from PyReconstruct.modules.calc import point_list_2_pix
 
@@ -123,7 +123,7 @@ class Trace():
         r = self.getOverlapRatio(other)
         if threshold < 1 and r > threshold:
             return True
-        elif threshold == r == 1:
+        elif threshold == 1 and r > 1 - 1e-9:  # allow for float error in the exact ratio
             return True
         else:
             return False
@@ -512,6 +512,24 @@ class Trace():
             ymax1 < ymin2 or ymax2 < ymin1):
             return 0
         
+        # exact ratio (None if a trace crosses itself)
+        r = overlapRatio(self.points, other.points)
+        if r is not None:
+            return r
+        
+        return self.getRasterOverlapRatio(other, (xmin1, ymin1, xmax1, ymax1), (xmin2, ymin2, xmax2, ymax2))
+    
+    def getRasterOverlapRatio(self, other, bounds1 : tuple, bounds2 : tuple):
+        """Get the amount of intersection between two traces by drawing them on a small grid.
+        
+            Params:
+                other (Trace): the trace to compare against
+                bounds1 (tuple): the bounds of this trace
+                bounds2 (tuple): the bounds of the other trace
+        """
+        xmin1, ymin1, xmax1, ymax1 = bounds1
+        xmin2, ymin2, xmax2, ymax2 = bounds2
+
         pts1 = np.array(self.points)
         pts2 = np.array(other.points)
         
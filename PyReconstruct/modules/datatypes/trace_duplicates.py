@@ -0,0 +1,285 @@
+"""Find duplicate traces using a spatial index.
+
+Traces are bucketed in a TraceIndex so that each trace is only compared with
+the traces whose bounding boxes overlap it. Candidate pairs are then rejected
+cheaply before the exact overlap is computed: identical point lists are
+matched by hash, and pairs whose overlap cannot reach the threshold (from the
+bounding box intersection and the trace areas) are skipped. The result of
+each comparison is the same as Trace.overlaps.
+
+findSectionDuplicates only takes picklable arguments and reads the section
+file itself so that sections can be searched on a process pool.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .trace import Trace
+from .trace_index import TraceIndex, cellSizeFor
+from .section_store import readSectionDict
+
+from PyReconstruct.modules.calc import polygonArea, overlapRatio
+
+POINT_TOL = 1e-2  # the distance for matching points (see Trace.overlaps)
+
+
+class TraceShape():
+
+    def __init__(self, trace : Trace):
+        """Store the data used to compare a trace with others.
+
+            Params:
+                trace (Trace): the trace
+        """
+        self.trace = trace
+        self.points = np.asarray(trace.points, dtype=np.float64).reshape(-1, 2)
+        self.key = hash(tuple(trace.points))
+        if len(self.points):
+            self.bounds = (*self.points.min(axis=0).tolist(), *self.points.max(axis=0).tolist())
+        else:
+            self.bounds = None
+        self._area = False  # computed when first needed
+
+    @property
+    def area(self) -> float:
+        """The area of the trace (None if the trace crosses itself)."""
+        if self._area is False:
+            self._area = polygonArea(self.points)
+        return self._area
+
+    def paddedBounds(self) -> tuple:
+        """Return the bounds of the trace padded by the point tolerance."""
+        xmin, ymin, xmax, ymax = self.bounds
+        return xmin - POINT_TOL, ymin - POINT_TOL, xmax + POINT_TOL, ymax + POINT_TOL
+
+
+def pointsMatch(shape1 : TraceShape, shape2 : TraceShape) -> bool:
+    """Check if the points of two traces are the same (within the tolerance).
+
+        Params:
+            shape1 (TraceShape): the first trace
+            shape2 (TraceShape): the second trace
+    """
+    if len(shape1.points) != len(shape2.points):
+        return False
+    if shape1.key == shape2.key and shape1.trace.points == shape2.trace.points:
+        return True
+    return bool(np.all(np.abs(shape1.points - shape2.points) <= POINT_TOL))
+
+
+def overlapCannotExceed(shape1 : TraceShape, shape2 : TraceShape, threshold : float) -> bool:
+    """Check if the overlap ratio of two traces is bounded below a threshold.
+
+    The intersection is at most the bounding box intersection (and the smaller
+    area), which gives an upper bound for the overlap ratio.
+
+        Params:
+            shape1 (TraceShape): the first trace
+            shape2 (TraceShape): the second trace
+            threshold (float): the overlap threshold
+        Returns:
+            (bool): True if the overlap ratio cannot pass the threshold
+    """
+    xmin1, ymin1, xmax1, ymax1 = shape1.bounds
+    xmin2, ymin2, xmax2, ymax2 = shape2.bounds
+    w = min(xmax1, xmax2) - max(xmin1, xmin2)
+    h = min(ymax1, ymax2) - max(ymin1, ymin2)
+    if w < 0 or h < 0:
+        return True
+
+    a1, a2 = shape1.area, shape2.area
+    if not a1 or not a2:
+        return False  # no bound for traces that cross themselves
+    intersect_bound = min(w * h, a1, a2)
+    ratio_bound = intersect_bound / (a1 + a2 - intersect_bound)
+    if threshold < 1:
+        return ratio_bound <= threshold
+    else:
+        return ratio_bound < 1 - 1e-9
+
+
+def shapesOverlap(shape1 : TraceShape, shape2 : TraceShape, threshold : float) -> bool:
+    """Check if two traces overlap (same result as Trace.overlaps).
+
+        Params:
+            shape1 (TraceShape): the first trace
+            shape2 (TraceShape): the second trace
+            threshold (float): the threshold overlap ratio to define overlapping (exclusive)
+    """
+    if shape1.trace.closed != shape2.trace.closed:
+        return False
+    if pointsMatch(shape1, shape2):
+        return True
+    if overlapCannotExceed(shape1, shape2, threshold):
+        return False
+
+    # compare amount of overlap (the areas are only computed once for each trace)
+    r = overlapRatio(shape1.points, shape2.points, (shape1.area, shape2.area))
+    if r is None:
+        r = shape1.trace.getRasterOverlapRatio(shape2.trace, shape1.bounds, shape2.bounds)
+    if threshold < 1 and r > threshold:
+        return True
+    elif threshold == 1 and r > 1 - 1e-9:
+        return True
+    else:
+        return False
+
+
+def findDuplicates(traces : list[Trace], threshold : float) -> list:
+    """Find the duplicate traces in a list.
+
+    Each trace is compared with the traces before it (most recent first). The
+    first previous trace it overlaps is removed, and the later trace is kept.
+
+        Params:
+            traces (list): the traces to check (in order)
+            threshold (float): the overlap threshold
+        Returns:
+            (list): (index of kept trace, index of removed trace) in the order they were found
+    """
+    shapes = {}  # trace id : (index, shape)
+    index = TraceIndex(cell_size=cellSizeFor(traces))  # traces are added as they are checked
+    duplicates = []
+    for i, trace in enumerate(traces):
+        shape = TraceShape(trace)
+        if shape.bounds is None:
+            continue
+        for other in reversed(index.query(shape.paddedBounds())):
+            j, other_shape = shapes[id(other)]
+            if shapesOverlap(shape, other_shape, threshold):
+                duplicates.append((i, j))
+                index.remove(other)
+                break
+        shapes[id(trace)] = (i, shape)
+        index.add(trace)
+
+    return duplicates
+
+
+def matchTraces(traces1 : list[Trace], traces2 : list[Trace], threshold : float, skip : tuple = None) -> list:
+    """Pair the overlapping traces in two lists.
+
+    Each trace in the second list is paired with the first unpaired trace in
+    the first list that it overlaps.
+
+        Params:
+            traces1 (list): the first list of traces
+            traces2 (list): the second list of traces
+            threshold (float): the overlap threshold
+            skip (tuple): a pair of indices that is known not to overlap
+        Returns:
+            (list): (index in traces1, index in traces2) for each pair
+    """
+    shapes1 = {id(trace) : (i, TraceShape(trace)) for i, trace in enumerate(traces1)}
+    index = TraceIndex(traces1)
+    pairs = []
+    for j, trace in enumerate(traces2):
+        shape = TraceShape(trace)
+        if shape.bounds is None:
+            continue
+        for other in index.query(shape.paddedBounds()):
+            i, other_shape = shapes1[id(other)]
+            if (i, j) == skip:
+                continue
+            if shapesOverlap(other_shape, shape, threshold):
+                pairs.append((i, j))
+                index.remove(other)
+                break
+
+    return pairs
+
+
+def findOverlapping(traces1 : list[Trace], traces2 : list[Trace], threshold : float) -> list:
+    """Find the traces in one list that overlap any trace in another list.
+
+        Params:
+            traces1 (list): the traces to check against
+            traces2 (list): the traces to check
+            threshold (float): the overlap threshold
+        Returns:
+            (list): the indices in traces2 of the overlapping traces (sorted)
+    """
+    shapes2 = {id(trace) : (j, TraceShape(trace)) for j, trace in enumerate(traces2)}
+    index = TraceIndex(traces2)
+    found = []
+    for trace in traces1:
+        shape = TraceShape(trace)
+        if shape.bounds is None:
+            continue
+        for other in index.query(shape.paddedBounds()):
+            j, other_shape = shapes2[id(other)]
+            if shapesOverlap(shape, other_shape, threshold):
+                found.append(j)
+                index.remove(other)
+
+    return sorted(found)
+
+
+def findSectionDuplicates(section_fp : str, threshold : float, skip_names : set = None) -> dict:
+    """Find the duplicate traces on a section file.
+
+    Only uses picklable arguments so that it can be run in a worker process.
+
+        Params:
+            section_fp (str): the filepath for the hidden section file
+            threshold (float): the overlap threshold
+            skip_names (set): the contours not to check
+        Returns:
+            (dict): contour name : list of (kept index, removed index) (see findDuplicates)
+    """
+    section_data = readSectionDict(section_fp)
+    found = {}
+    for cname, trace_list in section_data["contours"].items():
+        if skip_names and cname in skip_names:
+            continue
+        # load the traces the same way as Section
+        traces = []
+        for trace_data in trace_list:
+            trace = Trace.fromList(trace_data, cname)
+            l = len(trace.points)
+            if l == 2:
+                trace.closed = False
+            if l > 1:
+                traces.append(trace)
+        duplicates = findDuplicates(traces, threshold)
+        if duplicates:
+            found[cname] = duplicates
+
+    return found
+
+
+def iterSectionDuplicates(section_fps : dict, threshold : float, skip_names : set = None, max_workers : int = 1):
+    """Find the duplicate traces on each section, yielding each section as it is finished.
+
+    Sections are not yielded in order.
+
+        Params:
+            section_fps (dict): section number : filepath for the hidden section file
+            threshold (float): the overlap threshold
+            skip_names (set): the contours not to check
+            max_workers (int): the maximum number of processes
+        Yields:
+            (int): the section number
+            (dict): contour name : list of (kept index, removed index)
+    """
+    if max_workers <= 1 or len(section_fps) <= 1:
+        for snum, fp in section_fps.items():
+            yield snum, findSectionDuplicates(fp, threshold, skip_names)
+        return
+
+    # spawn rather than fork: the GUI process may be running other threads
+    executor = ProcessPoolExecutor(
+        max_workers=min(max_workers, len(section_fps)),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        futures = {
+            executor.submit(findSectionDuplicates, fp, threshold, skip_names) : snum
+            for snum, fp in section_fps.items()
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
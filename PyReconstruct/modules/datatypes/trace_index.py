@@ -0,0 +1,186 @@
+"""Spatial index of the traces on a section.
+
+Trace bounding boxes are stored in a uniform grid in untransformed section
+coordinates. Queries are made in field coordinates: the query rectangle is
+mapped back through the section transform, so the index does not need to be
+rebuilt when the transform (or the series alignment) changes. The mapped
+rectangle is only an upper bound of the area of interest; callers still do
+their own exact tests on the candidates that are returned.
+"""
+
+import math
+
+import numpy as np
+
+from .trace import Trace
+from .transform import Transform
+
+MAX_CELLS = 64  # traces covering more cells than this are always returned as candidates
+
+
+class TraceIndex():
+
+    def __init__(self, traces : list[Trace] = None, cell_size : float = None):
+        """Create a spatial index of traces.
+
+            Params:
+                traces (list): the traces to index
+                cell_size (float): the grid cell size (default: chosen from the traces, see cellSizeFor)
+        """
+        traces = [trace for trace in (traces or []) if len(trace.points)]
+        self.cells = {}  # (i, j) : set of trace ids
+        self.large = set()  # ids of traces covering too many cells
+        self.entries = {}  # trace id : (order, trace, bounds, cells)
+        self.order = 0
+
+        bounds = _batchBounds(traces)
+        self.cell_size = cell_size if cell_size else _chooseCellSize(bounds)
+        cell_ranges = np.floor(bounds / self.cell_size).astype(np.int64)
+        for trace, b, r in zip(traces, bounds.tolist(), cell_ranges.tolist()):
+            self._insert(trace, tuple(b), r)
+
+    def __len__(self):
+        """Return the number of indexed traces."""
+        return len(self.entries)
+
+    def add(self, trace : Trace):
+        """Add a trace to the index.
+
+            Params:
+                trace (Trace): the trace to add
+        """
+        if id(trace) in self.entries:
+            self.remove(trace)
+        pts = np.asarray(trace.points, dtype=np.float64).reshape(-1, 2)
+        if not len(pts):
+            return
+        xmin, ymin = pts.min(axis=0).tolist()
+        xmax, ymax = pts.max(axis=0).tolist()
+        self._insert(trace, (xmin, ymin, xmax, ymax))
+
+    def remove(self, trace : Trace):
+        """Remove a trace from the index.
+
+            Params:
+                trace (Trace): the trace to remove
+        """
+        entry = self.entries.pop(id(trace), None)
+        if entry is None:
+            return
+        _, _, _, cells = entry
+        if cells is None:
+            self.large.discard(id(trace))
+            return
+        for cell in cells:
+            ids = self.cells[cell]
+            ids.discard(id(trace))
+            if not ids:
+                del(self.cells[cell])
+
+    def query(self, bounds : tuple, tform : Transform = None) -> list[Trace]:
+        """Return the traces whose bounding boxes overlap a rectangle.
+
+            Params:
+                bounds (tuple): xmin, ymin, xmax, ymax of the rectangle
+                tform (Transform): the transform applied to the traces (bounds are in transformed coordinates)
+            Returns:
+                (list): the candidate traces (in the order they were added)
+        """
+        if tform is not None:
+            xmin, ymin, xmax, ymax = bounds
+            corners = tform.mapArray(
+                [(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)],
+                inverted=True
+            )
+            xmin, ymin = corners.min(axis=0).tolist()
+            xmax, ymax = corners.max(axis=0).tolist()
+            bounds = xmin, ymin, xmax, ymax
+
+        ids = set(self.large)
+        i0, j0, i1, j1 = self._cellRange(bounds)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # query covers more cells than are populated
+            for (i, j), cell_ids in self.cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    ids.update(cell_ids)
+        else:
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    cell_ids = self.cells.get((i, j))
+                    if cell_ids:
+                        ids.update(cell_ids)
+
+        xmin, ymin, xmax, ymax = bounds
+        found = []
+        for tid in ids:
+            order, trace, (txmin, tymin, txmax, tymax), _ = self.entries[tid]
+            if not (txmax < xmin or txmin > xmax or tymax < ymin or tymin > ymax):
+                found.append((order, trace))
+        found.sort(key=lambda x: x[0])
+
+        return [trace for _, trace in found]
+
+    def _insert(self, trace : Trace, bounds : tuple, cell_range : tuple = None):
+        """Insert a trace with known bounds (and optionally grid cells) into the grid."""
+        if cell_range is None:
+            cell_range = self._cellRange(bounds)
+        i0, j0, i1, j1 = cell_range
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > MAX_CELLS:
+            cells = None
+            self.large.add(id(trace))
+        else:
+            cells = [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+            tid = id(trace)
+            for cell in cells:
+                self.cells.setdefault(cell, set()).add(tid)
+        self.entries[id(trace)] = (self.order, trace, bounds, cells)
+        self.order += 1
+
+    def _cellRange(self, bounds : tuple) -> tuple:
+        """Return the first and last grid cells covered by a rectangle."""
+        xmin, ymin, xmax, ymax = bounds
+        s = self.cell_size
+        return (
+            math.floor(xmin / s),
+            math.floor(ymin / s),
+            math.floor(xmax / s),
+            math.floor(ymax / s)
+        )
+
+
+def _batchBounds(traces : list[Trace]) -> np.ndarray:
+    """Return the (N, 4) array of bounding boxes for a list of traces."""
+    if not traces:
+        return np.zeros((0, 4))
+    lengths = [len(trace.points) for trace in traces]
+    points = np.array(
+        [pt for trace in traces for pt in trace.points],
+        dtype=np.float64
+    ).reshape(-1, 2)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.column_stack((
+        np.minimum.reduceat(points, starts, axis=0),
+        np.maximum.reduceat(points, starts, axis=0)
+    ))
+
+
+def cellSizeFor(traces : list[Trace]) -> float:
+    """Return the grid cell size for indexing a set of traces.
+
+    Use to size an index that starts empty and has the traces added one at
+    a time.
+
+        Params:
+            traces (list): the traces that will be indexed
+    """
+    traces = [trace for trace in traces if len(trace.points)]
+    return _chooseCellSize(_batchBounds(traces))
+
+
+def _chooseCellSize(bounds : np.ndarray) -> float:
+    """Pick a grid cell size a few times larger than a typical trace."""
+    if not len(bounds):
+        return 1.0
+    extents = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+    size = float(np.median(extents)) * 4
+    return size if size > 0 else 1.0
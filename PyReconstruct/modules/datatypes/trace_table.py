@@ -0,0 +1,359 @@
+"""Columnar store of the trace data in SeriesData.
+
+SeriesData keeps the data for each trace in a TraceData object, which is
+convenient for one object at a time but slow for whole-series questions
+(every aggregate is a Python loop over all of the traces). TraceTable keeps
+the same data as one row per trace in numpy arrays so that series-wide
+filters and group-by aggregations are vectorized.
+
+Rows are stored in blocks of one section each. SeriesData marks a section
+whenever it changes the traces on it (see markSection) and only the marked
+blocks are rebuilt, when the table is next used. Section thicknesses are
+looked up when a query is made, so changing a thickness does not require a
+rebuild. Objects are identified by integer ids that are kept for the life of
+the table (ids of deleted objects simply have no rows).
+"""
+
+from itertools import chain, compress
+from operator import attrgetter
+
+import numpy as np
+
+FLOAT_COLUMNS = (
+    "area",
+    "length",
+    "radius",
+    "centroid_x",
+    "centroid_y",
+    "feret_min",
+    "feret_max"
+)
+BOOL_COLUMNS = ("closed", "hidden", "negative")
+INT_COLUMNS = ("obj", "section", "index")
+COLUMNS = INT_COLUMNS + FLOAT_COLUMNS + BOOL_COLUMNS
+
+
+def _emptyBlock() -> dict:
+    """Return the columns for a block with no rows."""
+    block = {}
+    for c in INT_COLUMNS:
+        block[c] = np.zeros(0, dtype=np.int64)
+    for c in FLOAT_COLUMNS:
+        block[c] = np.zeros(0, dtype=np.float64)
+    for c in BOOL_COLUMNS:
+        block[c] = np.zeros(0, dtype=bool)
+    block["tags"] = []
+    return block
+
+
+def _makeBlock(snum : int, ids : list, traces : list) -> dict:
+    """Build the columns for a section from its trace data.
+
+        Params:
+            snum (int): the section number
+            ids (list): the object id for each trace on the section
+            traces (list): the TraceData for each trace on the section
+        Returns:
+            (dict): column name : array (and "tags": list of (row, tags) for tagged traces)
+    """
+    n = len(traces)
+    if not n:
+        return _emptyBlock()
+    block = {
+        "obj": np.array(ids, dtype=np.int64),
+        "section": np.full(n, snum, dtype=np.int64),
+    }
+    for c, dtype in (
+        [(c, np.int64) for c in ("index",)] +
+        [(c, np.float64) for c in ("area", "length", "radius")] +
+        [(c, bool) for c in BOOL_COLUMNS]
+    ):
+        block[c] = np.fromiter(map(attrgetter(c), traces), dtype=dtype, count=n)
+    for attr, (c1, c2) in (
+        ("centroid", ("centroid_x", "centroid_y")),
+        ("feret", ("feret_min", "feret_max"))
+    ):
+        pairs = np.fromiter(
+            chain.from_iterable(map(attrgetter(attr), traces)),
+            dtype=np.float64,
+            count=2*n
+        )
+        block[c1] = pairs[0::2]
+        block[c2] = pairs[1::2]
+    tags = list(map(attrgetter("tags"), traces))
+    block["tags"] = [(r, tags[r]) for r in compress(range(n), tags)]
+    return block
+
+
+class TraceTable():
+
+    def __init__(self, series_data):
+        """Create the columnar store for a SeriesData object.
+
+            Params:
+                series_data (SeriesData): the series data to store
+        """
+        self.series_data = series_data
+        self.names = []  # object id : name
+        self.name_ids = {}  # name : object id
+        self.blocks = {}  # snum : block (see _makeBlock)
+        self.marked = set()  # sections to rebuild
+        self.all_marked = True  # True if every section should be rebuilt
+        self.columns = None  # all blocks joined (None if out of date)
+
+    def markSection(self, snum : int):
+        """Mark a section to be rebuilt when the table is next used.
+
+            Params:
+                snum (int): the section number
+        """
+        self.marked.add(snum)
+        self.columns = None
+
+    def markAll(self):
+        """Mark every section to be rebuilt when the table is next used."""
+        self.all_marked = True
+        self.marked = set()
+        self.columns = None
+
+    def getObjectId(self, name : str) -> int:
+        """Return the id for an object name (a new id if the name is new).
+
+            Params:
+                name (str): the name of the object
+        """
+        i = self.name_ids.get(name)
+        if i is None:
+            i = len(self.names)
+            self.names.append(name)
+            self.name_ids[name] = i
+        return i
+
+    def update(self):
+        """Rebuild the marked sections."""
+        if not self.all_marked and not self.marked:
+            return
+        objects = self.series_data.data["objects"]
+
+        if self.all_marked:
+            self.blocks = {}
+            sections = None
+            rows = {}
+        else:
+            sections = self.marked
+            rows = {snum : ([], []) for snum in sections}
+        
+        # gather the object ids and trace data for each section
+        for name, obj_data in objects.items():
+            if sections is None:
+                items = obj_data.traces.items()
+            else:
+                items = ((snum, obj_data.traces.get(snum)) for snum in sections)
+            i = None
+            for snum, trace_list in items:
+                if not trace_list:
+                    continue
+                if i is None:
+                    i = self.getObjectId(name)
+                ids, traces = rows.setdefault(snum, ([], []))
+                ids.extend([i] * len(trace_list))
+                traces.extend(trace_list)
+
+        for snum, (ids, traces) in rows.items():
+            if traces:
+                self.blocks[snum] = _makeBlock(snum, ids, traces)
+            elif snum in self.blocks:
+                del(self.blocks[snum])
+
+        self.all_marked = False
+        self.marked = set()
+        self.columns = None
+
+    def getColumns(self) -> dict:
+        """Return the columns for every trace in the series (rows ordered by section).
+
+        The arrays are shared: do NOT modify them.
+
+            Returns:
+                (dict): column name : array (and "tags": list of (row, tags) for tagged traces)
+        """
+        self.update()
+        if self.columns is not None:
+            return self.columns
+
+        blocks = [self.blocks[snum] for snum in sorted(self.blocks)]
+        if not blocks:
+            blocks = [_emptyBlock()]
+        columns = {}
+        for c in COLUMNS:
+            columns[c] = np.concatenate([b[c] for b in blocks])
+        tags = []
+        offset = 0
+        for b in blocks:
+            tags += [(offset + r, t) for r, t in b["tags"]]
+            offset += len(b["obj"])
+        columns["tags"] = tags
+
+        self.columns = columns
+        return columns
+
+    def __len__(self):
+        """Return the number of traces in the table."""
+        return len(self.getColumns()["obj"])
+
+    def getThickness(self) -> np.ndarray:
+        """Return the thickness of the section for each row."""
+        columns = self.getColumns()
+        snums, inverse = np.unique(columns["section"], return_inverse=True)
+        sections = self.series_data.data["sections"]
+        thickness = np.array(
+            [sections[snum]["thickness"] for snum in snums.tolist()],
+            dtype=np.float64
+        )
+        return thickness[inverse]
+
+    def select(self, obj_names : list = None, sections : list = None, closed : bool = None, hidden : bool = None, negative : bool = None, tags : list = None) -> np.ndarray:
+        """Return the rows that match a set of filters.
+
+            Params:
+                obj_names (list): the objects to include (all if None)
+                sections (list): the section numbers to include (all if None)
+                closed (bool): only include closed (True) or open (False) traces
+                hidden (bool): only include hidden (True) or visible (False) traces
+                negative (bool): only include negative (True) or positive (False) traces
+                tags (list): only include traces with any of these tags
+            Returns:
+                (np.ndarray): boolean mask of the rows
+        """
+        columns = self.getColumns()
+        mask = np.ones(len(columns["obj"]), dtype=bool)
+        if obj_names is not None:
+            ids = [self.name_ids[n] for n in obj_names if n in self.name_ids]
+            mask &= np.isin(columns["obj"], ids)
+        if sections is not None:
+            mask &= np.isin(columns["section"], list(sections))
+        for c, value in (("closed", closed), ("hidden", hidden), ("negative", negative)):
+            if value is not None:
+                mask &= columns[c] == bool(value)
+        if tags is not None:
+            tags = set(tags)
+            tagged = np.zeros(len(mask), dtype=bool)
+            tagged[[r for r, t in columns["tags"] if not tags.isdisjoint(t)]] = True
+            mask &= tagged
+        return mask
+
+    def groupBy(self, values, how : str = "sum", mask : np.ndarray = None) -> np.ndarray:
+        """Aggregate a value for each object.
+
+            Params:
+                values (str | np.ndarray): a column name or an array with a value for each row
+                how (str): "sum", "count", "mean", "min" or "max"
+                mask (np.ndarray): the rows to include (all if None)
+            Returns:
+                (np.ndarray): the aggregate for each object id (nan for min, max and mean of objects with no rows)
+        """
+        columns = self.getColumns()
+        obj = columns["obj"]
+        if isinstance(values, str):
+            values = columns[values]
+        if mask is not None:
+            obj = obj[mask]
+            values = values[mask]
+        n = len(self.names)
+
+        if how == "count":
+            return np.bincount(obj, minlength=n)
+        elif how == "sum":
+            return np.bincount(obj, weights=values, minlength=n)
+        elif how == "mean":
+            counts = np.bincount(obj, minlength=n)
+            sums = np.bincount(obj, weights=values, minlength=n)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return sums / counts
+        elif how in ("min", "max"):
+            result = np.full(n, np.nan)
+            if len(obj):
+                # sort by object and value: the first or last row of each object is the result
+                order = np.lexsort((values, obj))
+                sorted_obj = obj[order]
+                if how == "min":
+                    first = np.flatnonzero(np.r_[True, sorted_obj[1:] != sorted_obj[:-1]])
+                    result[sorted_obj[first]] = values[order][first]
+                else:
+                    last = np.flatnonzero(np.r_[sorted_obj[1:] != sorted_obj[:-1], True])
+                    result[sorted_obj[last]] = values[order][last]
+            return result
+        else:
+            raise ValueError(f"Unknown aggregation: {how}")
+
+    def getObjectStats(self, obj_names : list = None) -> dict:
+        """Get the quantities shown for each object (same values as the SeriesData getters).
+
+            Params:
+                obj_names (list): the objects to include (all objects in the series if None)
+            Returns:
+                (dict): quantity : list of values in the order of the names (None for objects not in the series)
+                    (names, start, end, count, flat_area, volume, avg_radius, configuration, tags)
+                    start, end and avg_radius are also None for objects without traces
+        """
+        columns = self.getColumns()
+        if obj_names is None:
+            obj_names = list(self.series_data.data["objects"].keys())
+        
+        # objects without rows use an extra id past the end of the aggregates
+        n = len(self.names)
+        ids = np.array([self.name_ids.get(name, n) for name in obj_names], dtype=np.int64)
+
+        thickness = self.getThickness()
+        flat = np.where(columns["closed"], columns["area"], columns["length"] * thickness)
+        count = np.append(self.groupBy("obj", "count"), 0)[ids]
+        stats = {
+            "start": self.groupBy("section", "min"),
+            "end": self.groupBy("section", "max"),
+            "flat_area": self.groupBy(flat, "sum"),
+            "volume": self.groupBy(columns["area"] * thickness, "sum"),
+            "avg_radius": self.groupBy("radius", "mean"),
+            "closed": self.groupBy(columns["closed"].astype(np.float64), "sum"),
+        }
+        for key in stats:
+            stats[key] = np.append(stats[key], np.nan)[ids].tolist()
+        has_rows = (count > 0).tolist()
+        count = count.tolist()
+
+        # objects that exist but have no traces get zero totals (as from the getters)
+        objects = self.series_data.data["objects"]
+        exists = [name in objects for name in obj_names]
+
+        result = {"names": list(obj_names)}
+        for key in ("start", "end"):
+            result[key] = [int(v) if h else None for v, h in zip(stats[key], has_rows)]
+        result["avg_radius"] = [v if h else None for v, h in zip(stats["avg_radius"], has_rows)]
+        result["count"] = [c if e else None for c, e in zip(count, exists)]
+        for key in ("flat_area", "volume"):
+            result[key] = [
+                v if h else (0 if e else None)
+                for v, h, e in zip(stats[key], has_rows, exists)
+            ]
+
+        configs = []
+        for c, total, e in zip(stats["closed"], count, exists):
+            if not e:
+                configs.append(None)
+            elif total == 0 or c == 0:
+                configs.append("open")
+            elif c == total:
+                configs.append("closed")
+            else:
+                configs.append("mixed")
+        result["configuration"] = configs
+
+        obj_tags = {}
+        obj = columns["obj"]
+        for r, t in columns["tags"]:
+            obj_tags.setdefault(int(obj[r]), set()).update(t)
+        result["tags"] = [
+            set(obj_tags.get(i, ())) if e else None
+            for i, e in zip(ids.tolist(), exists)
+        ]
+
+        return result
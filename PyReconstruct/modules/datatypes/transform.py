@@ -1,8 +1,6 @@
 import numpy as np
 from skimage import transform as tf
 
-from PySide6.QtGui import QTransform
-
 class Transform():
 
     def __init__(self, tform_list : list):
@@ -12,19 +10,55 @@ class Transform():
                 tform_list (list): the tform as a six-number list
         """
         self.tform = tform_list
-        self.qtform = self.getQTransform()
+        self.updateCache()
+    
+    def updateCache(self):
+        """Update the cached matrices (call after modifying self.tform)."""
+        t = self.tform
+        self.matrix = np.array([
+            [t[0], t[1], t[2]],
+            [t[3], t[4], t[5]],
+            [0, 0, 1]
+        ], dtype=np.float64)
+        self._inverse = None  # computed when first needed
+    
+    @property
+    def inverse_matrix(self) -> np.ndarray:
+        """The cached 3x3 inverse matrix."""
+        if self._inverse is None:
+            t = self.tform
+            if abs(t[0]*t[4] - t[1]*t[3]) <= 1e-12:
+                raise Exception("Matrix is not invertible.")
+            self._inverse = np.linalg.inv(self.matrix)
+        return self._inverse
+    
+    @staticmethod
+    def fromMatrix(m : np.ndarray):
+        """Get a Transform object from a 3x3 (or 2x3) matrix."""
+        return Transform([
+            float(m[0, 0]), float(m[0, 1]), float(m[0, 2]),
+            float(m[1, 0]), float(m[1, 1]), float(m[1, 2])
+        ])
     
-    def getQTransform(self) -> QTransform:
+    @property
+    def qtform(self):
+        """The transform as a QTransform object."""
+        return self.getQTransform()
+    
+    def getQTransform(self):
         """Get the transform as a QTransform object.
         
+        (Qt is only imported here so that transforms can be used without the GUI libraries.)
+        
             Returns:
                 (QTransform): the QTransform object
         """
+        from PySide6.QtGui import QTransform
         t = self.tform
         return QTransform(t[0], t[3], t[1], t[4], t[2], t[5])
     
     # STATIC METHOD
-    def fromQTransform(qtform : QTransform):
+    def fromQTransform(qtform):
         """Get a Transform object from a QTransform object."""
         return Transform([
             qtform.m11(),
@@ -54,16 +88,32 @@ class Transform():
             Returns:
                 (tuple) OR (list): the transformed point or points
         """
-        if inverted:
-            qtform, invertible = self.qtform.inverted()
-            if not invertible:
-                raise Exception("Matrix is not invertible.")
-        else:
-            qtform = self.qtform
+        m = self.inverse_matrix if inverted else self.matrix
         if len(args) == 2:
-            return qtform.map(args[0], args[1])
+            x, y = args
+            return (
+                float(m[0, 0]*x + m[0, 1]*y + m[0, 2]),
+                float(m[1, 0]*x + m[1, 1]*y + m[1, 2])
+            )
         elif len(args) == 1:
-            return [qtform.map(*p) for p in args[0]]
+            if isinstance(args[0], np.ndarray):
+                return self.mapArray(args[0], inverted)
+            if len(args[0]) == 0:
+                return []
+            return list(map(tuple, self.mapArray(args[0], inverted).tolist()))
+    
+    def mapArray(self, points, inverted=False) -> np.ndarray:
+        """Apply the transform to an array of points.
+        
+            Params:
+                points (np.ndarray): (N, 2) array of points (or anything convertible to one)
+                inverted (bool): True if the inverse transform should be applied
+            Returns:
+                (np.ndarray): (N, 2) array of transformed points
+        """
+        m = self.inverse_matrix if inverted else self.matrix
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return points @ m[:2, :2].T + m[:2, 2]
     
     def getList(self) -> list:
         """Get the tform list numbers.
@@ -79,19 +129,56 @@ class Transform():
             Returns:
                 (Transform): the inverted transform
         """
-        t, invertible = self.qtform.inverted()
-        if not invertible:
-            raise Exception("Matrix is not invertible")
-        return Transform.fromQTransform(t)
+        return Transform.fromMatrix(self.inverse_matrix)
     
     def copy(self):
         """Returns a copy of the transform."""
         return Transform(self.tform.copy())
     
     def __mul__(self, other):
-        """Compose two transforms."""
-        q_composed = self.getQTransform() * other.getQTransform()
-        return Transform.fromQTransform(q_composed)
+        """Compose two transforms (self is applied first)."""
+        return Transform.fromMatrix(other.matrix @ self.matrix)
+    
+    @staticmethod
+    def compose(tforms : list):
+        """Compose a list of transforms (applied in list order).
+        
+            Params:
+                tforms (list): the transforms to compose
+            Returns:
+                (Transform): the composed transform
+        """
+        m = np.identity(3)
+        for tform in tforms:
+            m = tform.matrix @ m
+        return Transform.fromMatrix(m)
+    
+    @staticmethod
+    def mapEach(tforms : list, points) -> np.ndarray:
+        """Apply a different transform to each point.
+        
+            Params:
+                tforms (list): the transform for each point
+                points (np.ndarray): (N, 2) array of points (or anything convertible to one)
+            Returns:
+                (np.ndarray): (N, 2) array of transformed points
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        m = Transform.stack(tforms)
+        return np.einsum("nij,nj->ni", m[:, :, :2], points) + m[:, :, 2]
+    
+    @staticmethod
+    def stack(tforms : list) -> np.ndarray:
+        """Stack the affine part of several transforms.
+        
+            Params:
+                tforms (list): the transforms
+            Returns:
+                (np.ndarray): (K, 2, 3) array of transforms
+        """
+        if not tforms:
+            return np.zeros((0, 2, 3))
+        return np.stack([tform.matrix[:2] for tform in tforms])
     
     def magScale(self, prev_mag : float, new_mag : float):
         """Scale the transform to magnification changes.
@@ -102,6 +189,7 @@ class Transform():
         """
         self.tform[2] *= new_mag / prev_mag
         self.tform[5] *= new_mag / prev_mag
+        self.updateCache()
     
     def estimateTform(pts1, pts2):
         """Estimate the transform that converts pts1 to pts2.
@@ -121,7 +209,8 @@ class Transform():
 
     @property
     def det(self):
-        return self.getQTransform().determinant()
+        t = self.tform
+        return t[0]*t[4] - t[1]*t[3]
 
     def equals(self, other):
         """Compare two transforms
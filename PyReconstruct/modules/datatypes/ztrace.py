@@ -1,5 +1,7 @@
 from PyReconstruct.modules.calc import distance3D, rolling_average
 
+from .transform import Transform
+
 from PyReconstruct.modules.datatypes_legacy import ZContour as XMLZContour
 
 class Ztrace():
@@ -114,15 +116,14 @@ class Ztrace():
                 (list): list of lines between points
         """
         # transform all points to field coordinates
-        tformed_pts = []
-        for pt in self.points:
-            x, y, snum = pt
-            if pt[2] == section.n:
-                tform = section.tform
+        tforms = []
+        for x, y, snum in self.points:
+            if snum == section.n:
+                tforms.append(section.tform)
             else:
-                tform = series.data["sections"][pt[2]]["tforms"][series.alignment]
-            x, y = tform.map(x, y)
-            tformed_pts.append((x, y, snum))
+                tforms.append(series.data["sections"][snum]["tforms"][series.alignment])
+        xy = Transform.mapEach(tforms, [pt[:2] for pt in self.points]).tolist()
+        tformed_pts = [(x, y, pt[2]) for (x, y), pt in zip(xy, self.points)]
         
         pts = []
         lines = []
@@ -175,11 +176,9 @@ class Ztrace():
         alignment = series.getAttr(self.name, "alignment", ztrace=True)
         if not alignment: alignment = series.alignment
 
-        real_pts = []
-        for x, y, snum in self.points:
-            tform = series.data["sections"][snum]["tforms"][alignment]
-            new_pt = (*tform.map(x, y), zvals[snum])
-            real_pts.append(new_pt)
+        tforms = [series.data["sections"][snum]["tforms"][alignment] for x, y, snum in self.points]
+        xy = Transform.mapEach(tforms, [pt[:2] for pt in self.points]).tolist()
+        real_pts = [(x, y, zvals[pt[2]]) for (x, y), pt in zip(xy, self.points)]
         
         dist = 0
         for i in range(len(real_pts[:-1])):
@@ -224,7 +224,8 @@ class AllOptionsDialog(QDialog):
                 ("Taubin", opt == "taubin"),
                 ("None (least smooth)", opt == "none"))],
             ["Smoothing iterations:", ("int", self.series.getOption("smoothing_iterations"))],
-            ["Screenshot resolution (dpi):", ("int", self.series.getOption("screenshot_res"))]
+            ["Screenshot resolution (dpi):", ("int", self.series.getOption("screenshot_res"))],
+            ["Scene triangle budget:", ("int", self.series.getOption("3D_triangle_budget"))]
         ]
 
         def setOption(response):
@@ -239,6 +240,7 @@ class AllOptionsDialog(QDialog):
             self.series.setOption("3D_smoothing", smoothing_alg)
             self.series.setOption("smoothing_iterations", response[2])
             self.series.setOption("screenshot_res", response[3])
+            self.series.setOption("3D_triangle_budget", response[4])
             
         self.addOptionWidget("smoothing_3D", structure, setOption)
 
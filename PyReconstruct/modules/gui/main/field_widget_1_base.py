@@ -16,7 +16,7 @@ from PySide6.QtCore import (
 )
 
 from PyReconstruct.modules.datatypes import Series, Section, Trace, Transform
-from PyReconstruct.modules.backend.view import SectionLayer, ZarrLayer
+from PyReconstruct.modules.backend.view import SectionLayer, ZarrLayer, SectionPrefetcher, tile_cache
 from PyReconstruct.modules.backend.func import SeriesStates
 from PyReconstruct.modules.backend.table import TableManager
 
@@ -41,6 +41,7 @@ class FieldWidgetBase:
         
         self.pixmap_dim : tuple             = None
         self.section_layer : SectionLayer   = None
+        self.prefetcher : SectionPrefetcher = None
 
         self.table_manager : TableManager   = None
         self.focus_table_id : int           = None
@@ -122,8 +123,14 @@ class FieldWidgetBase:
         self.series_states[self.section]  # initialize the current section
 
         ## Create section view
+        tile_cache.setBudget(self.series.getOption("image_cache_mb") * 2**20)
         self.section_layer = SectionLayer(self.section, self.series)
 
+        ## Create background loader for neighbouring sections
+        if self.prefetcher:
+            self.prefetcher.shutdown()
+        self.prefetcher = SectionPrefetcher(self.series)
+
         ## Create zarr view if applicable
         self.createZarrLayer()
         
@@ -197,6 +204,7 @@ class FieldWidgetBase:
             self.timer.start(5000)
 
         self.generateView()
+        self.prefetchSections()
     
     def createZarrLayer(self):
         """Create a zarr layer."""
@@ -407,10 +415,15 @@ class FieldWidgetBase:
 
         # load new section if required
         if new_section_num != self.series.current_section:
-            # load section
-            self.section = self.series.loadSection(new_section_num)
-            # load section view
-            self.section_layer = SectionLayer(self.section, self.series)
+            # use the prefetched section if ready
+            self.section_layer = self.prefetcher.take(new_section_num)
+            if self.section_layer:
+                self.section = self.section_layer.section
+            else:
+                # load section
+                self.section = self.series.loadSection(new_section_num)
+                # load section view
+                self.section_layer = SectionLayer(self.section, self.series)
             # set new current section
             self.series.current_section = new_section_num
             # clear selected traces
@@ -435,6 +448,19 @@ class FieldWidgetBase:
 
         # generate view and update status bar
         self.generateView()
+
+        # start loading the surrounding sections
+        self.prefetchSections()
+    
+    def prefetchSections(self) -> None:
+        """Load the sections surrounding the current section in the background."""
+        if self.series.isWelcomeSeries():
+            return
+        self.prefetcher.schedule(
+            self.series.current_section,
+            self.pixmap_dim,
+            self.series.window
+        )
     
     def reload(self, clear_states=False) -> None:
         """Reload the section data (used if section files were modified, usually through object list).
@@ -442,6 +468,8 @@ class FieldWidgetBase:
             Params:
                 clear_states (bool): True if ALL undo states should be cleared (rare)
         """
+        # discard sections loaded in the background
+        self.prefetcher.clear()
         # reload the actual sections
         self.section = self.series.loadSection(self.series.current_section)
         self.section_layer.section = self.section
@@ -463,9 +491,12 @@ class FieldWidgetBase:
 
         # notify that the series has been modified
         self.mainwindow.seriesModified(True)
+
+        self.prefetchSections()
     
     def reloadImage(self) -> None:
         """Reload the section images (used if transform or image source is modified)."""
+        self.prefetcher.clear()
         self.section_layer.loadImage()
         if self.b_section is not None:
             self.b_section_layer.loadImage()
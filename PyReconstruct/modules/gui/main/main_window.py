@@ -552,7 +552,8 @@ class MainWindow(QMainWindow):
 
             # open the JSER file if no unsaved series was opened
             if not new_series:
-                new_series = Series.openJser(jser_fp)
+                cpu_max = self.series.getOption("cpu_max") if self.series else 100
+                new_series = Series.openJser(jser_fp, determine_cpus(cpu_max))
                 # user pressed cancel
                 if new_series is None:
                     if self.series is None:
@@ -2228,7 +2229,12 @@ class MainWindow(QMainWindow):
         threshold = response[0]
         include_locked = response[1][0][1]
         
-        removed = self.series.deleteDuplicateTraces(threshold, include_locked, self.field.series_states)
+        removed = self.series.deleteDuplicateTraces(
+            threshold,
+            include_locked,
+            self.field.series_states,
+            max_workers=determine_cpus(self.series.getOption("cpu_max"))
+        )
 
         if removed:
             message = "The following duplicate traces were removed:"
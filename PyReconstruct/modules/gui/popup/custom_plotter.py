@@ -9,13 +9,16 @@ from pathlib import Path
 
 from PySide6.QtWidgets import QMainWindow
 from PySide6.QtGui import QKeyEvent
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 from PyReconstruct.modules.gui.dialog import QuickDialog, FileDialog
 from PyReconstruct.modules.backend.threading import ThreadPoolProgBar
 from PyReconstruct.modules.datatypes import Series
 from PyReconstruct.modules.backend.volume import (
     generateVolumes,
+    chooseLevels,
+    screenSize,
+    toPolyData,
     convert_vedo_to_tm,
     return_mesh_mtl,
     combine_mtl_files,
@@ -64,6 +67,16 @@ class VPlotter(vedo.Plotter):
         self.flash_on = False
 
         self.saveState = self.qt_parent.saveState  # connect save state function
+
+        ## Update the levels of detail once the camera stops moving
+        self.lod_timer = QTimer()
+        self.lod_timer.setSingleShot(True)
+        self.lod_timer.setInterval(200)
+        self.lod_timer.timeout.connect(self.updateLOD)
+        self.renderer.GetActiveCamera().AddObserver(
+            "ModifiedEvent",
+            lambda *args : self.lod_timer.start()
+        )
         
     def getSectionFromZ(self, z):
         """Get the section number from a z coordinate."""
@@ -167,8 +180,47 @@ class VPlotter(vedo.Plotter):
                 else:
                     scene_obj.msh.lw(0)
         
+        self.updateLOD(render=False)  # full detail for selected objects
         self.render()
     
+    def updateLOD(self, render=True):
+        """Choose the level of detail for each object from its size on screen and the triangle budget.
+        
+            Params:
+                render (bool): True if the scene should be rendered if any level changed
+        """
+        lod_objs = []
+        fixed_triangles = 0
+        for scene_obj in self.objs.values():
+            if scene_obj.lod_polys:
+                lod_objs.append(scene_obj)
+            else:
+                fixed_triangles += scene_obj.msh.mapper().GetInput().GetNumberOfCells()
+        if not lod_objs:
+            return
+
+        camera = self.renderer.GetActiveCamera()
+        height = self.window.GetSize()[1]
+        levels = chooseLevels(
+            [
+                (
+                    screenSize(scene_obj.msh.GetBounds(), camera, height),
+                    scene_obj.triangle_counts,
+                    scene_obj in self.selected
+                )
+                for scene_obj in lod_objs
+            ],
+            self.series.getOption("3D_triangle_budget") - fixed_triangles
+        )
+
+        changed = False
+        for scene_obj, level in zip(lod_objs, levels):
+            if scene_obj.setLOD(level):
+                changed = True
+        
+        if changed and render:
+            self.render()
+    
     def leftButtonClickEvent(self, event):
         """Called when left mouse button is clicked."""
         # record the time of click
@@ -488,9 +540,12 @@ class VPlotter(vedo.Plotter):
         for md in mesh_data_list:
             vm = vedo.Mesh([md["vertices"], md["faces"]], md["color"], md["alpha"])
             obj = self.objs.add(vm, series, md["name"], md["type"], md["color"], md["alpha"])
+            if md.get("lods"):
+                obj.setLODs(md["lods"])
             if md["tform"]:
                 obj.applyTform(md["tform"])
             self.add(vm)
+        self.updateLOD(render=False)
         self.render()
     
     def addToScene(self, objs : list, ztraces : list, remove_first=True, series=None, save_state=True):
@@ -1249,12 +1304,46 @@ class SceneObject():
         self.color = color
         self.alpha = alpha
         self.id = None
+        self.lod_polys = []  # polydata for each level of detail (full detail first)
+        self.lod = 0
     
     def setID(self, new_id : str):
         """Set the ID of the scene object."""
         self.id = new_id
         self.msh.metadata["id"] = new_id
     
+    def setLODs(self, lods : list):
+        """Set the coarser levels of detail for the object.
+        
+            Params:
+                lods (list): (vertices, faces) for each level below full detail (coarsest last)
+        """
+        self.lod_polys = [self.msh.mapper().GetInput()]
+        self.lod_polys += [toPolyData(vertices, faces) for vertices, faces in lods]
+        self.lod = 0
+    
+    @property
+    def triangle_counts(self):
+        return [poly.GetNumberOfCells() for poly in self.lod_polys]
+    
+    def setLOD(self, level : int) -> bool:
+        """Display a level of detail for the object.
+
+        Only the rendered geometry changes: the mesh data (used for transforms
+        and export) stays at full detail, but clicks pick the displayed level, so
+        picked points lie on the decimated surface.
+        
+            Params:
+                level (int): the level (0 for full detail)
+            Returns:
+                (bool): True if the displayed level changed
+        """
+        if level == self.lod or level >= len(self.lod_polys):
+            return False
+        self.msh.mapper().SetInputData(self.lod_polys[level])
+        self.lod = level
+        return True
+    
     def setColor(self, new_color : tuple):
         """Set the color of the object."""
         self.msh.color(new_color)
@@ -1,4 +1,4 @@
-from .copy_table_widget import CopyTableWidget, getCopyTableWidget
+from .copy_table_widget import CopyTableWidget, CopyTableView, getCopyTableWidget
 from .object import ObjectTableWidget
 from .section import SectionTableWidget
 from .trace import TraceTableWidget
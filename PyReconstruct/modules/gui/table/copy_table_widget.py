@@ -1,6 +1,6 @@
 from typing import Union
 
-from PySide6.QtWidgets import QTableWidget, QApplication, QMainWindow
+from PySide6.QtWidgets import QTableWidget, QTableView, QApplication, QMainWindow
 from PySide6.QtCore import Qt
 
 from PyReconstruct.modules.gui.utils import lessThan
@@ -88,16 +88,85 @@ class CopyTableWidget(QTableWidget):
                 self.setColumnWidth(c, w + 8)
     
 
-def getCopyTableWidget(mainwindow: QMainWindow,  id: Union[None, int]=None) -> CopyTableWidget:
+class CopyTableView(QTableView):
+
+    def __init__(self, container, *args, **kwargs):
+        """Create a table view with the same copy behavior as CopyTableWidget.
+        
+            Params:
+                container: the data table that contains the view
+        """
+        super().__init__(*args, **kwargs)
+
+        self.container = container
+        self.id = make_unique_id()
+
+    def keyPressEvent(self, event):
+        ret = super().keyPressEvent(event)
+        # override the table copy function
+        if event.key() == Qt.Key_C and (event.modifiers() & Qt.ControlModifier):
+            self.copy()
+        return ret
+
+    def copy(self):
+        """Copy table data onto the clipboard."""
+        indexes = sorted(self.selectedIndexes())
+        if indexes:
+            clipboard_str = ""
+            row = indexes[0].row()
+            row_list = []
+            for index in indexes:
+                if index.row() > row:
+                    clipboard_str += "\t".join(row_list) + "\n"
+                    row_list = []
+                    row = index.row()
+                row_list.append(index.data() or "")
+            clipboard_str += "\t".join(row_list) + "\n"
+            QApplication.clipboard().setText(clipboard_str)
+
+    def backspace(self):
+        """Called when backspace is pressed.
+
+        Extended in container classes.
+        """
+        return
+    
+    def resizeColumnToContents(self, c : int):
+        super().resizeColumnToContents(c)
+
+        try:
+            series = getattr(self.parent().parent(), "series")
+        except AttributeError:
+            return
+        
+        if series.getOption("theme") == "qdark":
+            w = self.columnWidth(c)
+            self.setColumnWidth(c, w + 8)
+    
+    def resizeColumnsToContents(self):
+        super().resizeColumnsToContents()
+
+        try:
+            series = getattr(self.parent().parent(), "series")
+        except AttributeError:
+            return
+        
+        if series.getOption("theme") == "qdark":
+            for c in range(self.model().columnCount()):
+                w = self.columnWidth(c)
+                self.setColumnWidth(c, w + 8)
+    
+
+def getCopyTableWidget(mainwindow: QMainWindow,  id: Union[None, int]=None) -> Union[CopyTableWidget, CopyTableView]:
     """Return the container for a CopyTableWidget
 
     Useful if focusWidget() fails to return CopyTableWidget.
     """
 
-    docked_tables = mainwindow.findChildren(QTableWidget)
+    docked_tables = mainwindow.findChildren(QTableView)  # includes QTableWidget
 
     docked = [
-        d for d in docked_tables if isinstance(d, CopyTableWidget)
+        d for d in docked_tables if isinstance(d, (CopyTableWidget, CopyTableView))
     ]
 
     if not id:
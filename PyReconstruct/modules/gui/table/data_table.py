@@ -276,8 +276,23 @@ class DataTable(QDockWidget):
         if not file_path:
             return
         
+        headers, rows = self.getExportRows()
+
         csv_file = open(file_path, "w")
+        csv_file.write(",".join(headers) + "\n")
+        for items in rows:
+            csv_file.write(",".join(items) + "\n")
+        csv_file.close()
+    
+    def getExportRows(self):
+        """Get the headers and the text of each row for export.
         
+        This might be overwritten in child classes.
+
+            Returns:
+                (list): the column headers
+                (list): the list of cell texts for each row
+        """
         ## Headers first
         items = []
         checkable = []
@@ -293,7 +308,8 @@ class DataTable(QDockWidget):
             
             items.append(header_title)
             
-        csv_file.write(",".join(items) + "\n")
+        headers = items
+        rows = []
         
         ## Then data
         for r in range(self.table.rowCount()):
@@ -324,9 +340,9 @@ class DataTable(QDockWidget):
                     
                 items.append(cell_text)
                 
-            csv_file.write(",".join(items) + "\n")
+            rows.append(items)
 
-        csv_file.close()
+        return headers, rows
     
     def backspace(self):
         """Called when user hits delete or backspace.
@@ -17,7 +17,7 @@ class HistoryTableWidget(QDockWidget):
         self.setWindowTitle("History")
 
         # filter the logs
-        self.filterLogs(log_set, obj_names)
+        log_set = self.filterLogs(log_set, obj_names)
         
         # create the table
         self.createTable(log_set)
@@ -27,17 +27,11 @@ class HistoryTableWidget(QDockWidget):
         self.show()
     
     def filterLogs(self, log_set : LogSet, obj_names : list):
-        """Remove logs unrelated to objects of interest."""
+        """Get the logs related to the objects of interest."""
         if not obj_names:
-            return
+            return log_set
         
-        i = 0
-        while i < len(log_set.all_logs):
-            log = log_set.all_logs[i]
-            if log.obj_name not in obj_names:
-                log_set.all_logs.pop(i)
-            else:
-                i += 1
+        return log_set.getObjectSet(obj_names)
 
     def setRow(self, r : int, log : Log):
         """Set the data for a row.
@@ -54,7 +48,7 @@ class HistoryTableWidget(QDockWidget):
         # establish table headers
         self.horizontal_headers = ["Date", "Time", "User", "Object", "Sections", "Event"]
 
-        self.table = CopyTableWidget(self, len(log_set.all_logs), len(self.horizontal_headers))
+        self.table = CopyTableWidget(self, len(log_set), len(self.horizontal_headers))
         self.setWidget(self.table)
 
         # format table
@@ -65,7 +59,7 @@ class HistoryTableWidget(QDockWidget):
         self.table.verticalHeader().hide()  # no veritcal header
         
         # fill in section data
-        for r, log in enumerate(reversed(log_set.all_logs)):
+        for r, log in enumerate(reversed(log_set.getLogList())):
             self.setRow(r, log)
         
         # format the table
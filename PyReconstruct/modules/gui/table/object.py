@@ -1,22 +1,19 @@
 import re
 
 from PySide6.QtWidgets import (
-    QTableWidgetItem,  
     QWidget, 
     QInputDialog, 
     QMenu, 
     QApplication,
     QMessageBox,
-)
-from PySide6.QtGui import (
-    QPalette,
-    QColor
+    QAbstractItemView,
 )
 from PySide6.QtCore import Qt
 
 from .data_table import DataTable
+from .copy_table_widget import CopyTableView
+from .object_model import ObjectTableModel
 from .history import HistoryTableWidget
-from PyReconstruct.modules.gui.utils import sortList
 
 from PyReconstruct.modules.datatypes import Series
 from PyReconstruct.modules.gui.utils import (
@@ -36,6 +33,8 @@ from PyReconstruct.modules.gui.popup import (
     TextWidget,
 )
 
+RESIZE_PRECISION = 100  # number of rows measured to fit the column widths
+
 class ObjectTableWidget(DataTable):
     
     def __init__(self, series : Series, mainwindow : QWidget, manager, hidden=False):
@@ -65,6 +64,11 @@ class ObjectTableWidget(DataTable):
         self.host_filters = set()
         self.direct_hosts_only = False
 
+        # the sort order (kept when the table is recreated)
+        self.sort_column = "Name"
+        self.sort_order = Qt.AscendingOrder
+        self.model = None
+
         super().__init__("object", series, mainwindow, manager)
         self.static_columns = ["Name"]
         self.createTable()
@@ -239,144 +243,6 @@ class ObjectTableWidget(DataTable):
                 h.append(key)
         return h
     
-    def getItems(self, name : str, item_type : str):
-        """Get the QTableWidgetItem(s) for an attribute of an object.
-        
-            Params:
-                name (str): the name of the object to retrieve the data for
-                item_type (str): the specific data to be retrieved
-        """
-        items = []
-        if item_type == "Name":
-            
-            items.append(QTableWidgetItem(name))
-            
-        elif item_type == "Range":
-            
-            items.append(QTableWidgetItem(str(self.series.data.getStart(name))))
-            items.append(QTableWidgetItem(str(self.series.data.getEnd(name))))
-            
-        elif item_type == "Count":
-            
-            items.append(QTableWidgetItem(str(self.series.data.getCount(name))))
-            
-        elif item_type == "Flat area":
-            
-            items.append(QTableWidgetItem(str(round(self.series.data.getFlatArea(name), 5))))
-            
-        elif item_type == "Volume":
-            
-            items.append(QTableWidgetItem(str(round(self.series.data.getVolume(name), 5))))
-            
-        elif item_type == "Radius":
-            
-            items.append(QTableWidgetItem(str(round(self.series.data.getAvgRadius(name), 5))))
-            
-        elif item_type == "Host":
-            
-            items.append(QTableWidgetItem(", ".join(self.series.getObjHosts(name))))
-            
-        elif item_type == "Superhosts":
-            
-            hosts = self.series.getObjHosts(name, True, True)
-            items.append(QTableWidgetItem(", ".join(hosts)))
-            
-        elif item_type == "Groups":
-            
-            groups = self.series.object_groups.getObjectGroups(name)
-            groups_str = ", ".join(groups)
-            items.append(QTableWidgetItem(groups_str))
-            
-        elif item_type == "Trace tags":
-            
-            tags = self.series.data.getTags(name)
-            tags_str = ", ".join(tags)
-            items.append(QTableWidgetItem(tags_str))
-            
-        elif item_type == "Locked":
-            
-            item = QTableWidgetItem("")
-            item.setFlags(Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled)
-            item.setCheckState(Qt.CheckState.Checked if self.series.getAttr(name, "locked") else Qt.CheckState.Unchecked)
-            items.append(item)
-            
-        elif item_type == "Last user":
-            
-            last_user = self.series.getAttr(name, "last_user")
-            items.append(QTableWidgetItem(last_user))
-            
-        elif item_type == "Curate":
-            
-            check_item = QTableWidgetItem("")
-            status_item = QTableWidgetItem("")
-            user_item = QTableWidgetItem("")
-            date_item = QTableWidgetItem("")
-            cr_items = [check_item, status_item, user_item, date_item]
-            check_item.setFlags(Qt.ItemFlag.ItemIsUserTristate | Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled)
-
-            obj_curation = self.series.getAttr(name, "curation")
-            
-            if not obj_curation:
-                
-                check_item.setCheckState(Qt.CheckState.Unchecked)
-                cr_color = None
-                
-            else:
-                
-                curated, user, date = obj_curation
-                text_lightness = QApplication.palette().color(QPalette.WindowText).lightness()
-
-                if curated:
-                    
-                    check_item.setCheckState(Qt.CheckState.Checked)
-                    status_item.setText("Curated")
-                    cr_color = Qt.blue if text_lightness > 128 else Qt.cyan
-
-                else:
-                    
-                    check_item.setCheckState(Qt.CheckState.PartiallyChecked)
-                    status_item.setText(f"Needs curation")
-                    cr_color = QColor(100, 100, 0) if text_lightness > 128 else Qt.yellow
-                    
-                user_item.setText(user)
-                date_item.setText(date)
-                
-            for item in cr_items:
-                
-                if cr_color:
-                    
-                    item.setData(Qt.BackgroundRole, cr_color)
-                    item.setBackground(cr_color)
-                    
-                items.append(item)
-                
-        elif item_type == "Alignment":
-            
-            alignment = self.series.getAttr(name, "alignment")
-            if alignment is None: alignment = ""
-            items.append(QTableWidgetItem(alignment))
-            
-        elif item_type == "Comment":
-            
-            comment = self.series.getAttr(name, "comment")
-            items.append(QTableWidgetItem(comment))
-
-        elif item_type == "Configuration":
-
-            items.append(
-                QTableWidgetItem(
-                    self.series.data.getConfiguration(name)
-                )
-            )
-            
-        elif item_type in self.series.user_columns:
-            
-            value = self.series.getUserColAttr(name, item_type)
-            if value is None: value = ""
-            items.append(QTableWidgetItem(value))
-        
-        return items
-    
     def passesFilters(self, name : str):
         """Check if an object passes the filters.
         
@@ -391,7 +257,7 @@ class ObjectTableWidget(DataTable):
         ## Check user columns
         if self.user_col_filters:
             passes_filters = False
-            for n, value in self.series.getAttr(name, "user_columns").items():
+            for n, value in self.model.getValue(name, "user_columns").items():
                 if n in self.user_col_filters and value in self.user_col_filters[n]:
                     passes_filters = True
                     break
@@ -401,7 +267,7 @@ class ObjectTableWidget(DataTable):
         ## Check groups
         filters_len = len(self.group_filters)
         if filters_len != 0:  # if group filter requested
-            object_groups = self.series.object_groups.getObjectGroups(name)
+            object_groups = self.model.getValue(name, "Groups")
             groups_len = len(object_groups)
             union_len = len(object_groups.union(self.group_filters))
             if union_len == groups_len + filters_len:  # intersection does not exist
@@ -410,7 +276,7 @@ class ObjectTableWidget(DataTable):
         ## Check tags
         filters_len = len(self.tag_filters)
         if filters_len != 0:
-            object_tags = self.series.data.getTags(name)
+            object_tags = self.model.getValue(name, "Trace tags")
             object_len = len(object_tags)
             union_len = len(object_tags.union(self.tag_filters))
             if union_len == object_len + filters_len:  # intersection does not exist
@@ -419,7 +285,7 @@ class ObjectTableWidget(DataTable):
         ## Check curation status and user
         if dict(self.columns)["Curate"]:
             
-            obj_curation = self.series.getAttr(name, "curation")
+            obj_curation = self.model.getValue(name, "curation")
             
             if obj_curation:
                 
@@ -449,7 +315,7 @@ class ObjectTableWidget(DataTable):
                 if req == True
             ]
 
-            obj_config = self.series.data.getConfiguration(name)
+            obj_config = self.model.getValue(name, "Configuration")
 
             if obj_config not in req_configs and obj_config is not None:
                 return False
@@ -459,6 +325,7 @@ class ObjectTableWidget(DataTable):
         for re_filter in self.re_filters:
             if bool(re.fullmatch(re_filter, name)):
                 passes_filters = True
+                break
         if not passes_filters:
             return False
 
@@ -466,30 +333,111 @@ class ObjectTableWidget(DataTable):
         found_host = False if bool(self.host_filters) else True
         if name in self.host_filters:
             found_host = True
-        else:
+        elif self.host_filters:
+            hosts = self.model.getValue(name, "Host" if self.direct_hosts_only else "all_hosts")
             for host in self.host_filters:
-                if host in self.series.getObjHosts(name, not self.direct_hosts_only):
+                if host in hosts:
                     found_host = True
+                    break
         if not found_host:
             return False
         
         return True
 
     def getFiltered(self):
-        """Get the names of the objects that pass the filter.
-        
-            Params:
-                obj_name_list (list): the list of object names
-        """
-        filtered_list = super().getFiltered(
-            list(self.series.data["objects"].keys())
-        )
-        return sortList(filtered_list)
+        """Get the names of the objects that pass the filter (unsorted)."""
+        names = list(self.series.data["objects"].keys())
+
+        # compute the trace quantities used by the filters all at once
+        filter_columns = []
+        if self.tag_filters:
+            filter_columns.append("Trace tags")
+        if dict(self.columns)["Configuration"]:
+            filter_columns.append("Configuration")
+        self.model.prefetch(filter_columns, names)
+
+        return super().getFiltered(names)
 
     def createTable(self):
-        """Create the table widget."""
+        """Create the table view.
+
+        The rows are provided by an ObjectTableModel, which only computes
+        the values that are displayed, filtered or sorted.
+        """
         self.updateObjCols(recreate=False)
-        super().createTable()
+
+        # close an existing table and save scroll position
+        if self.table is not None:
+            scroll_pos = self.table.verticalScrollBar().value()
+            self.table.close()
+        else:
+            scroll_pos = 0
+
+        # update the columns
+        self.columns = self.series.getOption(f"{self.name}_columns")
+        self.horizontal_headers = self.getHeaders()
+        if self.sort_column not in self.horizontal_headers:
+            self.sort_column = "Name"
+            self.sort_order = Qt.AscendingOrder
+
+        # create the model and fill it with the filtered objects
+        self.model = ObjectTableModel(
+            self.series,
+            self.horizontal_headers,
+            self.series.user_columns,
+            self.checkChanged
+        )
+        self.model.sort_column = self.sort_column
+        self.model.sort_order = self.sort_order
+        self.model.setNames(self.getFiltered())
+
+        # create the table object
+        self.table = CopyTableView(self, self.main_widget)
+        self.table.setModel(self.model)
+
+        # connect table functions
+        self.table.mouseDoubleClickEvent = self.mouseDoubleClickEvent
+        self.table.backspace = self.backspace
+
+        # format table
+        self.table.setShowGrid(False)  # no grid
+        self.table.setAlternatingRowColors(True)  # alternate row colors
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)  # cannot be edited
+        self.table.verticalHeader().hide()  # no veritcal header
+
+        # sort by clicking the headers
+        header = self.table.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(self.horizontal_headers.index(self.sort_column), self.sort_order)
+        header.sortIndicatorChanged.connect(self.sortChanged)
+
+        # format columns (only the rows near the visible area are measured)
+        header.setResizeContentsPrecision(RESIZE_PRECISION)
+        self.table.resizeColumnsToContents()
+
+        # set the saved scroll value
+        self.table.verticalScrollBar().setValue(scroll_pos)
+
+        # set table as central widget
+        self.main_widget.setCentralWidget(self.table)
+
+        # set the title
+        self.updateTitle()
+
+        # update the menus
+        self.createMenus()
+    
+    def sortChanged(self, column : int, order):
+        """Sort the table when a header is clicked.
+        
+            Params:
+                column (int): the column index
+                order (Qt.SortOrder): the sort order
+        """
+        self.model.sort(column, order)
+        self.sort_column = self.model.sort_column
+        self.sort_order = self.model.sort_order
     
     def updateData(self, names : list):
         """Update the data for a set of objects.
@@ -498,31 +446,23 @@ class ObjectTableWidget(DataTable):
                 names (iterable): the names of the objects to update
         """
         for name in names:
-
-            row, exists_in_table = self.table.getRowIndex(name)
-            exists_in_series = name in self.series.data["objects"]
-            pass_filters = self.passesFilters(name)
-
-            remove = exists_in_table and (not exists_in_series or not pass_filters)
-
-            ## Completely delete object
-            if remove:  
-                
-                self.table.removeRow(row)
-
-            ## Update existing row
-            elif exists_in_table and exists_in_series:
-                
-                self.setRow(name, row)
-
-            ## Add new row
-            elif not exists_in_table and exists_in_series and pass_filters:  
-                
-                self.table.insertRow(row)
-                self.setRow(name, row)
+            self.model.invalidate(name)
+            self.model.updateName(name, self.passesFilters(name))
 
         self.mainwindow.checkActions()
     
+    def getExportRows(self):
+        """Get the headers and the text of each row for export."""
+        self.model.prefetch(self.horizontal_headers)
+        rows = [
+            [
+                self.model.getText(name, column).replace(",", "")  # e.g., multiple tags
+                for column in self.horizontal_headers
+            ]
+            for name in self.model.names
+        ]
+        return list(self.horizontal_headers), rows
+    
     def mouseDoubleClickEvent(self, event):
         """Called when user double-clicks."""
         modifiers = QApplication.keyboardModifiers()
@@ -560,8 +500,7 @@ class ObjectTableWidget(DataTable):
         selected_indexes = self.table.selectedIndexes()
         obj_names = []
         for i in selected_indexes:
-            r = i.row()
-            n = self.table.item(r, 0).text()
+            n = self.model.names[i.row()]
             obj_names.append(n)
 
         # self.checkLocked(obj_names)
@@ -575,58 +514,48 @@ class ObjectTableWidget(DataTable):
         else:
             return obj_names
 
-    def itemChanged(self, item : QTableWidgetItem):
-        """User checked a checkbox."""
-        # check for curation
-        if not self.process_check_event:
-            return
+    def checkChanged(self, name : str, column : str, state : Qt.CheckState):
+        """User checked a checkbox.
         
-        self.process_check_event = False
-
-        r = item.row()
-        c = item.column()
-        name = self.table.item(r, 0).text()
-        state = item.checkState()
-
+            Params:
+                name (str): the name of the object
+                column (str): the header of the column that was checked
+                state (Qt.CheckState): the new check state
+        """
         # if locked box checked
-        if self.horizontal_headers[c] == "Locked":
+        if column == "Locked":
             self.series_states.addState()
             locked = state == Qt.CheckState.Checked
             self.series.setAttr(name, "locked", locked)
-            self.setRow(name, r)
+            self.updateData([name])
             if locked:
                 self.mainwindow.field.deselectAllTraces()
             self.mainwindow.seriesModified(True)
         
         # curation box checked
-        elif self.horizontal_headers[c] == "CR":
+        elif column == "CR":
             if self.series.getAttr(name, "locked"):
                 notify("This object is locked.")
-                self.setRow(name, r)
                 self.manager.updateObjects([name])
             else:
-                self.series_states.addState()
-                if state == Qt.CheckState.Unchecked:
-                    self.series.setCuration([name], "")
-                elif state == Qt.CheckState.PartiallyChecked:
+                if state == Qt.CheckState.PartiallyChecked:
                     assign_to, confirmed = QInputDialog.getText(
                         self,
                         "Assign to",
                         "Assign curation to username:\n(press enter to leave blank)" 
                     )
                     if not confirmed:
-                        item.setCheckState(Qt.CheckState.Unchecked)
-                        self.process_check_event = True
                         return
+                self.series_states.addState()
+                if state == Qt.CheckState.Unchecked:
+                    self.series.setCuration([name], "")
+                elif state == Qt.CheckState.PartiallyChecked:
                     self.series.setCuration([name], "Needs curation", assign_to)
                 elif state == Qt.CheckState.Checked:
                     self.series.setCuration([name], "Curated")
 
-                self.setRow(name, r)
                 self.manager.updateObjects([name])
                 self.mainwindow.seriesModified(True)
-        
-        self.process_check_event = True
     
     def updateObjCols(self, recreate=True):
         """Update the object column options based on the series.user_columns.
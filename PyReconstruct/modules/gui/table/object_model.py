@@ -0,0 +1,447 @@
+"""Table model for the object list.
+
+The object list is shown with a QTableView over this model rather than a
+QTableWidget with an item for every cell, so very large series stay fast.
+Values are computed only when a row is drawn, or for a whole column at once
+(from the series trace table, see prefetch) when the list is filtered or
+sorted by it. Computed values are kept per column until the object is
+updated (see invalidate and updateName), so rows can be inserted, removed and
+redrawn one at a time.
+
+Objects without traces have no start, end or radius: these values are None
+and the cells are left empty.
+"""
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QPalette, QColor
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+NUMERIC_COLUMNS = ("Start", "End", "Count", "Flat area", "Volume", "Radius")
+ROUNDED_COLUMNS = ("Flat area", "Volume", "Radius")
+CURATION_COLUMNS = ("CR", "Status", "User", "Date")
+CHECK_COLUMNS = ("Locked", "CR")
+DATA_ROLES = (Qt.DisplayRole, Qt.CheckStateRole, Qt.BackgroundRole)
+STATS_COLUMNS = {  # column : key in TraceTable.getObjectStats
+    "Start": "start",
+    "End": "end",
+    "Count": "count",
+    "Flat area": "flat_area",
+    "Volume": "volume",
+    "Radius": "avg_radius",
+    "Configuration": "configuration",
+    "Trace tags": "tags",
+}
+
+
+def nameKey(name : str) -> tuple:
+    """Return the sort key for a name (same order as gui.utils.sortList).
+
+        Params:
+            name (str): the name
+    """
+    return (name.lower(), name)
+
+
+def valueKey(value) -> tuple:
+    """Return a sort key that can compare any column values (empty values are sorted last).
+
+        Params:
+            value: the column value
+    """
+    if value is None or value == "":
+        return (2,)
+    elif isinstance(value, str):
+        return (1, value.lower(), value)
+    elif isinstance(value, (set, list, tuple)):
+        return (1, ", ".join(sorted(str(v) for v in value)).lower()) if value else (2,)
+    else:
+        return (0, value)
+
+
+class ObjectTableModel(QAbstractTableModel):
+
+    def __init__(self, series, headers : list, user_columns : list, check_callback=None):
+        """Create the model for the object list.
+
+            Params:
+                series (Series): the series containing the objects
+                headers (list): the column headers
+                user_columns (list): the names of the user-defined columns
+                check_callback (function): called with (name, header, state) when the user checks a box
+        """
+        super().__init__()
+        self.series = series
+        self.headers = list(headers)
+        self.user_columns = set(user_columns)
+        self.check_callback = check_callback
+
+        self.names = []  # the object names in row order
+        self.values = {}  # column : {name : value}
+        self.sort_column = "Name"
+        self.sort_order = Qt.AscendingOrder
+        self.sort_keys = []  # sort keys in row order
+        self.name_keys = {}  # name : sort key for the objects in the table
+
+    ## Data access
+
+    def computeValue(self, name : str, column : str):
+        """Get a value for an object from the series.
+
+            Params:
+                name (str): the name of the object
+                column (str): the column header or attribute
+        """
+        series = self.series
+        data = series.data
+
+        if column == "Name":
+            return name
+        elif column == "Start":
+            return data.getStart(name)
+        elif column == "End":
+            return data.getEnd(name)
+        elif column == "Count":
+            return data.getCount(name)
+        elif column == "Flat area":
+            return data.getFlatArea(name)
+        elif column == "Volume":
+            return data.getVolume(name)
+        elif column == "Radius":
+            return data.getAvgRadius(name)
+        elif column == "Host":
+            return series.getObjHosts(name)
+        elif column == "Superhosts":
+            return series.getObjHosts(name, True, True)
+        elif column == "all_hosts":
+            return series.getObjHosts(name, True)
+        elif column == "Groups":
+            return series.object_groups.getObjectGroups(name)
+        elif column == "Trace tags":
+            return data.getTags(name)
+        elif column == "Locked":
+            return series.getAttr(name, "locked")
+        elif column == "Last user":
+            return series.getAttr(name, "last_user")
+        elif column == "curation":
+            return series.getAttr(name, "curation")
+        elif column in CURATION_COLUMNS:
+            curation = self.getValue(name, "curation")
+            if not curation:
+                return None if column == "CR" else ""
+            curated, user, date = curation
+            if column == "CR":
+                return curated
+            elif column == "Status":
+                return "Curated" if curated else "Needs curation"
+            elif column == "User":
+                return user
+            else:
+                return date
+        elif column == "Alignment":
+            return series.getAttr(name, "alignment")
+        elif column == "Comment":
+            return series.getAttr(name, "comment")
+        elif column == "Configuration":
+            return data.getConfiguration(name)
+        elif column == "user_columns":
+            return series.getAttr(name, "user_columns")
+        elif column in self.user_columns:
+            return self.getValue(name, "user_columns").get(column)
+        return None
+
+    def getValue(self, name : str, column : str):
+        """Get a value for an object (computed once and stored).
+
+            Params:
+                name (str): the name of the object
+                column (str): the column header or attribute
+        """
+        column_values = self.values.setdefault(column, {})
+        try:
+            return column_values[name]
+        except KeyError:
+            value = self.computeValue(name, column)
+            column_values[name] = value
+            return value
+
+    def getColumn(self, column : str, names : list = None) -> list:
+        """Get the values of a column for a list of objects.
+
+            Params:
+                column (str): the column header or attribute
+                names (list): the object names (all rows if None)
+        """
+        if names is None:
+            names = self.names
+        return [self.getValue(name, column) for name in names]
+
+    def prefetch(self, columns : list, names : list = None):
+        """Compute the trace quantities for many objects at once.
+
+            Params:
+                columns (list): the columns that will be used (only those in STATS_COLUMNS are computed)
+                names (list): the object names (all rows if None)
+        """
+        columns = [c for c in columns if c in STATS_COLUMNS]
+        if not columns:
+            return
+        if names is None:
+            names = self.names
+        missing = [
+            name for name in names
+            if any(name not in self.values.get(c, {}) for c in columns)
+        ]
+        if not missing:
+            return
+        stats = self.series.data.trace_table.getObjectStats(missing)
+        for column, key in STATS_COLUMNS.items():
+            column_values = self.values.setdefault(column, {})
+            for name, value in zip(missing, stats[key]):
+                column_values.setdefault(name, value)
+
+    def invalidate(self, name : str):
+        """Drop the stored values for an object.
+
+            Params:
+                name (str): the name of the object
+        """
+        for column_values in self.values.values():
+            column_values.pop(name, None)
+
+    def getText(self, name : str, column : str) -> str:
+        """Get the text displayed in a cell.
+
+            Params:
+                name (str): the name of the object
+                column (str): the column header
+        """
+        if column in CHECK_COLUMNS:
+            return ""
+        value = self.getValue(name, column)
+        if value is None:
+            return ""
+        elif column in ROUNDED_COLUMNS:
+            return str(round(value, 5))
+        elif column in NUMERIC_COLUMNS:
+            return str(value)
+        elif column in ("Host", "Superhosts", "Groups", "Trace tags"):
+            return ", ".join(value)
+        return value
+
+    def getCheckState(self, name : str, column : str):
+        """Get the check state of a checkable cell.
+
+            Params:
+                name (str): the name of the object
+                column (str): the column header
+        """
+        value = self.getValue(name, column)
+        if column == "CR":
+            if value is None:
+                return Qt.CheckState.Unchecked
+            elif value:
+                return Qt.CheckState.Checked
+            else:
+                return Qt.CheckState.PartiallyChecked
+        return Qt.CheckState.Checked if value else Qt.CheckState.Unchecked
+
+    def getCurationColor(self, name : str):
+        """Get the background color for the curation columns of an object."""
+        curation = self.getValue(name, "curation")
+        if not curation:
+            return None
+        text_lightness = QApplication.palette().color(QPalette.WindowText).lightness()
+        if curation[0]:
+            return Qt.blue if text_lightness > 128 else Qt.cyan
+        else:
+            return QColor(100, 100, 0) if text_lightness > 128 else Qt.yellow
+
+    ## Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self.headers):
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        # views ask for many roles per cell, so check the role first
+        if role not in DATA_ROLES or not index.isValid():
+            return None
+        name = self.names[index.row()]
+        column = self.headers[index.column()]
+
+        if role == Qt.DisplayRole:
+            return self.getText(name, column)
+        elif role == Qt.CheckStateRole and column in CHECK_COLUMNS:
+            return self.getCheckState(name, column)
+        elif role == Qt.BackgroundRole and column in CURATION_COLUMNS:
+            return self.getCurationColor(name)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        column = self.headers[index.column()]
+        if column == "Locked":
+            return Qt.ItemIsUserCheckable | Qt.ItemIsEnabled
+        elif column == "CR":
+            return Qt.ItemIsUserTristate | Qt.ItemIsUserCheckable | Qt.ItemIsEnabled
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid() or self.check_callback is None:
+            return False
+        name = self.names[index.row()]
+        column = self.headers[index.column()]
+        self.check_callback(name, column, Qt.CheckState(value))
+        return True
+
+    def sort(self, column : int, order=Qt.AscendingOrder):
+        """Sort the rows by a column.
+
+            Params:
+                column (int): the index of the column
+                order (Qt.SortOrder): the sort order
+        """
+        if not 0 <= column < len(self.headers):
+            return
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column = self.headers[column]
+        self.sort_order = order
+        old_names = self.names
+        self.setNames(old_names, reset=False)
+        self.updatePersistentRows(old_names)
+        self.layoutChanged.emit()
+
+    ## Rows
+
+    def getSortKey(self, name : str) -> tuple:
+        """Return the key used to place an object in the sorted rows.
+
+            Params:
+                name (str): the name of the object
+        """
+        if self.sort_column == "Name":
+            return nameKey(name)
+        return (valueKey(self.getValue(name, self.sort_column)), nameKey(name))
+
+    def setNames(self, names : list, reset=True):
+        """Set the objects shown in the table (sorted by the current sort column).
+
+            Params:
+                names (list): the object names
+                reset (bool): True if the views should be reset
+        """
+        if reset:
+            self.beginResetModel()
+        self.prefetch([self.sort_column], names)
+        keys = [self.getSortKey(name) for name in names]
+        order = sorted(
+            range(len(names)),
+            key=keys.__getitem__,
+            reverse=(self.sort_order == Qt.DescendingOrder)
+        )
+        self.names = [names[i] for i in order]
+        self.sort_keys = [keys[i] for i in order]
+        self.name_keys = dict(zip(self.names, self.sort_keys))
+        if reset:
+            self.endResetModel()
+
+    def updatePersistentRows(self, old_names : list):
+        """Move the persistent indexes (selection, current item) after the rows are reordered."""
+        old_indexes = self.persistentIndexList()
+        if not old_indexes:
+            return
+        rows = {name : r for r, name in enumerate(self.names)}
+        new_indexes = []
+        for index in old_indexes:
+            name = old_names[index.row()]
+            new_indexes.append(self.index(rows[name], index.column()))
+        self.changePersistentIndexList(old_indexes, new_indexes)
+
+    def findRow(self, key : tuple) -> int:
+        """Find where a sort key belongs in the rows.
+
+            Params:
+                key (tuple): the sort key
+        """
+        keys = self.sort_keys
+        descending = self.sort_order == Qt.DescendingOrder
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (keys[mid] > key) if descending else (keys[mid] < key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def getRow(self, name : str) -> int:
+        """Return the row for an object (None if not shown).
+
+            Params:
+                name (str): the name of the object
+        """
+        key = self.name_keys.get(name)
+        if key is None:
+            return None
+        return self.findRow(key)
+
+    def removeName(self, name : str):
+        """Remove the row for an object.
+
+            Params:
+                name (str): the name of the object
+        """
+        row = self.getRow(name)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.names.pop(row)
+        self.sort_keys.pop(row)
+        del(self.name_keys[name])
+        self.endRemoveRows()
+
+    def insertName(self, name : str):
+        """Insert a row for an object in sorted position.
+
+            Params:
+                name (str): the name of the object
+        """
+        key = self.getSortKey(name)
+        row = self.findRow(key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.names.insert(row, name)
+        self.sort_keys.insert(row, key)
+        self.name_keys[name] = key
+        self.endInsertRows()
+
+    def updateName(self, name : str, show : bool):
+        """Update the row for an object after it has changed.
+
+        The stored values for the object must already be dropped (see invalidate).
+
+            Params:
+                name (str): the name of the object
+                show (bool): True if the object should be in the table
+        """
+        row = self.getRow(name)
+        if not show:
+            self.removeName(name)
+        elif row is None:
+            self.insertName(name)
+        elif self.sort_keys[row] != self.getSortKey(name):
+            # the object has moved in the sort order
+            self.removeName(name)
+            self.insertName(name)
+        else:
+            self.dataChanged.emit(
+                self.index(row, 0),
+                self.index(row, len(self.headers) - 1)
+            )
@@ -26,6 +26,7 @@ from PySide6.QtGui import (
 from PySide6.QtCore import Qt
 
 from PyReconstruct.modules.constants import welcome_series_dir
+from PyReconstruct.modules.datatypes.progress import BasicProgbar
 
 
 mainwindow = None
@@ -361,41 +362,6 @@ def drawOutlinedText(
 
 
 # PROGRESS BAR
-class BasicProgbar():
-    def __init__(self, text : str, maximum=100):
-        """Create a 'vanilla' progress indicator.
-        
-        Params:
-            text (str): the text to display by the indicator
-        """
-        self.text = text
-        self.max = maximum
-        if self.max == 0:
-            print(f"{text} | Loading...", end="\r")
-        else:
-            print(f"{text} | 0.0%", end="\r")
-    
-    def setValue(self, n):
-        """Update the progress indicator.
-        
-            Params:
-                p (float): the percentage of progress made
-        """
-        if self.max == 0:
-            return
-        print(f"{self.text} | {n / self.max * 100 :.1f}%", end="\r")
-        if n == self.max:
-            self.close()
-    
-    def wasCanceled(self):
-        """Dummy function -- do nothing!"""
-        return False
-    
-    def close(self):
-        """Force finish the progbar."""
-        print()
-
-
 def getProgbar(text, cancel=True, maximum=100):
     """Create a progress bar (either for pyqt or in cmd text).
     
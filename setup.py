@@ -34,7 +34,8 @@ setup(
     scripts=SHELL_SCRIPTS,
     entry_points={
         'console_scripts': [
-            'PyReconstruct=PyReconstruct.cli:main'
+            'PyReconstruct=PyReconstruct.cli:main',
+            'PyReconstruct-batch=PyReconstruct.batch:main'
         ]
     }
 )